@@ -0,0 +1,374 @@
+"""Frozen accuracy benchmark: holdout outcomes and dedupe pairs, scored for any scorer."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.analysis.deduplicator import candidate_pairs, to_epoch
+from src.analysis.deep_reviewer import HybridScorer
+from src.analysis.logit_estimator import auc_roc, brier_score
+from src.analysis.signal_extractor import extract_corpus
+from src.bootstrap.sequential_trainer import prediction_p_merge
+from src.reporting.ranker import fit_router
+
+BENCH = Path(__file__).resolve().parent
+GROUND_TRUTH = BENCH / "ground_truth.json"
+DUPLICATE_PAIRS = BENCH / "duplicate_pairs.json"
+SCORECARDS = BENCH / "scorecards"
+HARD_NEGATIVE_HOURS = 48.0
+# shown on every scorecard: the hard negatives must not come from a scorer under test
+HARD_NEGATIVES = (
+    f"non-duplicate pairs opened within {HARD_NEGATIVE_HOURS:g}h of each other by the same author "
+    "or under a shared non-size label; drawn without title or file similarity"
+)
+
+# PRs -> P(merge) per PR, NaN where the scorer abstains
+MergeScorer = Callable[[List[dict]], np.ndarray]
+# (a, b) PR number arrays -> duplicate score per pair in [0, 1]
+PairScorer = Callable[[np.ndarray, np.ndarray], np.ndarray]
+
+
+# -- frozen set -------------------------------------------------------------
+
+
+def build_ground_truth(prs_by_num: Mapping[int, dict], holdout: Sequence[int]) -> List[Dict[str, Any]]:
+    out = []
+    for n in sorted(int(x) for x in holdout):
+        pr = prs_by_num.get(n)
+        if pr is not None:
+            out.append({"number": n, "merged": bool(pr.get("merged_at")), "created_at": pr.get("created_at")})
+    return out
+
+
+def proximity_pairs(prs: Sequence[dict], hours: float = HARD_NEGATIVE_HOURS) -> Set[Tuple[int, int]]:
+    """PR pairs opened within ``hours`` of each other by one author or under one label.
+
+    ``size:`` labels are skipped; they say nothing about what a PR touches.
+    """
+    keyed: Dict[str, List[Tuple[float, int]]] = {}
+    for pr in prs:
+        if not pr.get("created_at"):
+            continue
+        t, n = to_epoch(pr["created_at"]), int(pr["number"])
+        keys = [f"label:{l['name'] if isinstance(l, dict) else l}" for l in pr.get("labels", []) or []]
+        keys = [k for k in keys if not k.startswith("label:size:")]
+        if pr.get("user"):
+            keys.append(f"user:{pr['user']}")
+        for k in keys:
+            keyed.setdefault(k, []).append((t, n))
+    window = hours * 3600.0
+    out: Set[Tuple[int, int]] = set()
+    for members in keyed.values():
+        members.sort()
+        lo = 0
+        for hi in range(len(members)):
+            while members[hi][0] - members[lo][0] > window:
+                lo += 1
+            for j in range(lo, hi):
+                a, b = sorted((members[j][1], members[hi][1]))
+                if a != b:
+                    out.add((a, b))
+    return out
+
+
+def build_duplicate_pairs(
+    prs: Sequence[dict],
+    clusters: Sequence[Sequence[int]],
+    n_random: int = 1000,
+    n_hard: int = 1000,
+    seed: int = 0,
+) -> List[Dict[str, Any]]:
+    """Every within-cluster pair, plus hard and random non-duplicates.
+
+    ``hard`` negatives are sampled from :func:`proximity_pairs` (see
+    :data:`HARD_NEGATIVES`), not from the dedupe blocking, so scoring a
+    blocker on them is not circular; ``random`` negatives estimate the
+    false positive rate on ordinary pairs.
+    """
+    positive = {tuple(sorted((int(a), int(b)))) for c in clusters for a, b in combinations(c, 2)}
+    rng = np.random.default_rng(seed)
+    near = sorted(proximity_pairs(prs) - positive)
+    picked = rng.choice(len(near), size=min(n_hard, len(near)), replace=False) if near else []
+    hard = {near[i] for i in picked}
+    nums = np.array(sorted(int(pr["number"]) for pr in prs))
+    random_neg: set = set()
+    while len(random_neg) < n_random and len(nums) > 1:
+        a, b = sorted(int(x) for x in rng.choice(nums, size=2, replace=False))
+        if (a, b) not in positive and (a, b) not in hard:
+            random_neg.add((a, b))
+    rows = [(p, True, "cluster") for p in positive] + [(p, False, "hard") for p in hard]
+    rows += [(p, False, "random") for p in random_neg]
+    return [{"a": a, "b": b, "duplicate": dup, "kind": kind} for (a, b), dup, kind in sorted(rows)]
+
+
+def freeze(
+    all_prs: Sequence[dict],
+    split: Mapping[str, Any],
+    refresh: bool = False,
+    gt_path: Path = GROUND_TRUTH,
+    pairs_path: Path = DUPLICATE_PAIRS,
+) -> Tuple[List[dict], List[dict]]:
+    """Load the benchmark set, writing it from split.json first if the files are empty."""
+    gt = json.load(gt_path.open()) if gt_path.exists() else []
+    pairs = json.load(pairs_path.open()) if pairs_path.exists() else []
+    if refresh or not gt:
+        gt = build_ground_truth({int(p["number"]): p for p in all_prs}, split["holdout"])
+        json.dump(gt, gt_path.open("w"), indent=1)
+    if refresh or not pairs:
+        pairs = build_duplicate_pairs(all_prs, split.get("dedupe_clusters", []))
+        json.dump(pairs, pairs_path.open("w"), indent=1)
+    return gt, pairs
+
+
+def set_digest(gt: Sequence[dict], pairs: Sequence[dict]) -> str:
+    payload = json.dumps([gt, pairs], sort_keys=True).encode()
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+# -- scorers ---------------------------------------------------------------
+
+
+class LogitScorer:
+    """The router fitted on the train split, scoring from corpus-wide features.
+
+    Features for every PR are extracted once, so author history and weekly
+    volume see the whole corpus exactly as they do in production.
+    """
+
+    def __init__(self, all_prs: Sequence[dict], train: Sequence[int], feature_sets: Mapping[str, Any], l2: float = 1.0) -> None:
+        self.all_prs = list(all_prs)
+        rows = extract_corpus(self.all_prs)
+        self.rows = {int(pr["number"]): row for pr, row in zip(self.all_prs, rows)}
+        train = [int(n) for n in train if int(n) in self.rows]
+        by_num = {int(pr["number"]): pr for pr in self.all_prs}
+        y = np.array([1.0 if by_num[n].get("merged_at") else 0.0 for n in train])
+        self.router = fit_router([self.rows[n] for n in train], y, feature_sets, l2=l2)
+
+    def __call__(self, prs: List[dict]) -> np.ndarray:
+        nums = [int(pr["number"]) for pr in prs]
+        return self.router.score_rows([self.rows[n] for n in nums], nums).p_merge
+
+
+def llm_scorer(
+    client,
+    build_prompt: Callable[[List[dict]], str],
+    prepare: Callable[[List[int]], List[dict]],
+    batch_size: int = 10,
+    workers: int = 4,
+) -> MergeScorer:
+    """Batch prompts through an LLMClient; PRs missing from a reply score NaN."""
+
+    def score(prs: List[dict]) -> np.ndarray:
+        nums = [int(pr["number"]) for pr in prs]
+        batches = [nums[i : i + batch_size] for i in range(0, len(nums), batch_size)]
+
+        def one(batch: List[int]) -> Dict[int, float]:
+            out = client.complete_json(build_prompt(prepare(batch)), default={}) or {}
+            got = {}
+            for pred in out.get("predictions", []) if isinstance(out, dict) else []:
+                try:
+                    got[int(pred["pr_number"])] = prediction_p_merge(pred)
+                except (KeyError, TypeError, ValueError):
+                    continue
+            return got
+
+        p: Dict[int, float] = {}
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for got in pool.map(one, batches):
+                p.update(got)
+        return np.array([p.get(n, np.nan) for n in nums], dtype=float)
+
+    return score
+
+
+def hybrid_scorer(logit: LogitScorer, review_fn, calibrator=None) -> MergeScorer:
+    """HybridScorer over the same router; context is every PR outside the scored set."""
+
+    def score(prs: List[dict]) -> np.ndarray:
+        scored = {int(pr["number"]) for pr in prs}
+        context = [pr for pr in logit.all_prs if int(pr["number"]) not in scored]
+        hybrid = HybridScorer(logit.router, review_fn, calibrator=calibrator)
+        p = {r["number"]: r["p_final"] for r in hybrid.score(prs, context=context)}
+        return np.array([p[int(pr["number"])] for pr in prs], dtype=float)
+
+    return score
+
+
+def pair_lookup(scores: Mapping[Tuple[int, int], float]) -> PairScorer:
+    def score(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        lo, hi = np.minimum(a, b), np.maximum(a, b)
+        return np.fromiter((scores.get((int(x), int(y)), 0.0) for x, y in zip(lo, hi)), dtype=float, count=len(a))
+
+    return score
+
+
+def minhash_pair_scorer(prs: Sequence[dict]) -> PairScorer:
+    """Blocking similarity from :func:`candidate_pairs`; unproposed pairs score 0."""
+    return pair_lookup(candidate_pairs(prs, min_similarity=0.0))
+
+
+def recorded_pair_scorer(duplicates: Mapping[tuple, Mapping[str, Any]]) -> PairScorer:
+    """Confidence of recorded LLM duplicate clusters (e.g. ``ReplayStore.duplicates``)."""
+    scores: Dict[Tuple[int, int], float] = {}
+    for members, dup in duplicates.items():
+        conf = float(dup.get("confidence", 1.0) or 0.0)
+        for a, b in combinations(sorted(members), 2):
+            scores[(a, b)] = max(conf, scores.get((a, b), 0.0))
+    return pair_lookup(scores)
+
+
+# -- metrics ---------------------------------------------------------------
+
+
+def merge_metrics(y: np.ndarray, p: np.ndarray, threshold: float = 0.5, bins: int = 10) -> Dict[str, Any]:
+    covered = ~np.isnan(p)
+    y, p = y[covered], p[covered]
+    if not len(y):
+        return {"coverage": 0.0, "n": 0}
+    pred = p >= threshold
+    tp = int((pred & (y > 0.5)).sum())
+    fp = int((pred & (y < 0.5)).sum())
+    fn = int((~pred & (y > 0.5)).sum())
+    prec = tp / (tp + fp) if tp + fp else 0.0
+    rec = tp / (tp + fn) if tp + fn else 0.0
+    pc = np.clip(p, 1e-6, 1 - 1e-6)
+    idx = np.minimum((p * bins).astype(int), bins - 1)
+    count = np.bincount(idx, minlength=bins)
+    gap = np.abs(np.bincount(idx, weights=p, minlength=bins) - np.bincount(idx, weights=y, minlength=bins))
+    return {
+        "coverage": round(float(covered.mean()), 6),
+        "n": int(len(y)),
+        "accuracy": round(float((pred == (y > 0.5)).mean()), 6),
+        "precision": round(prec, 6),
+        "recall": round(rec, 6),
+        "f1": round(2 * prec * rec / (prec + rec) if prec + rec else 0.0, 6),
+        "auc": round(auc_roc(y, p), 6),
+        "brier": round(brier_score(y, p), 6),
+        "log_loss": round(float(-np.mean(y * np.log(pc) + (1 - y) * np.log(1 - pc))), 6),
+        "ece": round(float(gap.sum() / len(y)), 6) if count.sum() else None,
+    }
+
+
+def pair_metrics(y: np.ndarray, s: np.ndarray, kinds: np.ndarray, threshold: float = 0.5) -> Dict[str, Any]:
+    pred = s >= threshold
+    tp = int((pred & y).sum())
+    fp = int((pred & ~y).sum())
+    fn = int((~pred & y).sum())
+    prec = tp / (tp + fp) if tp + fp else 0.0
+    rec = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        "n": int(len(y)),
+        "precision": round(prec, 6),
+        "recall": round(rec, 6),
+        "f1": round(2 * prec * rec / (prec + rec) if prec + rec else 0.0, 6),
+        "auc": round(auc_roc(y.astype(float), s), 6),
+        "false_positive_rate": {
+            str(k): round(float(pred[kinds == k].mean()), 6) for k in np.unique(kinds[~y])
+        },
+    }
+
+
+def evaluate(
+    gt: Sequence[dict],
+    pairs: Sequence[dict],
+    prs_by_num: Mapping[int, dict],
+    merge_scorers: Mapping[str, MergeScorer],
+    pair_scorers: Mapping[str, PairScorer],
+) -> Dict[str, Any]:
+    """Score every scorer on the whole set in one call each; timings alongside."""
+    prs = [prs_by_num[int(r["number"])] for r in gt if int(r["number"]) in prs_by_num]
+    y = np.array([1.0 if r["merged"] else 0.0 for r in gt if int(r["number"]) in prs_by_num])
+    merge: Dict[str, Any] = {}
+    for name, scorer in merge_scorers.items():
+        started = time.perf_counter()
+        p = np.asarray(scorer(prs), dtype=float)
+        seconds = time.perf_counter() - started
+        merge[name] = merge_metrics(y, p)
+        merge[name]["seconds"] = round(seconds, 4)
+        merge[name]["prs_per_second"] = round(len(prs) / seconds, 1) if seconds > 0 else None
+
+    a = np.array([int(r["a"]) for r in pairs])
+    b = np.array([int(r["b"]) for r in pairs])
+    dup = np.array([bool(r["duplicate"]) for r in pairs])
+    kinds = np.array([str(r.get("kind", "")) for r in pairs])
+    dedupe: Dict[str, Any] = {}
+    for name, scorer in pair_scorers.items():
+        started = time.perf_counter()
+        s = np.asarray(scorer(a, b), dtype=float)
+        seconds = time.perf_counter() - started
+        dedupe[name] = pair_metrics(dup, s, kinds)
+        dedupe[name]["seconds"] = round(seconds, 4)
+    return {"merge": merge, "dedupe": dedupe}
+
+
+# -- scorecards ------------------------------------------------------------
+
+HIGHER_IS_BETTER = ("accuracy", "f1", "auc", "coverage")
+LOWER_IS_BETTER = ("brier", "log_loss", "ece")
+
+
+def previous_scorecard(digest: str, version: Optional[str], directory: Path = SCORECARDS) -> Optional[Dict[str, Any]]:
+    """Latest scorecard on the same benchmark set from another code version."""
+    if not directory.exists():
+        return None
+    cards = []
+    for path in directory.glob("*.json"):
+        card = json.load(path.open())
+        if card.get("benchmark_set") == digest and card.get("version") != version:
+            cards.append(card)
+    return max(cards, key=lambda c: c.get("timestamp", ""), default=None)
+
+
+def accuracy_regressions(card: Mapping[str, Any], prev: Optional[Mapping[str, Any]], max_drop: float = 0.01) -> List[Dict[str, Any]]:
+    """Metrics that got worse than ``max_drop`` vs the previous version's scorecard."""
+    if prev is None:
+        return []
+    out = []
+    for section in ("merge", "dedupe"):
+        for name, metrics in card.get(section, {}).items():
+            before = prev.get(section, {}).get(name)
+            if not before:
+                continue
+            for key, value in metrics.items():
+                old = before.get(key)
+                if not isinstance(value, (int, float)) or not isinstance(old, (int, float)):
+                    continue
+                worse = old - value if key in HIGHER_IS_BETTER else value - old if key in LOWER_IS_BETTER else 0.0
+                if worse > max_drop:
+                    out.append({"section": section, "scorer": name, "metric": key, "before": old, "after": value})
+    return out
+
+
+def render_scorecard(card: Mapping[str, Any]) -> str:
+    """Accuracy and speed for one code version, side by side."""
+    lines = [f"# Scorecard {card.get('version')} (set {card.get('benchmark_set')})", ""]
+    lines += ["| scorer | coverage | acc | F1 | AUC | Brier | ECE | PRs/s |", "|---|---|---|---|---|---|---|---|"]
+    for name, m in card.get("merge", {}).items():
+        lines.append(
+            f"| {name} | {m.get('coverage', 0):.2f} | {m.get('accuracy', 0):.3f} | {m.get('f1', 0):.3f} | "
+            f"{m.get('auc', 0):.3f} | {m.get('brier', 0):.3f} | {m.get('ece') or 0:.3f} | {m.get('prs_per_second')} |"
+        )
+    lines += ["", "| dedupe scorer | precision | recall | F1 | AUC | FPR hard | FPR random | seconds |", "|---|---|---|---|---|---|---|---|"]
+    for name, m in card.get("dedupe", {}).items():
+        fpr = m.get("false_positive_rate", {})
+        lines.append(
+            f"| {name} | {m['precision']:.3f} | {m['recall']:.3f} | {m['f1']:.3f} | {m['auc']:.3f} | "
+            f"{fpr.get('hard', 0):.3f} | {fpr.get('random', 0):.3f} | {m['seconds']} |"
+        )
+    lines.append(f"\nhard negatives: {card.get('hard_negatives') or HARD_NEGATIVES}")
+    speed = card.get("speed") or {}
+    if speed.get("sizes"):
+        lines += ["", "| corpus | pipeline seconds | peak RSS MB | broke at |", "|---|---|---|---|"]
+        for label, s in speed["sizes"].items():
+            lines.append(f"| {label} | {s.get('total_seconds')} | {s.get('peak_rss_mb')} | {s.get('broke_at') or '—'} |")
+    if card.get("regressions"):
+        lines += ["", "Regressions:"] + [f"- {json.dumps(r)}" for r in card["regressions"]]
+    return "\n".join(lines) + "\n"
@@ -1 +1,535 @@
 """Run benchmark suite against curated ground truth datasets."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from statistics import median
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA = ROOT / "data"
+SCRIPTS = ROOT / "scripts"
+BENCH = Path(__file__).resolve().parent
+THRESHOLDS = BENCH / "thresholds.json"
+STAGES = ("load", "sanitize", "author_stats", "features", "dedupe_candidates", "logit_fit", "scoring", "render")
+
+sys.path.insert(0, str(SCRIPTS))
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(BENCH))
+import accuracy
+import numpy as np
+import run_experiment
+from sanitize import sanitize_pr
+from synthetic import CACHE, SIZES, corpus_path
+from src.analysis.deduplicator import candidate_pairs
+from src.analysis.signal_extractor import author_history, extract_corpus
+from src.analysis.deep_reviewer import llm_reviewer
+from src.bootstrap.sequential_trainer import Corpus, ExperimentRunner, PromptContext
+from src.reporting.ranker import fit_router
+from src.reporting.renderer import render_ranking, render_summary
+from src.utils.llm import DEFAULT_MODEL, LLMClient, RateLimiter, ReplayBackend, ReplayStore, http_backend
+
+# timings are host-specific, so the history lives with the (untracked) corpora
+HISTORY = CACHE / "history.jsonl"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_stages(path: Path) -> Iterator[Dict[str, Any]]:
+    """Time each hot-path stage over the corpus at ``path``, one record per stage.
+
+    Stages run in pipeline order, each on the previous stage's output.
+    ``peak_rss_mb`` is the process high-water mark after the stage, so the
+    stage where it jumps is the one that set it.
+    """
+    feature_sets = json.load((ROOT / "model_spec.json").open())["feature_sets"]
+    state: Dict[str, Any] = {}
+
+    def load() -> int:
+        state["prs"] = json.load(path.open())
+        return len(state["prs"])
+
+    def sanitize() -> int:
+        state["clean"] = [sanitize_pr(pr) for pr in state["prs"]]
+        return len(state["clean"])
+
+    def author_stats() -> int:
+        return len(author_history(state["prs"]))
+
+    def features() -> int:
+        state["rows"] = extract_corpus(state["prs"])
+        return len(state["rows"])
+
+    def dedupe_candidates() -> int:
+        state["pairs"] = candidate_pairs(state["prs"])
+        return len(state["prs"])
+
+    def logit_fit() -> int:
+        y = np.array([1.0 if pr.get("merged_at") else 0.0 for pr in state["prs"]])
+        state["router"] = fit_router(state["rows"], y, feature_sets)
+        return len(y)
+
+    def scoring() -> int:
+        state["table"] = state["router"].score_rows(state["rows"], [int(pr["number"]) for pr in state["prs"]])
+        return len(state["table"])
+
+    def render() -> int:
+        records = state["table"].records()
+        titles = {int(pr["number"]): pr.get("title", "") for pr in state["prs"]}
+        render_ranking(records, titles, limit=50)
+        render_summary(records)
+        return len(records)
+
+    for name, fn in zip(STAGES, (load, sanitize, author_stats, features, dedupe_candidates, logit_fit, scoring, render)):
+        started = time.perf_counter()
+        items = fn()
+        seconds = time.perf_counter() - started
+        record = {
+            "stage": name,
+            "seconds": round(seconds, 4),
+            "items": items,
+            "items_per_second": round(items / seconds, 1) if seconds > 0 else None,
+            "peak_rss_mb": _peak_rss_mb(),
+        }
+        if name == "dedupe_candidates":
+            record["pairs"] = len(state["pairs"])
+        yield record
+
+
+def run_size(label: str, n: int, seed: int, timeout: float) -> Dict[str, Any]:
+    """One corpus size in a fresh interpreter, so peak RSS is per size.
+
+    The worker streams one JSON line per finished stage; on timeout the
+    first unfinished stage is reported as the one that broke.
+    """
+    subprocess.run([sys.executable, __file__, "_generate", str(n), "--seed", str(seed)], check=True)
+    path = corpus_path(n, seed)
+    proc = subprocess.Popen(
+        [sys.executable, __file__, "_worker", str(path)], stdout=subprocess.PIPE, text=True
+    )
+    timed_out = False
+    try:
+        stdout, _ = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        stdout, _ = proc.communicate()
+        timed_out = True
+    stages = {}
+    for line in stdout.splitlines():
+        if line.startswith("{"):
+            rec = json.loads(line)
+            stages[rec.pop("stage")] = rec
+    broke = next((s for s in STAGES if s not in stages), None) if (timed_out or proc.returncode) else None
+    return {
+        "n": n,
+        "stages": stages,
+        "total_seconds": round(sum(r["seconds"] for r in stages.values()), 4),
+        "peak_rss_mb": max((r["peak_rss_mb"] for r in stages.values()), default=None),
+        "broke_at": broke,
+        "failure": "timeout" if timed_out else (f"exit {proc.returncode}" if proc.returncode else None),
+    }
+
+
+def scaling(sizes: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    """Empirical exponent k in ``time ~ n^k`` per stage between consecutive sizes."""
+    ordered = sorted(sizes.items(), key=lambda kv: kv[1]["n"])
+    out: Dict[str, Dict[str, float]] = {}
+    for (la, a), (lb, b) in zip(ordered, ordered[1:]):
+        key = f"{la}->{lb}"
+        out[key] = {}
+        for stage in STAGES:
+            ta = a["stages"].get(stage, {}).get("seconds")
+            tb = b["stages"].get(stage, {}).get("seconds")
+            if ta and tb and ta > 1e-3:
+                out[key][stage] = round(math.log(tb / ta) / math.log(b["n"] / a["n"]), 2)
+    return out
+
+
+def git_revision() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "-C", str(ROOT), "describe", "--always", "--dirty"], capture_output=True, text=True)
+    except OSError:
+        return None
+    return out.stdout.strip() or None
+
+
+def load_history(path: Path = HISTORY) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    rows = []
+    for line in path.open():
+        line = line.strip()
+        if line:
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return rows
+
+
+def check_regressions(
+    run: Dict[str, Any], history: Sequence[Dict[str, Any]], thresholds: Dict[str, Any]
+) -> List[Dict[str, Any]]:
+    """Stages slower (or fatter) than the thresholds allow vs the recent same-host median.
+
+    Also flags any size that failed to finish and any stage over its
+    absolute budget in ``thresholds["budgets"][size][stage]`` (seconds).
+    """
+    window = int(thresholds.get("baseline_runs", 5))
+    slowdown = float(thresholds.get("max_slowdown", 1.3))
+    rss_growth = float(thresholds.get("max_rss_growth", 1.25))
+    floor = float(thresholds.get("min_seconds", 0.05))
+    budgets = thresholds.get("budgets", {})
+    same_host = [h for h in history if h.get("host") == run.get("host")][-window:]
+
+    out: List[Dict[str, Any]] = []
+    for label, res in run["sizes"].items():
+        if res.get("failure"):
+            out.append({"size": label, "stage": res.get("broke_at"), "kind": res["failure"]})
+        for stage, rec in res["stages"].items():
+            budget = budgets.get(label, {}).get(stage)
+            if budget is not None and rec["seconds"] > budget:
+                out.append({"size": label, "stage": stage, "kind": "budget", "seconds": rec["seconds"], "limit": budget})
+            base = [h["sizes"][label]["stages"][stage]["seconds"] for h in same_host if stage in h.get("sizes", {}).get(label, {}).get("stages", {})]
+            if base and rec["seconds"] > floor and rec["seconds"] > slowdown * median(base):
+                out.append({"size": label, "stage": stage, "kind": "slowdown", "seconds": rec["seconds"], "baseline": round(median(base), 4)})
+        base_rss = [h["sizes"][label]["peak_rss_mb"] for h in same_host if h.get("sizes", {}).get(label, {}).get("peak_rss_mb")]
+        if base_rss and res.get("peak_rss_mb") and res["peak_rss_mb"] > rss_growth * median(base_rss):
+            out.append({"size": label, "stage": None, "kind": "rss", "peak_rss_mb": res["peak_rss_mb"], "baseline": median(base_rss)})
+    return out
+
+
+def benchmark_stages(sizes: Sequence[str], seed: int = 0, timeout: float = 1800.0) -> Dict[str, Any]:
+    results = {label: run_size(label, SIZES[label], seed, timeout) for label in sizes}
+    return {
+        "benchmark": "stages",
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_rev": git_revision(),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "seed": seed,
+        "sizes": results,
+        "scaling": scaling(results),
+    }
+
+
+def benchmark_pipeline(
+    arms: Sequence[str] = ("v4",),
+    replay_dirs: Sequence[Path] = (DATA / "bootstrap_v2", DATA / "bootstrap_v3"),
+    samples_from: Path = DATA / "bootstrap_v2",
+    all_prs: Path = DATA / "all_historical_prs.json",
+    rounds: int = 3,
+    max_batches: int = 0,
+    latency: float = 0.05,
+    jitter: float = 0.02,
+    error_rate: float = 0.0,
+    malformed_rate: float = 0.0,
+    backoff: float = 0.01,
+    batch_workers: int = 4,
+    seed: int = 42,
+    out_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """End-to-end bootstrap rounds against a replayed LLM.
+
+    The arms' prompt builders, response parsing, retries, scoring and
+    consolidation all run for real; only the model is replaced by recorded
+    responses with synthetic latency and injected faults. Learning scripts
+    run with ``--dry-run`` so nothing leaves the machine.
+    """
+    store = ReplayStore.from_dirs(*[Path(d) for d in replay_dirs])
+    backend = ReplayBackend(
+        store, latency=latency, jitter=jitter, error_rate=error_rate, malformed_rate=malformed_rate, seed=seed
+    )
+    client = LLMClient(model=DEFAULT_MODEL, backend=backend, limiter=RateLimiter(0), backoff_seconds=backoff)
+
+    population = json.loads(all_prs.read_text())
+    feature_spec = json.load((ROOT / "model_spec.json").open())["features"]
+    corpus = Corpus(
+        prs={int(p["number"]): p for p in population},
+        prs_path=all_prs,
+        feature_spec=feature_spec,
+        split_path=DATA / "split.json",
+    )
+    preset_args = argparse.Namespace(
+        batch_workers=batch_workers,
+        prior_start_round=4,
+        prior_window=3,
+        prior_per_round=10,
+        discover_max_new=5,
+        discover_active_cap=20,
+    )
+    available = run_experiment.presets(preset_args, feature_spec)
+
+    def sample(r: int) -> dict:
+        return json.load((samples_from / f"round_{r}_sample.json").open())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = out_dir or Path(tmp)
+        runner = ExperimentRunner(
+            [available[a]() for a in arms],
+            corpus,
+            client,
+            out,
+            sample_fn=sample,
+            rounds=rounds,
+            seed=seed,
+            max_batches=max_batches,
+            dry_run=True,
+        )
+        started = time.perf_counter()
+        comparison = runner.run()
+        wall = time.perf_counter() - started
+        requested = predicted = 0
+        for arm in arms:
+            for r in range(1, rounds + 1):
+                s = sample(r)
+                batches = sorted(s["batch_assignments"], key=int)
+                if max_batches:
+                    batches = batches[:max_batches]
+                requested += sum(len(s["batch_assignments"][b]) for b in batches)
+                results = out / arm / f"round_{r}_results.json"
+                if results.exists():
+                    predicted += len(json.load(results.open())["predictions"])
+
+    return {
+        "benchmark": "pipeline_replay",
+        "arms": list(arms),
+        "rounds": rounds,
+        "config": {
+            "latency": latency,
+            "jitter": jitter,
+            "error_rate": error_rate,
+            "malformed_rate": malformed_rate,
+            "batch_workers": batch_workers,
+            "seed": seed,
+        },
+        "wall_seconds": round(wall, 3),
+        "prs_requested": requested,
+        "prs_predicted": predicted,
+        "coverage": round(predicted / requested, 6) if requested else None,
+        "prs_per_second": round(predicted / wall, 3) if wall > 0 else None,
+        "client": {k: round(v, 3) if isinstance(v, float) else v for k, v in client.stats.items()},
+        "replay": dict(backend.stats),
+        "arm_results": comparison["arms"],
+    }
+
+
+def benchmark_accuracy(
+    scorers: Sequence[str] = ("logit",),
+    llm_backend: str = "replay",
+    replay_dirs: Sequence[Path] = (DATA / "bootstrap_v2", DATA / "bootstrap_v3"),
+    refresh: bool = False,
+    max_drop: float = 0.01,
+    history: Path = HISTORY,
+) -> Dict[str, Any]:
+    """Score the frozen holdout/dedupe set and build this version's scorecard.
+
+    ``llm`` and ``hybrid`` go through an LLMClient on ``llm_backend``
+    (``replay`` serves recorded runs offline and abstains on unrecorded
+    PRs; ``http`` calls the API). The latest stage-benchmark run on this
+    host is attached so accuracy and speed sit on one report.
+    """
+    all_prs = json.load((DATA / "all_historical_prs.json").open())
+    split = json.load((DATA / "split.json").open())
+    gt, pairs = accuracy.freeze(all_prs, split, refresh=refresh)
+    prs_by_num = {int(p["number"]): p for p in all_prs}
+    feature_sets = json.load((ROOT / "model_spec.json").open())
+    feature_spec, feature_sets = feature_sets["features"], feature_sets["feature_sets"]
+
+    store = ReplayStore.from_dirs(*[Path(d) for d in replay_dirs], fill_missing=False)
+    merge_scorers: Dict[str, accuracy.MergeScorer] = {}
+    logit = accuracy.LogitScorer(all_prs, split["train"], feature_sets)
+    if "logit" in scorers:
+        merge_scorers["logit"] = logit
+    if "llm" in scorers or "hybrid" in scorers:
+        backend = ReplayBackend(store) if llm_backend == "replay" else http_backend
+        client = LLMClient(model=DEFAULT_MODEL, backend=backend, limiter=RateLimiter(0 if llm_backend == "replay" else 50))
+        corpus = Corpus(prs=prs_by_num, prs_path=DATA / "all_historical_prs.json", feature_spec=feature_spec, split_path=DATA / "split.json")
+        preset = run_experiment.presets(argparse.Namespace(batch_workers=4, prior_start_round=4, prior_window=3, prior_per_round=10, discover_max_new=5, discover_active_cap=20), feature_spec)["v4"]()
+        if "llm" in scorers:
+            merge_scorers["llm"] = accuracy.llm_scorer(
+                client, lambda batch: preset.prompt_builder(PromptContext(0, batch, feature_spec)), corpus.batch
+            )
+        if "hybrid" in scorers:
+            merge_scorers["hybrid"] = accuracy.hybrid_scorer(logit, llm_reviewer(client.complete))
+
+    pair_scorers = {"minhash": accuracy.minhash_pair_scorer(all_prs)}
+    if store.duplicates:
+        pair_scorers["llm_recorded"] = accuracy.recorded_pair_scorer(store.duplicates)
+
+    card = accuracy.evaluate(gt, pairs, prs_by_num, merge_scorers, pair_scorers)
+    version = git_revision()
+    host = platform.node()
+    runs = [h for h in load_history(history) if h.get("host") == host]
+    card.update(
+        {
+            "version": version,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "benchmark_set": accuracy.set_digest(gt, pairs),
+            "n_prs": len(gt),
+            "n_pairs": len(pairs),
+            "hard_negatives": accuracy.HARD_NEGATIVES,
+            "speed": {
+                "git_rev": runs[-1].get("git_rev"),
+                "sizes": {
+                    label: {k: res.get(k) for k in ("total_seconds", "peak_rss_mb", "broke_at")}
+                    for label, res in runs[-1]["sizes"].items()
+                },
+            }
+            if runs
+            else None,
+        }
+    )
+    prev = accuracy.previous_scorecard(card["benchmark_set"], version)
+    card["compared_to"] = prev.get("version") if prev else None
+    card["regressions"] = accuracy.accuracy_regressions(card, prev, max_drop=max_drop)
+    return card
+
+
+def _format_stages(run: Dict[str, Any]) -> str:
+    labels = list(run["sizes"])
+    lines = ["| stage | " + " | ".join(labels) + " |", "|---" * (len(labels) + 1) + "|"]
+    for stage in STAGES:
+        cells = []
+        for label in labels:
+            rec = run["sizes"][label]["stages"].get(stage)
+            broke = run["sizes"][label].get("broke_at") == stage
+            cells.append("BROKE" if broke else ("—" if rec is None else f"{rec['seconds']:.3f}s"))
+        lines.append(f"| {stage} | " + " | ".join(cells) + " |")
+    lines.append("| peak RSS | " + " | ".join(f"{run['sizes'][l]['peak_rss_mb']} MB" for l in labels) + " |")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd")
+
+    st = sub.add_parser("stages", help="time pipeline hot paths on synthetic corpora")
+    st.add_argument("--sizes", default="3k,30k", help=f"comma-separated from {sorted(SIZES)}")
+    st.add_argument("--seed", type=int, default=0)
+    st.add_argument("--timeout", type=float, default=1800.0, help="seconds per corpus size")
+    st.add_argument("--history", type=Path, default=HISTORY)
+    st.add_argument("--thresholds", type=Path, default=THRESHOLDS)
+    st.add_argument("--no-record", action="store_true", help="do not append to the history file")
+    st.add_argument("--check", action="store_true", help="exit 1 on regressions")
+    st.add_argument("--output", type=Path, default=None)
+
+    rp = sub.add_parser("replay", help="end-to-end bootstrap rounds against a replayed LLM")
+    rp.add_argument("--arms", default="v4")
+    rp.add_argument("--replay-dir", type=Path, action="append", default=None, help="recorded run dir (repeatable)")
+    rp.add_argument("--samples-from", type=Path, default=DATA / "bootstrap_v2")
+    rp.add_argument("--all-prs", type=Path, default=DATA / "all_historical_prs.json")
+    rp.add_argument("--rounds", type=int, default=3)
+    rp.add_argument("--max-batches", type=int, default=0)
+    rp.add_argument("--latency", type=float, default=0.05, help="seconds per LLM call")
+    rp.add_argument("--jitter", type=float, default=0.02)
+    rp.add_argument("--error-rate", type=float, default=0.0, help="probability of an injected 429/529")
+    rp.add_argument("--malformed-rate", type=float, default=0.0, help="probability of a malformed JSON reply")
+    rp.add_argument("--backoff", type=float, default=0.01, help="retry backoff seconds (60 against the real API)")
+    rp.add_argument("--batch-workers", type=int, default=4)
+    rp.add_argument("--seed", type=int, default=42)
+    rp.add_argument("--keep", type=Path, default=None, help="keep run artifacts in this dir")
+    rp.add_argument("--output", type=Path, default=None)
+
+    ac = sub.add_parser("accuracy", help="score the frozen holdout and dedupe set; write a versioned scorecard")
+    ac.add_argument("--scorers", default="logit", help="comma-separated: logit,llm,hybrid")
+    ac.add_argument("--llm-backend", choices=["replay", "http"], default="replay")
+    ac.add_argument("--replay-dir", type=Path, action="append", default=None)
+    ac.add_argument("--refresh", action="store_true", help="rebuild ground_truth.json / duplicate_pairs.json from split.json")
+    ac.add_argument("--thresholds", type=Path, default=THRESHOLDS)
+    ac.add_argument("--check", action="store_true", help="exit 1 on accuracy regressions")
+
+    gen = sub.add_parser("_generate")
+    gen.add_argument("n", type=int)
+    gen.add_argument("--seed", type=int, default=0)
+    wk = sub.add_parser("_worker")
+    wk.add_argument("corpus", type=Path)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "_generate":
+        corpus_path(args.n, args.seed)
+        return
+    if args.cmd == "_worker":
+        for rec in run_stages(args.corpus):
+            print(json.dumps(rec), flush=True)
+        return
+    if args.cmd == "replay":
+        report = benchmark_pipeline(
+            arms=[a.strip() for a in args.arms.split(",") if a.strip()],
+            replay_dirs=args.replay_dir or [DATA / "bootstrap_v2", DATA / "bootstrap_v3"],
+            samples_from=args.samples_from,
+            all_prs=args.all_prs,
+            rounds=args.rounds,
+            max_batches=args.max_batches,
+            latency=args.latency,
+            jitter=args.jitter,
+            error_rate=args.error_rate,
+            malformed_rate=args.malformed_rate,
+            backoff=args.backoff,
+            batch_workers=args.batch_workers,
+            seed=args.seed,
+            out_dir=args.keep,
+        )
+        text = json.dumps(report, indent=2)
+        if args.output:
+            args.output.parent.mkdir(parents=True, exist_ok=True)
+            args.output.write_text(text)
+        print(text)
+        return
+    if args.cmd == "accuracy":
+        thresholds = json.load(args.thresholds.open()) if args.thresholds.exists() else {}
+        card = benchmark_accuracy(
+            scorers=[x.strip() for x in args.scorers.split(",") if x.strip()],
+            llm_backend=args.llm_backend,
+            replay_dirs=args.replay_dir or [DATA / "bootstrap_v2", DATA / "bootstrap_v3"],
+            refresh=args.refresh,
+            max_drop=float(thresholds.get("max_accuracy_drop", 0.01)),
+        )
+        accuracy.SCORECARDS.mkdir(parents=True, exist_ok=True)
+        path = accuracy.SCORECARDS / f"{card['version'] or 'unversioned'}.json"
+        json.dump(card, path.open("w"), indent=2)
+        print(accuracy.render_scorecard(card))
+        print(f"wrote {path}")
+        if args.check and card["regressions"]:
+            sys.exit(1)
+        return
+    if args.cmd != "stages":
+        ap.print_help()
+        return
+
+    labels = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    unknown = [l for l in labels if l not in SIZES]
+    if unknown:
+        raise SystemExit(f"unknown sizes: {unknown} (choose from {sorted(SIZES)})")
+    run = benchmark_stages(labels, seed=args.seed, timeout=args.timeout)
+    thresholds = json.load(args.thresholds.open()) if args.thresholds.exists() else {}
+    run["regressions"] = check_regressions(run, load_history(args.history), thresholds)
+    if not args.no_record:
+        args.history.parent.mkdir(parents=True, exist_ok=True)
+        with args.history.open("a") as f:
+            f.write(json.dumps(run) + "\n")
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(run, indent=2))
+    print(_format_stages(run))
+    print(json.dumps({"scaling": run["scaling"], "regressions": run["regressions"]}, indent=2))
+    if args.check and run["regressions"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
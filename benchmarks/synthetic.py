@@ -0,0 +1,89 @@
+"""Deterministic synthetic PR corpora shaped like the historical dataset."""
+
+from __future__ import annotations
+
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA = ROOT / "data"
+CACHE = Path(__file__).resolve().parent / ".cache"
+SIZES = {"3k": 3_000, "30k": 30_000, "300k": 300_000}
+RICH_FIELDS = ("additions", "deletions", "changedFiles", "files", "comments", "reviews")
+MAX_COMMENT_CHARS = 400
+
+
+def _templates() -> tuple:
+    meta = json.load((DATA / "all_historical_prs.json").open())
+    rich: Dict[int, dict] = {}
+    path = DATA / "enriched_sample.jsonl"
+    if path.exists():
+        for line in path.open():
+            if line.strip():
+                row = json.loads(line)
+                rich[int(row["number"])] = row
+    return meta, list(rich.values())
+
+
+def _trim(rich: dict) -> dict:
+    out = {k: rich[k] for k in RICH_FIELDS if k in rich}
+    out["comments"] = [dict(c, body=str(c.get("body", ""))[:MAX_COMMENT_CHARS]) for c in rich.get("comments") or []]
+    out["reviews"] = [dict(r, body=str(r.get("body", ""))[:MAX_COMMENT_CHARS]) for r in rich.get("reviews") or []]
+    return out
+
+
+def synthesize(n: int, seed: int = 0, rich_fraction: float = 0.25, dup_fraction: float = 0.08) -> List[dict]:
+    """``n`` PRs resampled from the real corpus.
+
+    Metadata (state, labels, timestamps, sizes) is drawn from real PRs and
+    the created time keeps the real time span, so weekly volume grows with
+    ``n``. The author pool grows with ``n`` and keeps the real PRs-per-author
+    skew. ``rich_fraction`` of PRs get files/comments/reviews from the
+    enriched sample; ``dup_fraction`` reuse an earlier title with a word
+    dropped, so dedupe sees realistic near-duplicate density.
+    """
+    meta, rich = _templates()
+    rng = np.random.default_rng(seed)
+
+    per_author = np.array(sorted(Counter(p.get("user", "") for p in meta).values(), reverse=True), dtype=float)
+    n_authors = max(len(per_author), int(round(len(per_author) * n / len(meta))))
+    weights = np.resize(per_author, n_authors)
+    author_of = rng.choice(n_authors, size=n, p=weights / weights.sum())
+
+    template_idx = rng.integers(0, len(meta), size=n)
+    rich_mask = rng.random(n) < rich_fraction if rich else np.zeros(n, dtype=bool)
+    rich_idx = rng.integers(0, max(len(rich), 1), size=n)
+    dup_mask = rng.random(n) < dup_fraction
+    dup_src = (rng.random(n) * np.arange(n)).astype(int)
+
+    out: List[dict] = []
+    for i in range(n):
+        t = meta[template_idx[i]]
+        pr = {k: v for k, v in t.items() if k not in ("requested_reviewers", "milestone")}
+        pr["number"] = i + 1
+        pr["user"] = f"author{author_of[i]}"
+        if dup_mask[i] and i > 0:
+            words = out[dup_src[i]]["title"].split()
+            if len(words) > 2:
+                del words[int(rng.integers(0, len(words)))]
+            pr["title"] = " ".join(words)
+        if rich_mask[i]:
+            pr.update(_trim(rich[rich_idx[i]]))
+        out.append(pr)
+    return out
+
+
+def corpus_path(n: int, seed: int = 0) -> Path:
+    """Cached corpus file for size ``n``, generating it on first use."""
+    path = CACHE / f"synthetic_{n}_s{seed}.json"
+    if not path.exists():
+        CACHE.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with tmp.open("w") as f:
+            json.dump(synthesize(n, seed=seed), f)
+        tmp.replace(path)
+    return path
@@ -12,7 +12,6 @@ import argparse
 import json
 import math
 import os
-import random
 import shutil
 import subprocess
 import sys
@@ -30,7 +29,11 @@ MODEL_SPEC = ROOT / "model_spec.json"
 MODEL_ID = "claude-haiku-4-5"
 
 sys.path.insert(0, str(SCRIPTS))
+sys.path.insert(0, str(ROOT))
 from sanitize import sanitize_pr
+from src.analysis.deduplicator import pack_batches
+from src.bootstrap.sampler import StratifiedSampler
+from src.utils.llm import fit_pr_sections
 
 
 def log_line(path: Path, msg: str) -> None:
@@ -172,8 +175,8 @@ def format_pr_for_prompt(pr: dict) -> str:
     prior_merged = int(pr.get("prior_merged", 0))
     merge_rate = float(pr.get("merge_rate", 0.0))
 
-    body = (pr.get("body") or "")[:500]
-    greptile_summary = extract_greptile_summary(pr.get("body") or "")
+    sections, fitted = fit_pr_sections(pr, extract_greptile_summary(pr.get("body") or ""))
+    body = fitted["body"][0] if fitted["body"] else ""
 
     # Enrichment v2 fields
     max_same_day = pr.get("author_max_prs_same_day", "?")
@@ -201,42 +204,14 @@ def format_pr_for_prompt(pr: dict) -> str:
 - **Body (truncated):** {body}
 """
 
-    if greptile_summary:
-        text += f"\n### Greptile Review Summary:\n{greptile_summary}\n"
+    if fitted["greptile"]:
+        text += f"\n### Greptile Review Summary:\n{fitted['greptile'][0]}\n"
 
-    comments = pr.get("comments", []) or []
-    if comments:
-        text += f"\n### Comments ({len(comments)}):\n"
-        for c in comments[:10]:
-            if not isinstance(c, dict):
-                continue
-            user = c.get("author", {}).get("login") if isinstance(c.get("author"), dict) else c.get("user")
-            user = user or "?"
-            assoc = c.get("authorAssociation") or c.get("author_association") or ""
-            cbody = (c.get("body", "") or "").replace("\n", " ")[:300]
-            text += f"- **{user}** ({assoc}): {cbody}\n"
-
-    reviews = pr.get("reviews", []) or []
-    if reviews:
-        text += f"\n### Reviews ({len(reviews)}):\n"
-        for r in reviews[:10]:
-            if not isinstance(r, dict):
-                continue
-            user = r.get("author", {}).get("login") if isinstance(r.get("author"), dict) else r.get("user")
-            user = user or "?"
-            state = r.get("state", "?")
-            rbody = (r.get("body", "") or "").replace("\n", " ")[:300]
-            text += f"- **{user}**: {state} — {rbody}\n"
-
-    files = pr.get("files", []) or []
-    if files:
-        text += f"\n### Files changed ({len(files)}):\n"
-        for f in files[:25]:
-            if isinstance(f, dict):
-                path = f.get("path") or f.get("filename") or "?"
-            else:
-                path = str(f)
-            text += f"- {path}\n"
+    for title, key in (("Comments", "comments"), ("Reviews", "reviews"), ("Files changed", "files")):
+        if sections[key]:
+            text += f"\n### {title} ({len(sections[key])}):\n" + "".join(f"{e}\n" for e in fitted[key])
+            if len(fitted[key]) < len(sections[key]):
+                text += f"- … {len(sections[key]) - len(fitted[key])} more not shown\n"
 
     return text
 
@@ -304,25 +279,14 @@ Output JSON:
 
 
 def build_sample(population: List[dict], round_num: int, prs_per_round: int, seed: int) -> dict:
-    """Build a stratified sample for a round."""
-    rng = random.Random(seed + round_num)
-    nums = [int(pr["number"]) for pr in population]
-    rng.shuffle(nums)
-    selected = nums[:prs_per_round]
-
-    batch_size = 10
-    batches: Dict[str, List[int]] = {}
-    for i in range(0, len(selected), batch_size):
-        batch_key = str(i // batch_size + 1)
-        batches[batch_key] = selected[i:i + batch_size]
-
-    return {
-        "round": round_num,
-        "prs_per_round": prs_per_round,
-        "seed": seed,
-        "sampled_pr_numbers": selected,
-        "batch_assignments": batches,
-    }
+    """Build a stratified sample for a round.
+
+    Each round has its own RNG stream, so rounds are independent of one
+    another and of how many were generated before. Likely duplicates
+    (title MinHash / shared files) are co-located by ``pack_batches``.
+    """
+    sampler = StratifiedSampler(population, seed=seed, pack=lambda prs, bs: pack_batches(prs, batch_size=bs))
+    return sampler.sample_round(round_num, prs_per_round, batch_size=10)
 
 
 def main() -> None:
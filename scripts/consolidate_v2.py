@@ -1,73 +1,130 @@
 #!/usr/bin/env python3
-"""Consolidate bootstrap-v2 rounds into final artifacts."""
+"""Consolidate bootstrap-v2 rounds into final artifacts.
+
+Rounds are discovered from the round_N_* files present, and their metrics
+are folded into a persisted aggregate (src.bootstrap.consolidation). A rerun
+after round N+1 lands reads only that round. The logit and the confidence
+calibration are refit from the compact prediction rows the aggregate keeps.
+"""
 
 from __future__ import annotations
 
 import argparse
 import json
-import math
-from collections import Counter, defaultdict
+import sys
 from pathlib import Path
-from typing import Dict, List
-
-
-def mean(xs: List[float]) -> float:
-    return sum(xs) / len(xs) if xs else 0.0
-
-
-def var(xs: List[float]) -> float:
-    if len(xs) < 2:
-        return 0.0
-    m = mean(xs)
-    return sum((x - m) ** 2 for x in xs) / (len(xs) - 1)
-
-
-def welch_t(a: List[float], b: List[float]) -> float:
-    if len(a) < 2 or len(b) < 2:
-        return 0.0
-    ma, mb = mean(a), mean(b)
-    va, vb = var(a), var(b)
-    denom = math.sqrt(va / len(a) + vb / len(b))
-    return (mb - ma) / denom if denom else 0.0
-
-
-def train_logit(round_results: List[dict], all_prs_by_num: Dict[int, dict]):
-    try:
-        from sklearn.feature_extraction import DictVectorizer
-        from sklearn.linear_model import LogisticRegression
-    except Exception:
-        return {"available": False, "weights": []}
-
-    X, y = [], []
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from src.analysis.calibration import SegmentedCalibrator
+from src.analysis.logit_estimator import (
+    FeatureVectorizer,
+    brier_score,
+    cluster_groups,
+    evaluate,
+    expected_calibration_error,
+    fit_logit,
+    regularization_path,
+)
+from src.bootstrap.consolidation import PERSISTENT_MIN_ROUNDS, Consolidator
+
+
+def train_logit(
+    round_results: List[dict],
+    all_prs_by_num: Dict[int, dict],
+    dedupe_clusters: Optional[List[List[int]]] = None,
+    cv_folds: int = 5,
+):
+    X, y, numbers = [], [], []
     for rr in round_results:
         for p in rr.get("predictions", []):
             n = int(p.get("pr_number"))
             if n not in all_prs_by_num:
                 continue
             X.append(p.get("features", {}))
+            numbers.append(n)
             y.append(1 if bool(all_prs_by_num[n].get("merged_at") or all_prs_by_num[n].get("merged")) else 0)
 
     if not X:
         return {"available": True, "weights": []}
 
-    vec = DictVectorizer(sparse=False)
-    Xv = vec.fit_transform(X)
+    # Missing features from Haiku extraction are encoded as 0; one-hot columns stay sparse
+    vec = FeatureVectorizer()
+    Xv = vec.fit_transform(X, sparse=True)
     if Xv.shape[1] == 0:
         return {"available": True, "weights": [], "note": "No features available in round results."}
-    # Impute NaN with 0 (missing features from Haiku extraction)
-    import numpy as np
-    Xv = np.nan_to_num(Xv, nan=0.0)
-    clf = LogisticRegression(max_iter=200, class_weight="balanced")
-    clf.fit(Xv, y)
-
-    names = vec.get_feature_names_out()
-    coefs = clf.coef_[0]
-    ranked = sorted(zip(names, coefs), key=lambda t: abs(t[1]), reverse=True)
-    return {
+    cv = None
+    l2 = 1.0
+    if cv_folds > 1:
+        # duplicates share a group so a cluster never straddles train/validation folds
+        groups = cluster_groups(numbers, dedupe_clusters or [])
+        cv = regularization_path(Xv, y, groups=groups, n_folds=cv_folds, class_weight="balanced")
+        if cv["best_l2"] is None:
+            cv["note"] = "No fold could be scored; fit with the default l2."
+        else:
+            l2 = cv["best_l2"]
+    fit = fit_logit(Xv, y, l2=l2, class_weight="balanced", feature_names=vec.feature_names)
+    out = fit.as_dict(top=50)
+    out["metrics"] = evaluate(fit, Xv, y)
+    if cv is not None:
+        out["regularization_path"] = cv
+    return out
+
+
+def fit_confidence_calibration(round_results: List[dict], all_prs_by_num: Dict[int, dict], method: str = "isotonic"):
+    """Map the LLM's stated confidence to P(merge), per PR category.
+
+    The shipped calibrator is fit on every round. It is scored by refitting
+    on the earlier rounds and evaluating on the latest one, so the reported
+    ECE/Brier are out of sample.
+    """
+    p, y, category, rounds = [], [], [], []
+    for rr in round_results:
+        for pred in rr.get("predictions", []):
+            n = int(pred.get("pr_number"))
+            if n not in all_prs_by_num:
+                continue
+            conf = float(pred.get("confidence", 0.5))
+            said_merged = str(pred.get("prediction", "closed")).lower().strip() == "merged"
+            p.append(conf if said_merged else 1.0 - conf)
+            y.append(1 if bool(all_prs_by_num[n].get("merged_at") or all_prs_by_num[n].get("merged")) else 0)
+            category.append((pred.get("features") or {}).get("category") or "unknown")
+            rounds.append(int(pred.get("round", rr.get("round", 0)) or 0))
+
+    if not p:
+        return None, {"available": False}
+    segments = {"category": category}
+    cal = SegmentedCalibrator(method=method).fit(p, y, segments)
+    report = {
+        "available": True,
+        "method": method,
+        "n": len(p),
+        "segments": sorted(k for k in cal.maps),
+    }
+
+    latest = max(rounds)
+    train = [i for i, r in enumerate(rounds) if r < latest]
+    test = [i for i, r in enumerate(rounds) if r == latest]
+    if not train:
+        report["holdout"] = {"available": False, "note": "needs predictions from more than one round"}
+        return cal, report
+    held = SegmentedCalibrator(method=method).fit(
+        [p[i] for i in train], [y[i] for i in train], {"category": [category[i] for i in train]}
+    )
+    y_test, p_test = [y[i] for i in test], [p[i] for i in test]
+    p_cal = held.apply(p_test, {"category": [category[i] for i in test]})
+    report["holdout"] = {
         "available": True,
-        "weights": [{"feature": n, "coef": float(c)} for n, c in ranked[:50]],
-        "intercept": float(clf.intercept_[0]),
+        "round": latest,
+        "n_fit": len(train),
+        "n": len(test),
+        "ece_raw": round(expected_calibration_error(y_test, p_test), 6),
+        "ece_calibrated": round(expected_calibration_error(y_test, p_cal), 6),
+        "brier_raw": round(brier_score(y_test, p_test), 6),
+        "brier_calibrated": round(brier_score(y_test, p_cal), 6),
     }
+    return cal, report
 
 
 def main() -> None:
@@ -77,70 +134,42 @@ def main() -> None:
     ap.add_argument("--output", type=Path, default=Path("data/bootstrap_v2/consolidated.json"))
     ap.add_argument("--errors-output", type=Path, default=Path("data/bootstrap_v2/errors_persistent.json"))
     ap.add_argument("--dedupe-output", type=Path, default=Path("data/bootstrap_v2/dedupe_consolidated.json"))
+    ap.add_argument("--calibration-output", type=Path, default=Path("data/bootstrap_v2/calibration.json"))
+    ap.add_argument("--split", type=Path, default=Path("data/split.json"))
+    ap.add_argument("--state", type=Path, default=None, help="aggregate state (default <bootstrap-dir>/consolidation_state.json)")
+    ap.add_argument("--persistent-min-rounds", type=int, default=PERSISTENT_MIN_ROUNDS, help="error rounds for a PR to count as persistent")
+    ap.add_argument("--cv-folds", type=int, default=5, help="grouped CV folds for choosing l2 (<=1 disables)")
     args = ap.parse_args()
 
-    scores = []
-    round_results = []
-    persistent = Counter()
-    dedupe_rounds = []
-
-    for r in range(1, 11):
-        s = args.bootstrap_dir / f"round_{r}_scores.json"
-        rr = args.bootstrap_dir / f"round_{r}_results.json"
-        if s.exists():
-            payload = json.load(s.open())
-            scores.append(payload)
-            dedupe_rounds.append({"round": r, **payload.get("dedupe", {})})
-            for e in payload.get("errors", []):
-                persistent[int(e["pr_number"])] += 1
-        if rr.exists():
-            round_results.append(json.load(rr.open()))
-
-    baseline = [s["merge"]["accuracy"] for s in scores if s.get("round", 0) in (1, 2, 3)]
-    learning = [s["merge"]["accuracy"] for s in scores if s.get("round", 0) >= 4]
-
-    patterns = []
-    for r in range(1, 11):
-        p = args.bootstrap_dir / f"round_{r}_patterns.json"
-        if p.exists():
-            patterns.extend(json.load(p.open()).get("patterns", []))
-
-    pattern_counts = Counter(p.get("pattern", "") for p in patterns if p.get("pattern"))
-    promoted = [pat for pat, c in pattern_counts.items() if c >= 5]
+    consolidator = Consolidator(args.bootstrap_dir, state_path=args.state)
+    new = consolidator.update()
+    print(f"folded rounds {new or 'none'} into {consolidator.state_path}")
+    by_round: Dict[int, List[dict]] = {}
+    for row in consolidator.rows():
+        by_round.setdefault(int(row.get("round") or 0), []).append(row)
+    rows = [{"round": r, "predictions": preds} for r, preds in sorted(by_round.items())]
 
     all_prs = {int(p["number"]): p for p in json.load(args.all_prs.open())}
-    logit = train_logit(round_results, all_prs)
+    clusters = json.load(args.split.open()).get("dedupe_clusters", []) if args.split.exists() else []
+    logit = train_logit(rows, all_prs, dedupe_clusters=clusters, cv_folds=args.cv_folds)
+    calibrator, calibration = fit_confidence_calibration(rows, all_prs)
 
     consolidated = {
-        "rounds_scored": len(scores),
-        "learning_curve": {
-            "baseline_rounds_1_3_mean_accuracy": mean(baseline),
-            "learning_rounds_4_10_mean_accuracy": mean(learning),
-            "delta": mean(learning) - mean(baseline),
-            "welch_t_stat": welch_t(baseline, learning),
-        },
-        "promoted_patterns": promoted,
-        "persistent_error_count": sum(1 for _, c in persistent.items() if c >= 3),
+        **consolidator.state.summary(args.persistent_min_rounds),
         "logit": logit,
+        "confidence_calibration": calibration,
     }
-
-    persistent_payload = {
-        "persistent_errors": [
-            {"pr_number": n, "error_rounds": c}
-            for n, c in sorted(persistent.items(), key=lambda x: (-x[1], x[0]))
-            if c >= 3
-        ]
-    }
-
-    dedupe_payload = {
-        "rounds": dedupe_rounds,
-        "mean_f1": mean([d.get("f1", 0.0) for d in dedupe_rounds]),
-    }
+    persistent_payload = {"persistent_errors": consolidator.state.persistent_errors(args.persistent_min_rounds)}
+    dedupe_rounds, mean_f1 = consolidator.dedupe()
+    dedupe_payload = {"rounds": dedupe_rounds, "mean_f1": mean_f1}
 
     args.output.parent.mkdir(parents=True, exist_ok=True)
     json.dump(consolidated, args.output.open("w"), indent=2)
     json.dump(persistent_payload, args.errors_output.open("w"), indent=2)
     json.dump(dedupe_payload, args.dedupe_output.open("w"), indent=2)
+    if calibrator is not None:
+        calibrator.save(args.calibration_output)
+        print(f"wrote {args.calibration_output}")
     print(f"wrote {args.output}")
     print(f"wrote {args.errors_output}")
     print(f"wrote {args.dedupe_output}")
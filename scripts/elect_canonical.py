@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Elect a canonical PR for every dedupe cluster in the split.
+
+Ranking signals come from where they actually live:
+- P(merge): router fitted on the train split (``run_experiment.logit_scores``)
+- CI status: ``ci_green`` from the latest LLM prediction features
+- author merge rate: leak-free history from the population
+- files: the enriched corpus (``files`` is absent from the PR dump)
+
+Output:
+  data/canonical_elections.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA = ROOT / "data"
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from run_experiment import logit_scores
+from src.analysis.deduplicator import elect_canonical
+from src.analysis.signal_extractor import author_history
+
+
+def load_features(dirs: Sequence[Path]) -> Dict[int, Dict[str, object]]:
+    """LLM-extracted features per PR; later rounds and later dirs win."""
+    out: Dict[int, Dict[str, object]] = {}
+    for d in dirs:
+        paths = sorted(Path(d).glob("round_*_results.json"), key=lambda p: int(p.stem.split("_")[1]))
+        for path in paths:
+            for pred in json.load(path.open()).get("predictions", []):
+                if isinstance(pred, dict) and pred.get("pr_number") is not None and isinstance(pred.get("features"), dict):
+                    out[int(pred["pr_number"])] = pred["features"]
+    return out
+
+
+def load_files(path: Path) -> Dict[int, List[dict]]:
+    out: Dict[int, List[dict]] = {}
+    if path.exists():
+        for line in path.open():
+            if line.strip():
+                row = json.loads(line)
+                if row.get("files"):
+                    out[int(row["number"])] = row["files"]
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--population", type=Path, default=DATA / "all_historical_prs.json")
+    ap.add_argument("--split", type=Path, default=DATA / "split.json")
+    ap.add_argument("--enriched", type=Path, default=DATA / "enriched_sample.jsonl")
+    ap.add_argument("--predictions-from", type=Path, nargs="*", default=[DATA / "bootstrap_v3"])
+    ap.add_argument("--logit-cache", type=Path, default=DATA / "logit_scores.json")
+    ap.add_argument("--out", type=Path, default=DATA / "canonical_elections.json")
+    args = ap.parse_args()
+
+    population = json.load(args.population.open())
+    clusters = json.load(args.split.open())["dedupe_clusters"]
+    history = author_history(population)
+    files = load_files(args.enriched)
+
+    prs_by_num: Dict[int, dict] = {}
+    for pr in population:
+        n = int(pr["number"])
+        row = dict(pr, author_merge_rate=history.get(n, {}).get("merge_rate", 0.0))
+        if n in files:
+            row["files"] = files[n]
+        prs_by_num[n] = row
+
+    p_merge = logit_scores(population, args.split, args.logit_cache)
+    elections = elect_canonical(clusters, prs_by_num, p_merge, load_features(args.predictions_from))
+    args.out.write_text(json.dumps(elections, indent=2))
+    print(f"{len(elections)} clusters -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
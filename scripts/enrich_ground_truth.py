@@ -1,14 +1,22 @@
 #!/usr/bin/env python3
-"""Stage 0.8: enrich dedupe ground truth with Sonnet 4.5 (no thinking)."""
+"""Stage 0.8: enrich dedupe ground truth with Sonnet 4.5 (no thinking).
+
+Candidate pairs come from deterministic blocking over the whole train
+corpus (shared files, title similarity, linked issue, time proximity);
+Sonnet only sees compact summaries of the PRs in each candidate pair.
+"""
 
 from __future__ import annotations
 
 import argparse
 import json
 import os
+import re
+import sys
 import time
 import urllib.error
 import urllib.request
+from collections import defaultdict
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Set, Tuple
@@ -19,6 +27,13 @@ SCRIPTS = ROOT / "scripts"
 MODEL_ID = "claude-sonnet-4-5-20250514"
 FALLBACK_MODEL_ID = "claude-sonnet-4-5"
 
+sys.path.insert(0, str(ROOT))
+from src.analysis.deduplicator import candidate_pairs, pr_file_paths, title_shingles
+
+# GitHub closing keywords only; loose "see #N" / "for #N" mentions do not link a PR to an issue
+ISSUE_REF_RE = re.compile(r"\b(?:close[sd]?|fix(?:e[sd])?|resolve[sd]?)\s*:?\s*#(\d+)", re.IGNORECASE)
+COMPONENT_PREFIXES = ("channel:", "app:", "extensions:")
+
 
 def get_token() -> tuple[str, str]:
     api_key = os.environ.get("ANTHROPIC_API_KEY")
@@ -123,18 +138,108 @@ def to_epoch(ts: str | None) -> float:
     return datetime.fromisoformat(ts.replace("Z", "+00:00")).timestamp()
 
 
-def format_batch(batch: List[dict]) -> str:
-    parts = []
-    for pr in batch:
-        parts.append(f"## PR #{pr.get('number')}\n" + json.dumps(pr, ensure_ascii=False, indent=2))
-    return "\n\n".join(parts)
+def linked_issues(pr: dict) -> Set[int]:
+    text = f"{pr.get('title', '')}\n{pr.get('body', '') or ''}"
+    return {int(m.group(1)) for m in ISSUE_REF_RE.finditer(text)} - {int(pr.get("number", 0))}
+
+
+def _components(pr: dict) -> Set[str]:
+    return {str(l) for l in pr.get("labels", []) or [] if str(l).startswith(COMPONENT_PREFIXES)}
 
 
-def build_prompt(batch: List[dict]) -> str:
+def block_candidates(
+    prs: List[dict],
+    window_hours: float = 72.0,
+    min_title_jaccard: float = 0.25,
+    max_file_df: int = 25,
+) -> Dict[Tuple[int, int], List[str]]:
+    """Candidate duplicate pairs across the whole corpus, with the blocking keys that fired.
+
+    Keys: shared files / title MinHash (deduplicator.candidate_pairs), a
+    shared linked issue, and time proximity (same component label, opened
+    within ``window_hours``, overlapping title words). Like a shared file,
+    an issue closed by more than ``max_file_df`` PRs (a tracking issue) is
+    not a blocking key.
+    """
+    out: Dict[Tuple[int, int], List[str]] = defaultdict(list)
+
+    for pair in candidate_pairs(prs, max_file_df=max_file_df):
+        out[pair].append("similar_title_or_files")
+
+    by_issue: Dict[int, List[int]] = defaultdict(list)
+    for pr in prs:
+        for issue in linked_issues(pr):
+            by_issue[issue].append(int(pr["number"]))
+    for nums in by_issue.values():
+        nums = sorted(set(nums))
+        if len(nums) > max_file_df:
+            continue
+        for i in range(len(nums)):
+            for j in range(i + 1, len(nums)):
+                out[(nums[i], nums[j])].append("same_linked_issue")
+
+    window = window_hours * 3600.0
+    by_component: Dict[str, List[Tuple[float, int, Set[str]]]] = defaultdict(list)
+    for pr in prs:
+        ts = to_epoch(pr.get("created_at"))
+        words = title_shingles(pr.get("title", ""), k=1)
+        for comp in _components(pr):
+            by_component[comp].append((ts, int(pr["number"]), words))
+    for rows in by_component.values():
+        rows.sort()
+        lo = 0
+        for hi in range(len(rows)):
+            while rows[hi][0] - rows[lo][0] > window:
+                lo += 1
+            t_hi, n_hi, w_hi = rows[hi]
+            for t_lo, n_lo, w_lo in rows[lo:hi]:
+                union = w_hi | w_lo
+                if union and len(w_hi & w_lo) / len(union) >= min_title_jaccard:
+                    pair = (n_lo, n_hi) if n_lo < n_hi else (n_hi, n_lo)
+                    if "time_proximity" not in out[pair]:
+                        out[pair].append("time_proximity")
+
+    return dict(out)
+
+
+def _cross_mentions(pr: dict, other: int, limit: int = 200) -> List[str]:
+    tag = f"#{other}"
+    snippets = []
+    for c in (pr.get("comments", []) or []) + (pr.get("reviews", []) or []):
+        body = (c or {}).get("body", "") if isinstance(c, dict) else ""
+        if body and tag in body:
+            snippets.append(body.replace("\n", " ")[:limit])
+    return snippets[:2]
+
+
+def pr_summary(pr: dict, max_files: int = 8) -> dict:
+    files = sorted(pr_file_paths(pr))
+    return {
+        "title": pr.get("title", ""),
+        "author": pr.get("user", ""),
+        "created": str(pr.get("created_at", ""))[:10],
+        "outcome": "merged" if (pr.get("merged_at") or pr.get("merged")) else "closed",
+        "labels": [l for l in pr.get("labels", []) or [] if not str(l).startswith("size:")],
+        "files": files[:max_files] + ([f"(+{len(files) - max_files} more)"] if len(files) > max_files else []),
+        "body": (pr.get("body") or "").replace("\n", " ")[:200],
+    }
+
+
+def build_prompt(pairs: List[Tuple[int, int]], prs_by_num: Dict[int, dict], reasons: Dict[Tuple[int, int], List[str]]) -> str:
+    nums = sorted({n for pair in pairs for n in pair})
+    summaries = {str(n): pr_summary(prs_by_num[n]) for n in nums}
+    pair_rows = []
+    for a, b in pairs:
+        row = {"a": a, "b": b, "blocked_by": reasons.get((a, b), [])}
+        mentions = _cross_mentions(prs_by_num[a], b) + _cross_mentions(prs_by_num[b], a)
+        if mentions:
+            row["cross_mentions"] = mentions
+        pair_rows.append(row)
+
     return f"""You are enriching dedupe/superseded ground truth for pull requests.
 
-Goal: identify PRs in this batch that are duplicates/superseded variants of the same underlying work item.
-You may use all information shown (including outcomes, comments, and timeline).
+Goal: for each candidate pair below, decide whether the two PRs are duplicates/superseded variants of the same underlying work item.
+You may use all information shown (including outcomes and comments that mention the other PR).
 
 Return STRICT JSON:
 {{
@@ -145,11 +250,14 @@ Return STRICT JSON:
 
 Rules:
 - Only include pairs with confidence >= 0.65.
-- Only include PR numbers present in this batch.
+- Only include pairs listed under Candidate pairs.
 - No prose outside JSON.
 
-Batch PRs:
-{format_batch(batch)}
+PRs (compact):
+{json.dumps(summaries, ensure_ascii=False, separators=(",", ":"))}
+
+Candidate pairs:
+{json.dumps(pair_rows, ensure_ascii=False, separators=(",", ":"))}
 """
 
 
@@ -191,20 +299,30 @@ def main() -> None:
     ap.add_argument("--enriched-full", type=Path, default=DATA / "enriched_full.jsonl")
     ap.add_argument("--all-prs", type=Path, default=DATA / "all_historical_prs.json")
     ap.add_argument("--output", type=Path, default=DATA / "dedupe_ground_truth_enriched.json")
-    ap.add_argument("--batch-size", type=int, default=25)
+    ap.add_argument("--pairs-per-call", type=int, default=40)
+    ap.add_argument("--max-pairs", type=int, default=0, help="cap on candidate pairs sent to Sonnet (0 = all)")
+    ap.add_argument("--window-hours", type=float, default=72.0, help="time-proximity blocking window")
     ap.add_argument("--seed", type=int, default=42)
     ap.add_argument("--train-ratio", type=float, default=0.7)
     ap.add_argument("--sleep-seconds", type=float, default=2.0)
+    ap.add_argument("--dry-run", action="store_true", help="only report blocking stats")
     args = ap.parse_args()
 
     split = json.load(args.split.open())
     train_set = set(int(n) for n in split["train"])
 
+    all_prs = json.load(args.all_prs.open())
+    meta_by_num = {int(p["number"]): p for p in all_prs}
     rows = load_jsonl(args.enriched_full)
-    train_prs = [r for r in rows if int(r.get("number")) in train_set]
-    train_prs.sort(key=lambda r: (to_epoch(r.get("created_at")), int(r.get("number", 0))))
+    train_prs = [
+        {**meta_by_num.get(int(r.get("number")), {}), **r}
+        for r in rows
+        if int(r.get("number")) in train_set
+    ]
+    prs_by_num = {int(pr["number"]): pr for pr in train_prs}
 
     uf = UnionFind()
+    known_pairs: Set[Tuple[int, int]] = set()
     for cl in split.get("dedupe_clusters", []):
         if not cl:
             continue
@@ -213,13 +331,32 @@ def main() -> None:
         for n in cl[1:]:
             uf.add(int(n))
             uf.union(first, int(n))
+        for i, a in enumerate(cl):
+            for b in cl[i + 1 :]:
+                known_pairs.add((min(int(a), int(b)), max(int(a), int(b))))
+
+    reasons = block_candidates(train_prs, window_hours=args.window_hours)
+    # most corroborated candidates first; skip pairs the regex ground truth already has
+    ranked = sorted(
+        (p for p in reasons if p not in known_pairs),
+        key=lambda p: (-len(reasons[p]), p),
+    )
+    if args.max_pairs:
+        ranked = ranked[: args.max_pairs]
+    key_counts: Dict[str, int] = defaultdict(int)
+    for p in ranked:
+        for k in reasons[p]:
+            key_counts[k] += 1
+    print(f"blocking: {len(reasons)} candidate pairs, {len(ranked)} to review | {dict(key_counts)}")
 
     detected_pairs: Set[Tuple[int, int]] = set()
-    batches = [train_prs[i : i + args.batch_size] for i in range(0, len(train_prs), args.batch_size)]
+    calls = [ranked[i : i + args.pairs_per_call] for i in range(0, len(ranked), args.pairs_per_call)]
+    if args.dry_run:
+        calls = []
 
-    for idx, batch in enumerate(batches, start=1):
-        nums = {int(pr["number"]) for pr in batch}
-        prompt = build_prompt(batch)
+    for idx, chunk in enumerate(calls, start=1):
+        asked = set(chunk)
+        prompt = build_prompt(chunk, prs_by_num, reasons)
         out = call_sonnet(prompt)
 
         for pair in out.get("pairs", []):
@@ -229,24 +366,30 @@ def main() -> None:
                 conf = float(pair.get("confidence", 0.0))
             except Exception:
                 continue
-            if a == b or a not in nums or b not in nums or conf < 0.65:
-                continue
             p = (a, b) if a < b else (b, a)
+            if a == b or p not in asked or conf < 0.65:
+                continue
             if p in detected_pairs:
                 continue
             detected_pairs.add(p)
             uf.union(a, b)
 
-        print(f"batch {idx}/{len(batches)} done | pairs_total={len(detected_pairs)}")
+        print(f"call {idx}/{len(calls)} done | pairs_total={len(detected_pairs)}")
         time.sleep(args.sleep_seconds)
 
+    if args.dry_run:
+        return
+
     clusters = clusters_from_uf(uf)
     enriched_payload = {
         "generated_at": datetime.now(timezone.utc).isoformat(),
         "model": MODEL_ID,
         "train_pr_count": len(train_prs),
-        "batch_size": args.batch_size,
-        "batches": len(batches),
+        "pairs_per_call": args.pairs_per_call,
+        "calls": len(calls),
+        "candidate_pairs": len(reasons),
+        "reviewed_pairs": len(ranked),
+        "blocking_keys": dict(key_counts),
         "detected_pairs": [{"a": a, "b": b} for a, b in sorted(detected_pairs)],
         "clusters": clusters,
         "base_cluster_count": len(split.get("dedupe_clusters", [])),
@@ -255,7 +398,6 @@ def main() -> None:
     json.dump(enriched_payload, args.output.open("w"), indent=2)
     print(f"wrote {args.output}")
 
-    all_prs = json.load(args.all_prs.open())
     new_split = split_with_enriched_clusters(all_prs, clusters, seed=args.seed, train_ratio=args.train_ratio)
     json.dump(new_split, args.split.open("w"), indent=2)
     print(f"updated {args.split}")
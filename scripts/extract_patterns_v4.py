@@ -16,6 +16,7 @@ import json
 import math
 import os
 import re
+import sys
 import time
 import urllib.error
 import urllib.request
@@ -24,7 +25,13 @@ from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
 ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from src.utils.llm import PR_SECTION_WEIGHTS, estimate_tokens, fit_pr_sections, pack_by_tokens
+
 MODEL_ID = "claude-sonnet-4-5"
+CONTEXT_TOKENS = 80000
+# no Greptile section in pattern prompts
+SECTION_WEIGHTS = {k: w for k, w in PR_SECTION_WEIGHTS.items() if k != "greptile"}
 PRUNING_THRESHOLD_DEFAULT = 2
 
 STRENGTH_BUCKETS = {
@@ -127,7 +134,8 @@ def call_sonnet(prompt: str, max_tokens: int = 8192) -> str:
 def format_pr_for_prompt(pr: dict) -> str:
     labels = ", ".join(pr.get("labels", [])) or "none"
     author = pr.get("user", "unknown")
-    body = (pr.get("body") or "")[:500]
+    sections, fitted = fit_pr_sections(pr, weights=SECTION_WEIGHTS)
+    body = fitted["body"][0] if fitted["body"] else ""
 
     text = f"""## PR #{pr.get('number')}: {pr.get('title', '')}
 
@@ -139,39 +147,11 @@ def format_pr_for_prompt(pr: dict) -> str:
 - **Body (truncated):** {body}
 """
 
-    comments = pr.get("comments", []) or []
-    if comments:
-        text += f"\n### Comments ({len(comments)}):\n"
-        for c in comments[:10]:
-            if not isinstance(c, dict):
-                continue
-            user = c.get("author", {}).get("login") if isinstance(c.get("author"), dict) else c.get("user")
-            user = user or "?"
-            assoc = c.get("authorAssociation") or c.get("author_association") or ""
-            cbody = (c.get("body", "") or "").replace("\n", " ")[:300]
-            text += f"- **{user}** ({assoc}): {cbody}\n"
-
-    reviews = pr.get("reviews", []) or []
-    if reviews:
-        text += f"\n### Reviews ({len(reviews)}):\n"
-        for r in reviews[:10]:
-            if not isinstance(r, dict):
-                continue
-            user = r.get("author", {}).get("login") if isinstance(r.get("author"), dict) else r.get("user")
-            user = user or "?"
-            state = r.get("state", "?")
-            rbody = (r.get("body", "") or "").replace("\n", " ")[:300]
-            text += f"- **{user}**: {state} — {rbody}\n"
-
-    files = pr.get("files", []) or []
-    if files:
-        text += f"\n### Files changed ({len(files)}):\n"
-        for f in files[:25]:
-            if isinstance(f, dict):
-                path = f.get("path") or f.get("filename") or "?"
-            else:
-                path = str(f)
-            text += f"- {path}\n"
+    for title, key in (("Comments", "comments"), ("Reviews", "reviews"), ("Files changed", "files")):
+        if sections[key]:
+            text += f"\n### {title} ({len(sections[key])}):\n" + "".join(f"{e}\n" for e in fitted[key])
+            if len(fitted[key]) < len(sections[key]):
+                text += f"- … {len(sections[key]) - len(fitted[key])} more not shown\n"
 
     return text
 
@@ -532,12 +512,16 @@ def _error_batches_for_context_cap(
     all_prs: Dict[int, Dict[str, Any]],
     inherited_patterns: List[Dict[str, Any]],
 ) -> List[List[Dict[str, Any]]]:
-    full_prompt = _build_prompt(round_num, errors, all_prs, inherited_patterns)
-    estimated_tokens = len(full_prompt) / 4
-    if estimated_tokens <= 80000 or len(errors) <= 1:
+    """Errors bin-packed into as few prompts as fit CONTEXT_TOKENS each.
+
+    Every prompt repeats the instructions and inherited patterns, so their
+    cost is charged once per prompt and each error by what it adds.
+    """
+    base = estimate_tokens(_build_prompt(round_num, [], all_prs, inherited_patterns))
+    costs = [estimate_tokens(_build_prompt(round_num, [e], all_prs, inherited_patterns)) - base for e in errors]
+    if base + sum(costs) <= CONTEXT_TOKENS or len(errors) <= 1:
         return [errors]
-    mid = len(errors) // 2
-    return [errors[:mid], errors[mid:]]
+    return [[errors[i] for i in b] for b in pack_by_tokens(costs, CONTEXT_TOKENS - base)]
 
 
 def apply_updates(
@@ -707,7 +691,7 @@ def main() -> None:
 
     batches = _error_batches_for_context_cap(args.round, errors, all_prs, inherited)
     if len(batches) > 1:
-        print(f"extract_patterns_v4: context estimate exceeded 80k tokens; split into {len(batches)} batches")
+        print(f"extract_patterns_v4: context estimate exceeded {CONTEXT_TOKENS} tokens; packed into {len(batches)} batches")
 
     batch_outputs = [
         _run_batch(args.round, b, all_prs, inherited, args.dry_run)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""Query the round metrics store (data/metrics.sqlite).
+
+  backfill DIR...   import round_N_scores.json, per-PR outcomes and pattern
+                    attributions from bootstrap dirs (experiment = dir name)
+  compare           baseline-vs-learning contrast for every experiment/arm
+  curve             one metric per round across experiments
+  alerts            FN/FP drift alerts
+  errors            PRs that stay wrong across rounds and experiments
+  feature NAME      error rate per value of an extracted feature
+  pattern [ID]      errors attributed to learned patterns
+  pr NUMBER         every error recorded for one PR
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from src.bootstrap.consolidation import discover_rounds
+from src.reporting.error_index import ErrorIndex
+from src.reporting.metrics_store import MetricsStore, score_metrics
+
+
+def fmt(v: Optional[float]) -> str:
+    return "—" if v is None else f"{v:.3f}"
+
+
+def round_outcomes(d: Path, r: int, scores: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Per-PR outcomes rebuilt from a round's sample, results, scores and (reflected) errors files."""
+    errors = {int(e["pr_number"]): e for e in scores.get("errors", [])}
+    results_path = d / f"round_{r}_results.json"
+    predictions = {}
+    if results_path.exists():
+        predictions = {
+            int(p["pr_number"]): p
+            for p in json.load(results_path.open()).get("predictions", [])
+            if isinstance(p, dict) and p.get("pr_number") is not None
+        }
+    errors_path = d / f"round_{r}_errors.json"
+    if errors_path.exists():
+        for e in json.load(errors_path.open()).get("errors", []):
+            if int(e["pr_number"]) in errors and e.get("reflection"):
+                errors[int(e["pr_number"])]["reflection"] = e["reflection"]
+    sample_path = d / f"round_{r}_sample.json"
+    sampled = json.load(sample_path.open())["sampled_pr_numbers"] if sample_path.exists() else sorted(errors)
+    out = []
+    for n in map(int, sampled):
+        pred = predictions.get(n, {})
+        o = {"features": pred.get("features"), "prediction": pred.get("prediction"), "confidence": pred.get("confidence")}
+        o.update(errors.get(n, {}))
+        out.append(dict(o, pr_number=n, correct=n not in errors))
+    return out
+
+
+def backfill(store: MetricsStore, index: ErrorIndex, dirs: List[Path], arm: str) -> None:
+    for d in dirs:
+        alerts = []
+        rounds = {r: f["scores"] for r, f in discover_rounds(d).items() if "scores" in f}
+        for r, path in rounds.items():
+            scores = json.load(path.open())
+            alerts.extend(store.record(d.name, arm, r, score_metrics(scores)))
+            index.record_outcomes(d.name, arm, r, round_outcomes(d, r, scores), source="backfill")
+        attributed = 0
+        state = d / "patterns_state.json"
+        if state.exists():
+            attributed = index.record_attributions(d.name, arm, json.load(state.open()).get("patterns", []))
+        print(f"{d.name}: {len(rounds)} rounds, {len(alerts)} alerts, {attributed} new attributions")
+
+
+def contrast_table(rows: List[Dict[str, Any]]) -> str:
+    lines = [
+        "| experiment | arm | baseline | learning | Δ | Welch t |",
+        "|---|---|---|---|---|---|",
+    ]
+    for r in rows:
+        lines.append(
+            f"| {r['experiment']} | {r['arm']} | {fmt(r['baseline_mean'])} (n={r['baseline_rounds']}) | "
+            f"{fmt(r['learning_mean'])} (n={r['learning_rounds']}) | {fmt(r['delta'])} | {r['welch_t']:.2f} |"
+        )
+    return "\n".join(lines)
+
+
+def curve_table(rows: List[Dict[str, Any]]) -> str:
+    series: Dict[str, Dict[int, float]] = {}
+    for r in rows:
+        series.setdefault(f"{r['experiment']}/{r['arm']}", {})[r["round"]] = r["value"]
+    rounds = sorted({r["round"] for r in rows})
+    lines = ["| series | " + " | ".join(f"R{n}" for n in rounds) + " |", "|---|" + "---|" * len(rounds)]
+    for name, vals in series.items():
+        lines.append(f"| {name} | " + " | ".join(fmt(vals.get(n)) for n in rounds) + " |")
+    return "\n".join(lines)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--db", type=Path, default=ROOT / "data" / "metrics.sqlite")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("backfill")
+    b.add_argument("dirs", type=Path, nargs="+")
+    b.add_argument("--arm", default="main")
+    c = sub.add_parser("compare")
+    c.add_argument("--metric", default="merge.accuracy")
+    c.add_argument("--segment", default="all")
+    cu = sub.add_parser("curve")
+    cu.add_argument("--metric", default="merge.accuracy")
+    cu.add_argument("--segment", default="all")
+    cu.add_argument("--experiments", nargs="*", default=None)
+    a = sub.add_parser("alerts")
+    a.add_argument("--experiment", default=None)
+    e = sub.add_parser("errors")
+    e.add_argument("--min-errors", type=int, default=3)
+    e.add_argument("--min-arms", type=int, default=1)
+    e.add_argument("--never-right", action="store_true", help="only PRs no arm ever got right")
+    f = sub.add_parser("feature")
+    f.add_argument("name")
+    f.add_argument("--experiment", default=None)
+    pt = sub.add_parser("pattern")
+    pt.add_argument("pattern_id", nargs="?", default=None)
+    pr = sub.add_parser("pr")
+    pr.add_argument("number", type=int)
+    args = ap.parse_args()
+
+    with MetricsStore(args.db) as store, ErrorIndex(args.db) as index:
+        if args.cmd == "backfill":
+            backfill(store, index, args.dirs, args.arm)
+        elif args.cmd == "errors":
+            rows = index.persistent(args.min_errors, args.min_arms, 0.0 if args.never_right else 1.0)
+            print("| PR | errors | scored | arms | types |\n|---|---|---|---|---|")
+            for r in rows:
+                print(f"| #{r['pr_number']} | {r['errors']} | {r['scored']} | {r['arms']} | {r['error_types']} |")
+        elif args.cmd == "feature":
+            print("| value | scored | errors | FP | FN | error rate |\n|---|---|---|---|---|---|")
+            for r in index.by_feature(args.name, args.experiment):
+                print(f"| {r['value']} | {r['scored']} | {r['errors']} | {r['fp']} | {r['fn']} | {r['error_rate']:.3f} |")
+        elif args.cmd == "pattern":
+            for r in index.by_pattern(args.pattern_id):
+                print(f"{r['pattern_id']}: {r['errors']} errors, {r['prs']} PRs, {r['arms']} arms {r['pr_numbers'][:20]}")
+        elif args.cmd == "pr":
+            for r in index.pr_history(args.number):
+                print(f"{r['experiment']}/{r['arm']} round {r['round']}: {r['error_type']} ({r['reflection_hash']})")
+        elif args.cmd == "compare":
+            print(contrast_table(store.contrast(args.metric, args.segment)))
+        elif args.cmd == "curve":
+            print(curve_table(store.curve(args.metric, args.segment, args.experiments)))
+        else:
+            for al in store.alerts(args.experiment):
+                print(f"{al['experiment']}/{al['arm']} round {al['round']}: {al['kind']} {al['detail']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""Run bootstrap arms side by side and compare them.
+
+Each preset reproduces one orchestrator's prompting and learning policy
+(v3, v4, v4a prior-errors only, v4b feature discovery). All arms share
+the loaded corpus, per-round samples, one LLM rate budget and one
+response cache; results land in <out>/<arm>/ plus <out>/comparison.json.
+With --selection active, rounds favour PRs the cached logit scores are
+unsure of, that earlier LLM runs disagreed on, or from under-sampled strata.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import shutil
+import sys
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+DATA = ROOT / "data"
+SCRIPTS = ROOT / "scripts"
+MODEL_SPEC = ROOT / "model_spec.json"
+
+sys.path.insert(0, str(SCRIPTS))
+sys.path.insert(0, str(ROOT))
+import bootstrap_v3 as v3
+import bootstrap_v4 as v4
+import bootstrap_v4a_prior_only as v4a
+import bootstrap_v4b_feature_discovery as v4b
+from sanitize import sanitize_pr
+from src.analysis.deduplicator import pack_batches
+from src.analysis.signal_extractor import extract_corpus
+from src.bootstrap.sampler import StratifiedSampler
+from src.bootstrap.sequential_trainer import (
+    ActiveSelector,
+    ArmConfig,
+    Corpus,
+    ExperimentRunner,
+    FeatureDiscovery,
+    format_comparison,
+    load_llm_scores,
+)
+from src.reporting.ranker import fit_router
+from src.utils.llm import LLMClient, RateLimiter, ResponseCache, dry_run_backend, http_backend
+
+
+def _discovery(feature_spec: List[dict], max_new: int, active_cap: int) -> FeatureDiscovery:
+    def load(path: Path, cap: int) -> tuple:
+        discovered = v4b.active_discovered_features(v4b.load_feature_registry(path), limit=cap)
+        return discovered, v4b.build_canonical_feature_schema(feature_spec, discovered)
+
+    return FeatureDiscovery(load=load, enforce=v4b.enforce_prediction_schema, max_new=max_new, active_cap=active_cap)
+
+
+def logit_scores(population: List[dict], split_path: Path, cache: Path) -> Dict[int, float]:
+    """Router P(merge) for every PR, fitted on the train split; cached as JSON."""
+    if cache.exists():
+        return {int(k): float(v) for k, v in json.loads(cache.read_text()).items()}
+    rows = extract_corpus(population)
+    nums = [int(pr["number"]) for pr in population]
+    train = set(json.load(split_path.open())["train"])
+    fit_idx = [i for i, n in enumerate(nums) if n in train]
+    y = [1.0 if population[i].get("merged_at") else 0.0 for i in fit_idx]
+    router = fit_router([rows[i] for i in fit_idx], y, json.load(MODEL_SPEC.open())["feature_sets"])
+    p = router.score_rows(rows, nums).p_merge
+    scores = {n: round(float(x), 6) for n, x in zip(nums, p)}
+    cache.write_text(json.dumps(scores))
+    return scores
+
+
+def presets(args: argparse.Namespace, feature_spec: List[dict]) -> Dict[str, Callable[[], ArmConfig]]:
+    window = dict(
+        prior_errors="window",
+        prior_start_round=args.prior_start_round,
+        prior_window=args.prior_window,
+        prior_per_round=args.prior_per_round,
+    )
+    return {
+        "v3": lambda: ArmConfig(
+            name="v3",
+            prompt_builder=lambda c: v3.build_prompt(c.batch, c.feature_spec, c.patterns),
+            format_pr=v3.format_pr_for_prompt,
+            pattern_policy="all",
+            pattern_script="extract_patterns_v3.py",
+            batch_workers=args.batch_workers,
+        ),
+        "v4": lambda: ArmConfig(
+            name="v4",
+            prompt_builder=lambda c: v4.build_prompt(c.batch, c.feature_spec, c.patterns, c.prior_errors or None),
+            format_pr=v4.format_pr_for_prompt,
+            pattern_policy="qualitative",
+            pattern_script="extract_patterns_v4.py",
+            prior_errors="last_round",
+            prior_start_round=5,
+            reflection=True,
+            batch_workers=args.batch_workers,
+        ),
+        "v4a": lambda: ArmConfig(
+            name="v4a",
+            prompt_builder=lambda c: v4a.build_prompt(c.batch, c.feature_spec, c.prior_errors or None),
+            format_pr=v4a.format_pr_for_prompt,
+            reflection=True,
+            posthoc_patterns=True,
+            batch_workers=args.batch_workers,
+            **window,
+        ),
+        "v4b": lambda: ArmConfig(
+            name="v4b",
+            prompt_builder=lambda c: v4b.build_prompt(
+                c.batch, c.feature_spec, c.feature_schema, c.prior_errors or None, c.discovered or None
+            ),
+            format_pr=v4b.format_pr_for_prompt,
+            discovery=_discovery(feature_spec, args.discover_max_new, args.discover_active_cap),
+            reflection=True,
+            posthoc_patterns=True,
+            batch_workers=args.batch_workers,
+            **window,
+        ),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--arms", default="v4,v4a,v4b", help="comma-separated presets: v3,v4,v4a,v4b")
+    ap.add_argument("--out", type=Path, default=DATA / "experiments" / "default")
+    ap.add_argument("--population", type=Path, default=DATA / "bootstrap_v4" / "population.json")
+    ap.add_argument("--samples-from", type=Path, default=None, help="reuse round_N_sample.json files from this dir")
+    ap.add_argument("--rounds", type=int, default=10)
+    ap.add_argument("--prs-per-round", type=int, default=100)
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--start-round", type=int, default=1)
+    ap.add_argument("--max-batches", type=int, default=0, help="for test runs")
+    ap.add_argument("--batch-workers", type=int, default=4, help="concurrent batches per arm")
+    ap.add_argument(
+        "--context-tokens", type=int, default=0, help="pack sample batches into prompts of this many tokens (0: one per batch)"
+    )
+    ap.add_argument("--max-prs-per-prompt", type=int, default=20)
+    ap.add_argument("--rpm", type=float, default=50.0, help="shared LLM requests per minute across all arms")
+    ap.add_argument("--prior-start-round", type=int, default=4)
+    ap.add_argument("--prior-window", type=int, default=3)
+    ap.add_argument("--prior-per-round", type=int, default=10)
+    ap.add_argument("--discover-max-new", type=int, default=5)
+    ap.add_argument("--discover-active-cap", type=int, default=20)
+    ap.add_argument("--selection", choices=["random", "active"], default="random", help="how each round's PRs are picked")
+    ap.add_argument("--llm-scores-from", type=Path, nargs="*", default=[], help="earlier bootstrap dirs for logit/LLM disagreement")
+    ap.add_argument("--explore", type=float, default=0.2, help="share of an active round drawn uniformly")
+    ap.add_argument("--metrics-db", type=Path, default=DATA / "metrics.sqlite", help="metrics store and error index")
+    ap.add_argument("--dry-run", action="store_true", help="no remote API calls")
+    args = ap.parse_args()
+
+    if not args.population.exists():
+        print(f"Population not found at {args.population}. Run filter_population.py first.")
+        sys.exit(1)
+    population = json.loads(args.population.read_text())
+    all_prs = {int(p["number"]): p for p in population}
+    author_stats = v4.compute_author_stats(all_prs)
+    prs_path = args.population
+    enriched_v2 = DATA / "all_historical_prs_enriched_v2.json"
+    if enriched_v2.exists():
+        author_stats = v4.compute_author_stats({int(p["number"]): p for p in json.loads(enriched_v2.read_text())})
+        prs_path = enriched_v2
+
+    feature_spec = json.load(MODEL_SPEC.open())["features"]
+    corpus = Corpus(
+        prs=all_prs,
+        prs_path=prs_path,
+        feature_spec=feature_spec,
+        split_path=DATA / "split.json",
+        author_stats=author_stats,
+        sanitize=sanitize_pr,
+    )
+
+    available = presets(args, feature_spec)
+    names = [a.strip() for a in args.arms.split(",") if a.strip()]
+    unknown = [n for n in names if n not in available]
+    if unknown:
+        raise SystemExit(f"unknown arms: {unknown} (choose from {sorted(available)})")
+
+    args.out.mkdir(parents=True, exist_ok=True)
+    if args.samples_from is not None:
+        (args.out / "samples").mkdir(exist_ok=True)
+        for r in range(args.start_round, args.rounds + 1):
+            src = args.samples_from / f"round_{r}_sample.json"
+            dst = args.out / "samples" / src.name
+            if src.exists() and not dst.exists():
+                shutil.copy2(src, dst)
+
+    client = LLMClient(
+        model=v4.MODEL_ID,
+        backend=dry_run_backend if args.dry_run else http_backend,
+        limiter=RateLimiter(0 if args.dry_run else args.rpm),
+        cache=ResponseCache(args.out / "llm_cache.jsonl"),
+    )
+    sample_fn: Callable[[int], dict] = lambda r: v4.build_sample(population, r, args.prs_per_round, args.seed)
+    if args.selection == "active":
+        sample_fn = ActiveSelector(
+            StratifiedSampler(population, seed=args.seed, pack=lambda prs, bs: pack_batches(prs, batch_size=bs)),
+            logit_scores(population, corpus.split_path, args.out / "logit_scores.json"),
+            load_llm_scores(args.llm_scores_from),
+            prs_per_round=args.prs_per_round,
+            explore=args.explore,
+        )
+    runner = ExperimentRunner(
+        [available[n]() for n in names],
+        corpus,
+        client,
+        args.out,
+        sample_fn=sample_fn,
+        rounds=args.rounds,
+        start_round=args.start_round,
+        seed=args.seed,
+        max_batches=args.max_batches,
+        dry_run=args.dry_run,
+        metrics_db=args.metrics_db,
+        context_tokens=args.context_tokens,
+        max_prs_per_prompt=args.max_prs_per_prompt,
+    )
+    comparison = runner.run()
+    print(format_comparison(comparison))
+    print(f"wall {comparison['wall_seconds']}s; llm {comparison['llm']}")
+
+
+if __name__ == "__main__":
+    main()
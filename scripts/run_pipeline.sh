@@ -18,7 +18,7 @@ log "=== Pipeline start ==="
 # Stage 0.8: Ground truth enrichment (Sonnet)
 log "Stage 0.8: enrich_ground_truth.py starting..."
 if python3 scripts/enrich_ground_truth.py \
-    --batch-size 25 \
+    --pairs-per-call 40 \
     --seed 42 \
     --sleep-seconds 3 2>&1 | tee -a "$LOG"; then
     log "Stage 0.8: COMPLETE"
@@ -1,14 +1,30 @@
 #!/usr/bin/env python3
-"""Score one bootstrap-v2 round (merge + dedupe + calibration)."""
+"""Score one bootstrap-v2 round (merge + dedupe + calibration).
+
+Besides the round_N_scores.json payload, every metric (overall and per
+size/category segment) is appended to the shared metrics store
+(data/metrics.sqlite by default) under --experiment/--arm, and every PR's
+outcome goes to the cross-experiment error index in the same file.
+"""
 
 from __future__ import annotations
 
 import argparse
 import json
-import math
+import sys
 from collections import defaultdict
 from pathlib import Path
-from typing import Dict, List, Set, Tuple
+from typing import Dict, Iterable, List
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+from src.bootstrap.sampler import classify_pr
+from src.reporting.error_index import ErrorIndex
+from src.reporting.metrics_store import MetricsStore, score_metrics
+
+SEGMENT_AXES = ("size", "category")
 
 
 def safe_div(a: float, b: float) -> float:
@@ -19,13 +35,110 @@ def f1(p: float, r: float) -> float:
     return safe_div(2 * p * r, p + r) if p + r else 0.0
 
 
-def pairs_from_cluster(cluster: List[int]) -> Set[Tuple[int, int]]:
-    s = sorted(cluster)
-    out = set()
-    for i in range(len(s)):
-        for j in range(i + 1, len(s)):
-            out.add((s[i], s[j]))
-    return out
+def labels_from_clusters(universe: np.ndarray, clusters: Iterable[Iterable[int]]) -> np.ndarray:
+    """Cluster label per PR of the sorted ``universe``; PRs outside any cluster are singletons.
+
+    Overlapping clusters (the LLM sometimes reports a PR in two groups) are
+    merged transitively.
+    """
+    n = len(universe)
+    parent = np.arange(n)
+
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for cl in clusters:
+        members = np.asarray(sorted({int(x) for x in cl}), dtype=np.int64)
+        if len(members) < 2:
+            continue
+        idx = np.searchsorted(universe, members)
+        idx = idx[(idx < n) & (universe[np.minimum(idx, n - 1)] == members)]
+        if len(idx) < 2:
+            continue
+        root = find(int(idx[0]))
+        for i in idx[1:]:
+            r = find(int(i))
+            if r != root:
+                parent[r] = root
+
+    roots = np.array([find(i) for i in range(n)], dtype=np.int64)
+    return np.unique(roots, return_inverse=True)[1]
+
+
+def _comb2(x: np.ndarray) -> int:
+    x = x.astype(np.int64)
+    return int((x * (x - 1) // 2).sum())
+
+
+def clustering_scores(true: np.ndarray, pred: np.ndarray) -> dict:
+    """Pairwise P/R/F1, B-cubed and adjusted Rand index from two label arrays.
+
+    Everything is derived from the contingency table, so cost is
+    O(n log n) in the number of PRs rather than O(pairs).
+    """
+    n = len(true)
+    if n == 0:
+        return {
+            "precision": 0.0, "recall": 0.0, "f1": 0.0, "tp": 0, "fp": 0, "fn": 0,
+            "gt_pairs": 0, "pred_pairs": 0,
+            "bcubed": {"precision": 0.0, "recall": 0.0, "f1": 0.0}, "ari": 0.0,
+        }
+    k_pred = int(pred.max()) + 1
+    cells, n_ij = np.unique(true.astype(np.int64) * k_pred + pred, return_counts=True)
+    a = np.bincount(true)
+    b = np.bincount(pred)
+
+    tp = _comb2(n_ij)
+    gt_pairs = _comb2(a)
+    pred_pairs = _comb2(b)
+    p = safe_div(tp, pred_pairs)
+    r = safe_div(tp, gt_pairs)
+
+    # B-cubed: every PR in cell (i, j) has precision n_ij / b_j and recall n_ij / a_i
+    cell_true = cells // k_pred
+    cell_pred = cells % k_pred
+    bc_p = float((n_ij * n_ij / b[cell_pred]).sum() / n)
+    bc_r = float((n_ij * n_ij / a[cell_true]).sum() / n)
+
+    total = n * (n - 1) // 2
+    expected = safe_div(gt_pairs * pred_pairs, total)
+    max_index = (gt_pairs + pred_pairs) / 2
+    ari = safe_div(tp - expected, max_index - expected) if max_index != expected else 1.0
+
+    return {
+        "precision": round(p, 6),
+        "recall": round(r, 6),
+        "f1": round(f1(p, r), 6),
+        "tp": tp,
+        "fp": pred_pairs - tp,
+        "fn": gt_pairs - tp,
+        "gt_pairs": gt_pairs,
+        "pred_pairs": pred_pairs,
+        "bcubed": {"precision": round(bc_p, 6), "recall": round(bc_r, 6), "f1": round(f1(bc_p, bc_r), 6)},
+        "ari": round(ari, 6),
+    }
+
+
+def score_dedupe(
+    universe: Iterable[int],
+    gt_clusters: Iterable[Iterable[int]],
+    pred_clusters: Iterable[Iterable[int]],
+) -> dict:
+    """Score predicted duplicate groups against ground truth over any PR universe.
+
+    Predicted PRs outside ``universe`` are added to it as ground-truth
+    singletons, so they still count as false-positive pairs.
+    """
+    pred_clusters = [[int(x) for x in cl] for cl in pred_clusters]
+    nums = {int(x) for x in universe} | {x for cl in pred_clusters for x in cl}
+    arr = np.fromiter(sorted(nums), dtype=np.int64, count=len(nums))
+    return clustering_scores(
+        labels_from_clusters(arr, gt_clusters),
+        labels_from_clusters(arr, pred_clusters),
+    )
 
 
 def calibration(predictions: List[dict], bins: float = 0.1) -> List[dict]:
@@ -49,6 +162,25 @@ def calibration(predictions: List[dict], bins: float = 0.1) -> List[dict]:
     return out
 
 
+def segment_metrics(rows: List[dict], all_prs: Dict[int, dict]) -> Dict[str, Dict[str, float]]:
+    """Accuracy and error counts per ``axis=bucket`` segment (e.g. ``size=M``)."""
+    groups: Dict[str, List[dict]] = defaultdict(list)
+    for row in rows:
+        buckets = classify_pr(all_prs[row["pr_number"]])
+        for axis in SEGMENT_AXES:
+            groups[f"{axis}={buckets[axis]}"].append(row)
+    out = {}
+    for seg in sorted(groups):
+        g = groups[seg]
+        out[seg] = {
+            "n": len(g),
+            "accuracy": round(sum(r["correct"] for r in g) / len(g), 6),
+            "fp": sum(1 for r in g if not r["correct"] and r["prediction"] == "merged"),
+            "fn": sum(1 for r in g if not r["correct"] and r["prediction"] != "merged"),
+        }
+    return out
+
+
 def main() -> None:
     ap = argparse.ArgumentParser()
     ap.add_argument("--results", type=Path, required=True, help="round_N_results.json")
@@ -56,6 +188,10 @@ def main() -> None:
     ap.add_argument("--all-prs", type=Path, required=True)
     ap.add_argument("--split", type=Path, required=True)
     ap.add_argument("--output", type=Path, required=True)
+    ap.add_argument("--metrics-db", type=Path, default=ROOT / "data" / "metrics.sqlite")
+    ap.add_argument("--no-metrics-db", action="store_true", help="only write the scores JSON")
+    ap.add_argument("--experiment", default=None, help="default: the results file's directory name")
+    ap.add_argument("--arm", default="main")
     args = ap.parse_args()
 
     results = json.load(args.results.open())
@@ -71,6 +207,7 @@ def main() -> None:
 
     tp = fp = tn = fn = 0
     merged_predictions = []
+    outcomes = []
     errors = []
 
     for n in sampled:
@@ -96,6 +233,14 @@ def main() -> None:
             "prediction": pred_label,
             "ground_truth": "merged" if y else "closed",
         }
+        outcomes.append(
+            dict(
+                row,
+                error_type=None if correct else ("fp" if yhat else "fn"),
+                features=pred.get("features", {}),
+                reasoning=pred.get("reasoning", "") or pred.get("qualitative_signals", ""),
+            )
+        )
         merged_predictions.append(row)
         if not correct:
             errors.append(
@@ -112,29 +257,20 @@ def main() -> None:
     rec = safe_div(tp, tp + fn)
 
     # dedupe scoring inside each round sample
-    gt_cluster_pairs: Set[Tuple[int, int]] = set()
-    for cl in split.get("dedupe_clusters", []):
-        in_sample = sorted([n for n in cl if n in sampled])
-        if len(in_sample) >= 2:
-            gt_cluster_pairs |= pairs_from_cluster(in_sample)
+    sampled_set = set(sampled)
+    gt_clusters = [[n for n in cl if n in sampled_set] for cl in split.get("dedupe_clusters", [])]
 
-    pred_pairs: Set[Tuple[int, int]] = set()
+    pred_clusters: List[List[int]] = []
     for d in results.get("duplicates", []):
-        raw_prs = d.get("prs", [])
         prs = []
-        for x in raw_prs:
+        for x in d.get("prs", []):
             try:
                 prs.append(int(x))
             except (TypeError, ValueError):
                 continue
-        prs.sort()
-        pred_pairs |= pairs_from_cluster(prs)
+        pred_clusters.append(prs)
 
-    dedupe_tp = len(gt_cluster_pairs & pred_pairs)
-    dedupe_fp = len(pred_pairs - gt_cluster_pairs)
-    dedupe_fn = len(gt_cluster_pairs - pred_pairs)
-    dedupe_p = safe_div(dedupe_tp, dedupe_tp + dedupe_fp)
-    dedupe_r = safe_div(dedupe_tp, dedupe_tp + dedupe_fn)
+    dedupe = score_dedupe(sampled, gt_clusters, pred_clusters)
 
     payload = {
         "round": sample.get("round"),
@@ -145,17 +281,9 @@ def main() -> None:
             "f1": round(f1(prec, rec), 6),
             "confusion": {"tp": tp, "fp": fp, "tn": tn, "fn": fn},
         },
-        "dedupe": {
-            "precision": round(dedupe_p, 6),
-            "recall": round(dedupe_r, 6),
-            "f1": round(f1(dedupe_p, dedupe_r), 6),
-            "tp": dedupe_tp,
-            "fp": dedupe_fp,
-            "fn": dedupe_fn,
-            "gt_pairs": len(gt_cluster_pairs),
-            "pred_pairs": len(pred_pairs),
-        },
+        "dedupe": dedupe,
         "calibration": calibration(merged_predictions, bins=0.1),
+        "segments": segment_metrics(merged_predictions, all_prs),
         "errors": errors,
     }
 
@@ -163,6 +291,14 @@ def main() -> None:
     json.dump(payload, args.output.open("w"), indent=2)
     print(f"wrote {args.output}")
 
+    if not args.no_metrics_db and payload["round"] is not None:
+        experiment = args.experiment or args.results.resolve().parent.name
+        with MetricsStore(args.metrics_db) as store:
+            for alert in store.record(experiment, args.arm, int(payload["round"]), score_metrics(payload)):
+                print(f"DRIFT {experiment}/{args.arm} round {payload['round']}: {alert['kind']} {alert['detail']}")
+        with ErrorIndex(args.metrics_db) as index:
+            index.record_outcomes(experiment, args.arm, int(payload["round"]), outcomes)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,186 @@
+"""Calibrate merge probabilities per segment with compact lookup tables."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from src.analysis.logit_estimator import fit_logit, sigmoid
+
+GLOBAL = "*"
+# Platt maps are tabulated on an even logit grid, dense where sigmoid bends
+_PLATT_GRID = np.concatenate([[0.0], sigmoid(np.linspace(-8.0, 8.0, 49)), [1.0]])
+
+
+@dataclass
+class CalibrationMap:
+    """Piecewise-linear map from raw to calibrated probability."""
+
+    x: np.ndarray
+    y: np.ndarray
+    method: str
+    n: int
+
+    def apply(self, p: Sequence[float]) -> np.ndarray:
+        return np.interp(np.asarray(p, dtype=float), self.x, self.y)
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "method": self.method,
+            "n": self.n,
+            "x": [round(float(v), 6) for v in self.x],
+            "y": [round(float(v), 6) for v in self.y],
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Mapping[str, object]) -> "CalibrationMap":
+        return cls(
+            x=np.asarray(payload["x"], dtype=float),
+            y=np.asarray(payload["y"], dtype=float),
+            method=str(payload.get("method", "isotonic")),
+            n=int(payload.get("n", 0)),
+        )
+
+
+def fit_isotonic(p: Sequence[float], y: Sequence[float], weight: Optional[Sequence[float]] = None) -> CalibrationMap:
+    """Pool-adjacent-violators fit; one knot per pooled block (at its mean p)."""
+    p = np.asarray(p, dtype=float)
+    y = np.asarray(y, dtype=float)
+    w = np.ones(len(p)) if weight is None else np.asarray(weight, dtype=float)
+    if not len(p):
+        return CalibrationMap(x=np.array([0.0, 1.0]), y=np.array([0.0, 1.0]), method="isotonic", n=0)
+
+    # tied scores are pooled up front so knots have distinct x
+    xs, inv = np.unique(p, return_inverse=True)
+    tw = np.bincount(inv, weights=w)
+    ty = np.bincount(inv, weights=w * y)
+
+    # blocks as parallel stacks: weighted sum of y, of p, and total weight
+    sy: List[float] = []
+    sp: List[float] = []
+    sw: List[float] = []
+    for xi, yi, wi in zip(xs, ty, tw):
+        sy.append(yi)
+        sp.append(xi * wi)
+        sw.append(wi)
+        while len(sw) > 1 and sy[-2] * sw[-1] >= sy[-1] * sw[-2]:
+            last_y, last_p, last_w = sy.pop(), sp.pop(), sw.pop()
+            sy[-1] += last_y
+            sp[-1] += last_p
+            sw[-1] += last_w
+
+    bw = np.maximum(np.array(sw), 1e-12)
+    knots_x = np.array(sp) / bw
+    knots_y = np.array(sy) / bw
+    x = np.concatenate([[0.0], knots_x, [1.0]])
+    v = np.concatenate([[knots_y[0]], knots_y, [knots_y[-1]]])
+    return CalibrationMap(x=x, y=v, method="isotonic", n=len(p))
+
+
+def fit_platt(p: Sequence[float], y: Sequence[float], weight: Optional[Sequence[float]] = None) -> CalibrationMap:
+    """Platt scaling on the logit of ``p``, tabulated for ``np.interp``."""
+    p = np.clip(np.asarray(p, dtype=float), 1e-6, 1 - 1e-6)
+    logit = np.log(p / (1 - p))[:, None]
+    fit = fit_logit(logit, y, l2=1e-6, sample_weight=None if weight is None else np.asarray(weight, dtype=float))
+    grid = np.clip(_PLATT_GRID, 1e-6, 1 - 1e-6)
+    values = fit.predict_proba(np.log(grid / (1 - grid))[:, None])
+    return CalibrationMap(x=_PLATT_GRID.copy(), y=values, method="platt", n=len(p))
+
+
+FITTERS = {"isotonic": fit_isotonic, "platt": fit_platt}
+
+
+def segment_keys(segments: Mapping[str, Sequence[object]], n: int) -> np.ndarray:
+    """``{"model_used": [...], "category": [...]}`` -> ``"category=docs|model_used=early"`` per row."""
+    if not segments:
+        return np.full(n, GLOBAL, dtype=object)
+    cols = [[f"{name}={v}" for v in segments[name]] for name in sorted(segments)]
+    return np.array(["|".join(parts) for parts in zip(*cols)], dtype=object)
+
+
+def _levels(segments: Optional[Mapping[str, Sequence[object]]], n: int) -> List[np.ndarray]:
+    """Segment keys from coarsest to finest; finer maps override coarser ones.
+
+    Single fields come in reverse priority (the first field in ``segments``
+    is applied last among them), then the full combination.
+    """
+    segments = dict(segments or {})
+    levels = [segment_keys({name: segments[name]}, n) for name in reversed(list(segments))]
+    if len(segments) > 1:
+        levels.append(segment_keys(segments, n))
+    return levels
+
+
+class SegmentedCalibrator:
+    """Calibration maps per segment, falling back to coarser segments.
+
+    A row uses the map for its full segment combination when one was fitted,
+    else the map for its single highest-priority field, else the global map.
+    Segments with fewer than ``min_samples`` held-out rows (or only one
+    class) get no map. Maps are small ``(x, y)`` tables, so applying them is
+    one ``np.interp`` per segment present in the batch.
+    """
+
+    def __init__(self, method: str = "isotonic", min_samples: int = 50) -> None:
+        if method not in FITTERS:
+            raise ValueError(f"unknown calibration method: {method}")
+        self.method = method
+        self.min_samples = min_samples
+        self.maps: Dict[str, CalibrationMap] = {}
+
+    def fit(
+        self,
+        p: Sequence[float],
+        y: Sequence[float],
+        segments: Optional[Mapping[str, Sequence[object]]] = None,
+    ) -> "SegmentedCalibrator":
+        p = np.asarray(p, dtype=float)
+        y = np.asarray(y, dtype=float)
+        fitter = FITTERS[self.method]
+        self.maps = {GLOBAL: fitter(p, y)}
+        for keys in _levels(segments, len(p)):
+            for key in np.unique(keys):
+                rows = keys == key
+                if rows.sum() >= self.min_samples and len(np.unique(y[rows])) == 2:
+                    self.maps[str(key)] = fitter(p[rows], y[rows])
+        return self
+
+    def apply(self, p: Sequence[float], segments: Optional[Mapping[str, Sequence[object]]] = None) -> np.ndarray:
+        p = np.asarray(p, dtype=float)
+        if GLOBAL not in self.maps:
+            return p.copy()
+        out = self.maps[GLOBAL].apply(p)
+        for keys in _levels(segments, len(p)):
+            for key in np.unique(keys):
+                table = self.maps.get(str(key))
+                if table is not None:
+                    rows = keys == key
+                    out[rows] = table.apply(p[rows])
+        return out
+
+    # -- persistence ------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "method": self.method,
+            "min_samples": self.min_samples,
+            "maps": {k: m.as_dict() for k, m in sorted(self.maps.items())},
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Mapping[str, object]) -> "SegmentedCalibrator":
+        cal = cls(method=str(payload.get("method", "isotonic")), min_samples=int(payload.get("min_samples", 50)))
+        cal.maps = {k: CalibrationMap.from_dict(v) for k, v in dict(payload.get("maps", {})).items()}
+        return cal
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        json.dump(self.to_dict(), path.open("w"), indent=2)
+
+    @classmethod
+    def load(cls, path: Path) -> "SegmentedCalibrator":
+        return cls.from_dict(json.load(path.open()))
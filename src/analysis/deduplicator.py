@@ -1 +1,442 @@
 """Detect duplicate pull requests and rank preferred candidates."""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import re
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+# Relative weight of each signal in the canonical-PR score. Signals are all
+# normalised to [0, 1] before weighting, so the weights read as priorities.
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "p_merge": 0.40,
+    "ci": 0.20,
+    "author_merge_rate": 0.15,
+    "recency": 0.10,
+    "file_coverage": 0.15,
+}
+
+
+# Conventional-commit prefixes carry no information about *what* a PR does.
+TITLE_PREFIX_RE = re.compile(r"^\s*[a-z]+(?:\([^)]*\))?!?:\s*", re.IGNORECASE)
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MERSENNE_61 = (1 << 61) - 1
+
+
+def to_epoch(ts: Optional[str]) -> float:
+    if not ts:
+        return 0.0
+    return datetime.fromisoformat(str(ts).replace("Z", "+00:00")).timestamp()
+
+
+def pr_file_paths(pr: dict) -> Set[str]:
+    out: Set[str] = set()
+    for f in pr.get("files", []) or []:
+        if isinstance(f, dict):
+            path = f.get("path") or f.get("filename")
+        else:
+            path = f
+        if path:
+            out.add(str(path))
+    return out
+
+
+def _ci_score(pr: dict) -> float:
+    ci = pr.get("ci_green")
+    if ci is None:
+        return 0.5
+    return 1.0 if bool(ci) else 0.0
+
+
+@dataclass
+class MemberSignals:
+    """Per-PR signals used to elect the canonical member of a cluster."""
+
+    number: int
+    p_merge: float = 0.0
+    ci: float = 0.5
+    author_merge_rate: float = 0.0
+    last_activity: float = 0.0
+    files: Set[str] = field(default_factory=set)
+
+    @classmethod
+    def from_pr(
+        cls, pr: dict, p_merge: Optional[float] = None, features: Optional[Dict[str, object]] = None
+    ) -> "MemberSignals":
+        """Signals from a PR payload; ``p_merge`` (e.g. router ``score_rows``)
+        and LLM-extracted ``features`` (``ci_green``) override the payload."""
+        rate = pr.get("author_merge_rate", pr.get("merge_rate", 0.0))
+        ci_source = features if features and features.get("ci_green") is not None else pr
+        return cls(
+            number=int(pr["number"]),
+            p_merge=float(p_merge if p_merge is not None else pr.get("p_merge", 0.0) or 0.0),
+            ci=_ci_score(ci_source),
+            author_merge_rate=float(rate or 0.0),
+            last_activity=to_epoch(pr.get("updated_at") or pr.get("created_at")),
+            files=pr_file_paths(pr),
+        )
+
+
+@dataclass
+class ClusterElection:
+    """Canonical pick for one duplicate cluster plus close suggestions."""
+
+    cluster_id: int
+    canonical: int
+    ranked: List[Tuple[int, float]]
+    suggestions: List[Dict[str, object]]
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "cluster_id": self.cluster_id,
+            "canonical": self.canonical,
+            "ranked": [{"pr_number": n, "score": round(s, 6)} for n, s in self.ranked],
+            "suggestions": self.suggestions,
+        }
+
+
+class ClusterRanker:
+    """Elect one PR per duplicate cluster and keep the election current.
+
+    Membership is tracked with a union-find so clusters can grow and merge
+    as new duplicate edges arrive. The edges themselves are kept too (a
+    cluster added as a group is one edge over all its members), so removing
+    a PR can split a cluster that only it held together. Only clusters
+    touched since the last call to :meth:`elections` are re-scored.
+    """
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, float]] = None,
+        recency_half_life_hours: float = 72.0,
+    ) -> None:
+        self.weights = dict(DEFAULT_WEIGHTS if weights is None else weights)
+        self.recency_half_life_hours = recency_half_life_hours
+        self.parent: Dict[int, int] = {}
+        self.members: Dict[int, Set[int]] = {}
+        self.edges: Dict[int, Set[int]] = {}  # edge id -> PRs it links
+        self.edges_of: Dict[int, Set[int]] = {}  # PR -> ids of its edges
+        self._next_edge = 0
+        self.signals: Dict[int, MemberSignals] = {}
+        self._dirty: Set[int] = set()
+        self._elections: Dict[int, ClusterElection] = {}
+
+    # -- membership -------------------------------------------------------
+
+    def _find(self, x: int) -> int:
+        if x not in self.parent:
+            self.parent[x] = x
+            self.members[x] = {x}
+        if self.parent[x] != x:
+            self.parent[x] = self._find(self.parent[x])
+        return self.parent[x]
+
+    def _mark(self, root: int) -> None:
+        self._dirty.add(root)
+
+    def _union(self, a: int, b: int) -> int:
+        ra, rb = self._find(a), self._find(b)
+        if ra == rb:
+            self._mark(ra)
+            return ra
+        if len(self.members[ra]) < len(self.members[rb]):
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.members[ra] |= self.members.pop(rb)
+        self._dirty.discard(rb)
+        self._elections.pop(rb, None)
+        self._mark(ra)
+        return ra
+
+    def _link(self, nums: Sequence[int]) -> int:
+        """Record one edge over ``nums`` and union them; returns the cluster id."""
+        eid = self._next_edge
+        self._next_edge += 1
+        self.edges[eid] = set(nums)
+        for n in nums:
+            self.edges_of.setdefault(n, set()).add(eid)
+        root = self._find(nums[0])
+        for n in nums[1:]:
+            root = self._union(nums[0], n)
+        return root
+
+    def add_pair(self, a: int, b: int) -> int:
+        """Record that PRs ``a`` and ``b`` are duplicates; return the cluster id."""
+        return self._link([int(a), int(b)])
+
+    def add_cluster(self, prs: Iterable[int]) -> Optional[int]:
+        nums = list(dict.fromkeys(int(n) for n in prs))
+        if not nums:
+            return None
+        return self._link(nums)
+
+    def remove(self, pr_number: int) -> None:
+        """Drop a PR (e.g. it was closed) and re-elect what is left of its cluster.
+
+        The cluster is rebuilt from the edges that remain once the PR is
+        taken out, so members joined only through it become separate
+        clusters (or drop out when left alone).
+        """
+        n = int(pr_number)
+        if n not in self.parent:
+            return
+        root = self._find(n)
+        rest = self.members.pop(root) - {n}
+        self._elections.pop(root, None)
+        self._dirty.discard(root)
+        self.signals.pop(n, None)
+        for m in rest | {n}:
+            del self.parent[m]
+        for eid in self.edges_of.pop(n, set()):
+            self.edges[eid].discard(n)
+        edges = {eid for m in rest for eid in self.edges_of.get(m, ())}
+        for eid in edges:
+            if len(self.edges[eid]) < 2:
+                for m in self.edges.pop(eid):
+                    self.edges_of[m].discard(eid)
+        for m in rest:
+            if not self.edges_of.get(m):
+                self.edges_of.pop(m, None)
+        for eid in sorted(e for e in edges if e in self.edges):
+            nums = sorted(self.edges[eid])
+            for other in nums[1:]:
+                self._union(nums[0], other)
+
+    def update(self, pr: dict) -> None:
+        """Insert or refresh the signals of a PR and dirty its cluster."""
+        sig = MemberSignals.from_pr(pr)
+        self.signals[sig.number] = sig
+        if sig.number in self.parent:
+            self._mark(self._find(sig.number))
+
+    def cluster_of(self, pr_number: int) -> Optional[int]:
+        n = int(pr_number)
+        return self._find(n) if n in self.parent else None
+
+    # -- scoring ----------------------------------------------------------
+
+    def _score_cluster(self, root: int) -> Optional[ClusterElection]:
+        nums = sorted(self.members.get(root, ()))
+        if len(nums) < 2:
+            return None
+        sigs = [self.signals.get(n, MemberSignals(number=n)) for n in nums]
+        union_files: Set[str] = set()
+        for s in sigs:
+            union_files |= s.files
+        newest = max(s.last_activity for s in sigs)
+        half_life = self.recency_half_life_hours * 3600.0
+
+        scored: List[Tuple[int, float]] = []
+        for s in sigs:
+            age = max(0.0, newest - s.last_activity)
+            recency = math.exp(-math.log(2) * age / half_life) if half_life > 0 else 1.0
+            coverage = len(s.files) / len(union_files) if union_files else 0.0
+            parts = {
+                "p_merge": s.p_merge,
+                "ci": s.ci,
+                "author_merge_rate": s.author_merge_rate,
+                "recency": recency,
+                "file_coverage": coverage,
+            }
+            score = sum(self.weights.get(k, 0.0) * v for k, v in parts.items())
+            scored.append((s.number, score))
+
+        # highest score wins; the older PR wins ties
+        scored.sort(key=lambda t: (-t[1], t[0]))
+        canonical, best = scored[0]
+        suggestions = [
+            {
+                "close": n,
+                "in_favour_of": canonical,
+                "score_gap": round(best - s, 6),
+            }
+            for n, s in scored[1:]
+        ]
+        return ClusterElection(cluster_id=root, canonical=canonical, ranked=scored, suggestions=suggestions)
+
+    def elections(self) -> List[ClusterElection]:
+        """Return the current election of every cluster, re-scoring dirty ones."""
+        for root in list(self._dirty):
+            election = self._score_cluster(root)
+            if election is None:
+                self._elections.pop(root, None)
+            else:
+                self._elections[root] = election
+        self._dirty.clear()
+        return sorted(self._elections.values(), key=lambda e: (-len(e.ranked), e.canonical))
+
+
+def elect_canonical(
+    clusters: List[List[int]],
+    prs_by_num: Dict[int, dict],
+    p_merge: Optional[Dict[int, float]] = None,
+    features: Optional[Dict[int, Dict[str, object]]] = None,
+) -> List[Dict[str, object]]:
+    """One-shot election over ``clusters`` using signals found in ``prs_by_num``.
+
+    ``p_merge`` and ``features`` are keyed by PR number and take precedence
+    over the same fields in the payloads (see :meth:`MemberSignals.from_pr`).
+    """
+    ranker = ClusterRanker()
+    for cl in clusters:
+        for n in cl:
+            n = int(n)
+            if n in prs_by_num:
+                ranker.signals[n] = MemberSignals.from_pr(
+                    prs_by_num[n], (p_merge or {}).get(n), (features or {}).get(n)
+                )
+        ranker.add_cluster(cl)
+    return [e.as_dict() for e in ranker.elections()]
+
+
+# -- cheap similarity for candidate generation ----------------------------
+
+
+def title_shingles(title: str, k: int = 2) -> Set[str]:
+    """Word ``k``-shingles of a PR title, ignoring the conventional-commit prefix."""
+    tokens = TOKEN_RE.findall(TITLE_PREFIX_RE.sub("", title or "").lower())
+    if len(tokens) < k:
+        return set(tokens)
+    return {" ".join(tokens[i : i + k]) for i in range(len(tokens) - k + 1)}
+
+
+def _stable_hash32(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode(), digest_size=4).digest(), "little")
+
+
+class MinHasher:
+    """MinHash signatures over string sets (stable across processes)."""
+
+    def __init__(self, num_perm: int = 64, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, 1 << 31, size=num_perm, dtype=np.uint64)
+
+    def signatures(self, sets: Sequence[Set[str]]) -> np.ndarray:
+        out = np.full((len(sets), self.num_perm), MERSENNE_61, dtype=np.uint64)
+        for i, items in enumerate(sets):
+            if not items:
+                continue
+            h = np.fromiter((_stable_hash32(t) for t in items), dtype=np.uint64, count=len(items))
+            out[i] = ((np.outer(h, self.a) + self.b) % MERSENNE_61).min(axis=0)
+        return out
+
+
+def candidate_pairs(
+    prs: Sequence[dict],
+    num_perm: int = 64,
+    bands: int = 16,
+    max_file_df: int = 25,
+    min_similarity: float = 0.3,
+    max_bucket: int = 50,
+) -> Dict[Tuple[int, int], float]:
+    """Likely-duplicate PR pairs with a cheap similarity in [0, 1].
+
+    Candidates come from two blocking keys: MinHash LSH bands over title
+    shingles, and shared file paths (paths touched by more than
+    ``max_file_df`` PRs are ignored, they are lockfiles and changelogs).
+    LSH buckets holding more than ``max_bucket`` PRs are ignored the same
+    way: they are templated titles ("Update dependencies") whose pair count
+    grows quadratically with the corpus.
+    The pair similarity is the larger of the title and file Jaccard.
+    """
+    nums = [int(pr["number"]) for pr in prs]
+    shingles = [title_shingles(pr.get("title", "")) for pr in prs]
+    files = [pr_file_paths(pr) for pr in prs]
+
+    sigs = MinHasher(num_perm=num_perm).signatures(shingles)
+    rows = num_perm // bands
+    cands: Set[Tuple[int, int]] = set()
+    for b in range(bands):
+        buckets: Dict[bytes, List[int]] = defaultdict(list)
+        band = sigs[:, b * rows : (b + 1) * rows]
+        for i in range(len(prs)):
+            if shingles[i]:
+                buckets[band[i].tobytes()].append(i)
+        for idxs in buckets.values():
+            if len(idxs) > max_bucket:
+                continue
+            for x in range(len(idxs)):
+                for y in range(x + 1, len(idxs)):
+                    cands.add((idxs[x], idxs[y]))
+
+    by_path: Dict[str, List[int]] = defaultdict(list)
+    for i, fs in enumerate(files):
+        for path in fs:
+            by_path[path].append(i)
+    for idxs in by_path.values():
+        if len(idxs) > max_file_df:
+            continue
+        for x in range(len(idxs)):
+            for y in range(x + 1, len(idxs)):
+                cands.add((idxs[x], idxs[y]))
+
+    out: Dict[Tuple[int, int], float] = {}
+    for i, j in cands:
+        title_sim = float(np.mean(sigs[i] == sigs[j])) if shingles[i] and shingles[j] else 0.0
+        union = files[i] | files[j]
+        file_sim = len(files[i] & files[j]) / len(union) if union else 0.0
+        sim = max(title_sim, file_sim)
+        if sim >= min_similarity:
+            a, b = sorted((nums[i], nums[j]))
+            out[(a, b)] = max(sim, out.get((a, b), 0.0))
+    return out
+
+
+def pack_batches(
+    prs: Sequence[dict],
+    batch_size: int = 10,
+    pairs: Optional[Dict[Tuple[int, int], float]] = None,
+) -> List[List[int]]:
+    """Pack PRs into LLM batches so likely duplicates share a batch.
+
+    Groups are grown greedily from the most similar candidate pair down,
+    never beyond ``batch_size`` (a capacity-constrained single linkage).
+    Groups are then first-fit into batches, largest first, and batches are
+    returned in descending order of within-batch similarity mass.
+    Unrelated PRs keep their input order as filler.
+    """
+    nums = [int(pr["number"]) for pr in prs]
+    if pairs is None:
+        pairs = candidate_pairs(prs)
+
+    position = {n: i for i, n in enumerate(nums)}
+    group_of = dict(position)
+    groups: Dict[int, List[int]] = {i: [n] for i, n in enumerate(nums)}
+    for (a, b), _ in sorted(pairs.items(), key=lambda t: (-t[1], t[0])):
+        if a not in group_of or b not in group_of:
+            continue
+        ga, gb = group_of[a], group_of[b]
+        if ga == gb or len(groups[ga]) + len(groups[gb]) > batch_size:
+            continue
+        for n in groups[gb]:
+            group_of[n] = ga
+        groups[ga].extend(groups.pop(gb))
+
+    n_batches = max(1, math.ceil(len(nums) / batch_size))
+    batches: List[List[int]] = [[] for _ in range(n_batches)]
+    ordered = sorted(groups.values(), key=lambda g: (-len(g), position[g[0]]))
+    for g in ordered:
+        target = next((b for b in batches if len(b) + len(g) <= batch_size), None)
+        if target is None:
+            batches.append([])
+            target = batches[-1]
+        target.extend(g)
+
+    def mass(batch: List[int]) -> float:
+        return sum(
+            pairs.get((min(a, b), max(a, b)), 0.0)
+            for i, a in enumerate(batch)
+            for b in batch[i + 1 :]
+        )
+
+    batches = [b for b in batches if b]
+    batches.sort(key=mass, reverse=True)
+    return batches
@@ -1 +1,215 @@
 """Run deep review synthesis for uncertain or high-impact pull requests."""
+
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.analysis.deduplicator import pr_file_paths
+from src.analysis.signal_extractor import extract_corpus
+
+# files whose changes tend to draw an architectural call rather than a code review
+CORE_PREFIXES = ("src/gateway/", "src/config/", "src/agents/", "src/infra/", ".github/workflows/")
+LARGE_SIZES = {"XL", "XXL"}
+JSON_ARRAY_RE = re.compile(r"\[.*\]", re.DOTALL)
+
+ReviewFn = Callable[[List[dict]], Dict[int, dict]]
+
+
+def pr_revision(pr: dict) -> str:
+    """Head commit when known, else the last update time."""
+    head = pr.get("head") if isinstance(pr.get("head"), dict) else {}
+    return str(pr.get("head_sha") or head.get("sha") or pr.get("updated_at") or pr.get("created_at") or "")
+
+
+def high_impact_flags(pr: dict, features: Mapping[str, Any]) -> List[str]:
+    """Reasons a PR deserves LLM review whatever its P(merge)."""
+    flags = []
+    size = features.get("size_label")
+    if size in LARGE_SIZES or (features.get("loc_total") or 0) >= 1000 or (features.get("files_changed") or 0) >= 30:
+        flags.append("large_change")
+    if features.get("touches_multiple_channels"):
+        flags.append("cross_channel")
+    if any(path.startswith(CORE_PREFIXES) for path in pr_file_paths(pr)):
+        flags.append("core_paths")
+    if features.get("has_approval"):
+        # approved but still open is where architectural vetoes show up
+        flags.append("approved_pending")
+    return flags
+
+
+class ReviewCache:
+    """LLM review results keyed by ``<pr>@<revision>``, persisted as JSON."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        if path is not None and path.exists():
+            self.entries = json.load(path.open())
+
+    @staticmethod
+    def key(number: int, revision: str) -> str:
+        return f"{int(number)}@{revision}"
+
+    def get(self, number: int, revision: str) -> Optional[dict]:
+        return self.entries.get(self.key(number, revision))
+
+    def put(self, number: int, revision: str, result: dict) -> None:
+        self.entries[self.key(number, revision)] = result
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        json.dump(self.entries, tmp.open("w"), indent=2, sort_keys=True)
+        tmp.replace(self.path)
+
+
+def build_review_prompt(prs: Sequence[dict]) -> str:
+    blocks = []
+    for pr in prs:
+        files = sorted(pr_file_paths(pr))
+        blocks.append(
+            "\n".join(
+                [
+                    f"### PR #{pr['number']}: {pr.get('title', '')}",
+                    f"Author: {pr.get('user', '')} | Labels: {', '.join(str(l) for l in pr.get('labels', []) or [])}",
+                    f"Files ({len(files)}): {', '.join(files[:25])}",
+                    (pr.get("body") or "")[:1500],
+                ]
+            )
+        )
+    return (
+        "You review open pull requests the deterministic model could not decide.\n"
+        "Focus on what features miss: architectural fit with the project's direction "
+        "(core vs extension/plugin), intent, and overlap with existing work.\n"
+        "Return ONLY a JSON array, one object per PR:\n"
+        '[{"pr_number": 1, "prediction": "merged|closed", "confidence": 0.0, '
+        '"closure_reason": "architectural_veto|duplicate|quality|stale|none", "reasoning": "..."}]\n\n'
+        + "\n\n".join(blocks)
+    )
+
+
+def parse_review_response(text: str) -> Dict[int, dict]:
+    match = JSON_ARRAY_RE.search(text or "")
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return {}
+    out = {}
+    for item in items:
+        if isinstance(item, dict) and "pr_number" in item:
+            try:
+                out[int(item["pr_number"])] = item
+            except (TypeError, ValueError):
+                continue
+    return out
+
+
+def llm_reviewer(call_text: Callable[[str], str]) -> ReviewFn:
+    """Wrap a prompt -> text function as a batch reviewer."""
+
+    def review(prs: List[dict]) -> Dict[int, dict]:
+        return parse_review_response(call_text(build_review_prompt(prs)))
+
+    return review
+
+
+def _llm_p_merge(result: Mapping[str, Any]) -> Optional[float]:
+    try:
+        conf = float(result.get("confidence"))
+    except (TypeError, ValueError):
+        return None
+    said_merged = str(result.get("prediction", "")).lower().strip() == "merged"
+    return conf if said_merged else 1.0 - conf
+
+
+class HybridScorer:
+    """Logit for every PR, LLM only where the logit is unsure or stakes are high.
+
+    PRs whose (calibrated) P(merge) falls inside ``band`` or that raise a
+    :func:`high_impact_flags` flag are escalated to ``review_fn`` in batches.
+    Results are cached per PR revision, so a PR is reviewed again only after
+    new commits. For escalated PRs the LLM's probability replaces the logit's
+    in ``p_final``; everything else keeps the logit score.
+    """
+
+    def __init__(
+        self,
+        router,
+        review_fn: ReviewFn,
+        calibrator=None,
+        band: Tuple[float, float] = (0.25, 0.75),
+        use_flags: bool = True,
+        cache: Optional[ReviewCache] = None,
+        batch_size: int = 10,
+    ) -> None:
+        self.router = router
+        self.review_fn = review_fn
+        self.calibrator = calibrator
+        self.band = band
+        self.use_flags = use_flags
+        self.cache = cache or ReviewCache()
+        self.batch_size = batch_size
+        self.stats = {"scored": 0, "escalated": 0, "cache_hits": 0, "llm_calls": 0, "llm_prs": 0}
+
+    def score(self, prs: Sequence[dict], context: Sequence[dict] = (), now: Optional[float] = None) -> List[Dict[str, Any]]:
+        rows = extract_corpus(list(context) + list(prs), now=now)[len(context):]
+        table = self.router.score_rows(rows, [int(pr["number"]) for pr in prs])
+        if self.calibrator is not None:
+            table = table.calibrated(self.calibrator)
+
+        lo, hi = self.band
+        uncertain = (table.p_merge >= lo) & (table.p_merge <= hi)
+        flags = [high_impact_flags(pr, row) if self.use_flags else [] for pr, row in zip(prs, rows)]
+        escalate = uncertain | np.array([bool(f) for f in flags], dtype=bool)
+
+        reviews: Dict[int, dict] = {}
+        pending: List[dict] = []
+        for i in np.flatnonzero(escalate):
+            pr = prs[i]
+            hit = self.cache.get(pr["number"], pr_revision(pr))
+            if hit is not None:
+                reviews[int(pr["number"])] = hit
+                self.stats["cache_hits"] += 1
+            else:
+                pending.append(pr)
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start : start + self.batch_size]
+            results = self.review_fn(batch)
+            self.stats["llm_calls"] += 1
+            self.stats["llm_prs"] += len(batch)
+            for pr in batch:
+                result = results.get(int(pr["number"]))
+                if result is not None:
+                    self.cache.put(pr["number"], pr_revision(pr), result)
+                    reviews[int(pr["number"])] = result
+        if pending:
+            self.cache.save()
+
+        self.stats["scored"] += len(prs)
+        self.stats["escalated"] += int(escalate.sum())
+
+        out = []
+        for i, rec in enumerate(table.records(ranked=False)):
+            review = reviews.get(rec["number"]) if escalate[i] else None
+            llm_p = _llm_p_merge(review) if review else None
+            reasons = (["uncertain"] if uncertain[i] else []) + flags[i]
+            rec.update(
+                {
+                    "route": "llm" if review else "logit",
+                    "escalation": reasons,
+                    "llm": review,
+                    "p_final": round(llm_p, 6) if llm_p is not None else rec["p_merge"],
+                }
+            )
+            out.append(rec)
+        out.sort(key=lambda r: -r["p_final"])
+        return out
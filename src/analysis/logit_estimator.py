@@ -1 +1,915 @@
 """Estimate merge probability using logistic regression over PR features."""
+
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+
+def sigmoid(z: np.ndarray) -> np.ndarray:
+    # split by sign so exp() never overflows
+    out = np.empty_like(z, dtype=float)
+    pos = z >= 0
+    out[pos] = 1.0 / (1.0 + np.exp(-z[pos]))
+    ez = np.exp(z[~pos])
+    out[~pos] = ez / (1.0 + ez)
+    return out
+
+
+def _is_missing(v: object) -> bool:
+    return v is None or (isinstance(v, float) and math.isnan(v))
+
+
+class CSRMatrix:
+    """Minimal compressed-sparse-row matrix over NumPy arrays.
+
+    Only what the logit solvers need: products with dense vectors, row
+    subsets and the weighted Gram matrix. Nothing here ever builds the dense
+    ``n x d`` array.
+    """
+
+    def __init__(self, data: np.ndarray, indices: np.ndarray, indptr: np.ndarray, shape: Tuple[int, int]) -> None:
+        self.data = np.asarray(data, dtype=float)
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.shape = (int(shape[0]), int(shape[1]))
+        self._rows = np.repeat(np.arange(self.shape[0]), np.diff(self.indptr))
+
+    @classmethod
+    def from_dense(cls, X: np.ndarray) -> "CSRMatrix":
+        X = np.asarray(X, dtype=float)
+        r, c = np.nonzero(X)
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(r, minlength=X.shape[0]))])
+        return cls(X[r, c], c, indptr, X.shape)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.data)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __matmul__(self, v: np.ndarray) -> np.ndarray:
+        """``X @ v`` for a 1-d ``v`` of length ``d``."""
+        return np.bincount(self._rows, weights=self.data * np.asarray(v, dtype=float)[self.indices], minlength=self.shape[0])
+
+    def rmatvec(self, u: np.ndarray) -> np.ndarray:
+        """``X.T @ u`` for a 1-d ``u`` of length ``n``."""
+        return np.bincount(self.indices, weights=self.data * np.asarray(u, dtype=float)[self._rows], minlength=self.shape[1])
+
+    def col_sq_sum(self, u: np.ndarray) -> np.ndarray:
+        """``(X * X).T @ u`` (the Hessian diagonal for row weights ``u``)."""
+        return np.bincount(self.indices, weights=self.data**2 * np.asarray(u, dtype=float)[self._rows], minlength=self.shape[1])
+
+    def __getitem__(self, rows) -> "CSRMatrix":
+        rows = np.arange(self.shape[0])[rows]
+        starts, ends = self.indptr[rows], self.indptr[rows + 1]
+        counts = ends - starts
+        take = np.repeat(starts - np.concatenate([[0], np.cumsum(counts)[:-1]]), counts) + np.arange(counts.sum())
+        indptr = np.concatenate([[0], np.cumsum(counts)])
+        return CSRMatrix(self.data[take], self.indices[take], indptr, (len(rows), self.shape[1]))
+
+    def gram(self, u: np.ndarray) -> np.ndarray:
+        """Dense ``X.T @ diag(u) @ X`` (d x d), built from per-row nonzero pairs."""
+        d = self.shape[1]
+        k = np.diff(self.indptr)[self._rows]  # row length, per nonzero
+        left = np.repeat(np.arange(self.nnz), k)
+        first = np.repeat(self.indptr[self._rows], k)
+        right = first + np.arange(len(left)) - np.repeat(np.cumsum(k) - k, k)
+        vals = self.data[left] * self.data[right] * np.asarray(u, dtype=float)[self._rows[left]]
+        flat = self.indices[left] * d + self.indices[right]
+        return np.bincount(flat, weights=vals, minlength=d * d).reshape(d, d)
+
+    def toarray(self) -> np.ndarray:
+        X = np.zeros(self.shape)
+        X[self._rows, self.indices] = self.data
+        return X
+
+
+class FeatureVectorizer:
+    """Turn LLM/extractor feature dicts into a design matrix.
+
+    Mirrors ``DictVectorizer`` semantics: numbers and bools become one
+    column named after the key, strings become one-hot ``key=value``
+    columns, lists of strings one-hot every element. Missing values
+    (``None``/NaN) are encoded as 0.
+
+    With ``n_features`` set, column names are hashed into that many buckets
+    instead of being kept in a vocabulary, so memory stays fixed however
+    many categories or discovered features show up.
+    """
+
+    def __init__(self, n_features: Optional[int] = None) -> None:
+        self.vocabulary: Dict[str, int] = {}
+        self.n_features = n_features
+
+    @staticmethod
+    def _items(row: Mapping[str, object]) -> Iterable[tuple]:
+        for k, v in row.items():
+            if _is_missing(v):
+                continue
+            if isinstance(v, bool):
+                yield str(k), 1.0 if v else 0.0
+            elif isinstance(v, (int, float)):
+                yield str(k), float(v)
+            elif isinstance(v, str):
+                yield f"{k}={v}", 1.0
+            elif isinstance(v, (list, tuple)):
+                for item in v:
+                    if isinstance(item, str):
+                        yield f"{k}={item}", 1.0
+
+    def _column(self, name: str) -> Optional[int]:
+        if self.n_features:
+            digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+            return int.from_bytes(digest, "little") % self.n_features
+        return self.vocabulary.get(name)
+
+    @property
+    def width(self) -> int:
+        return self.n_features or len(self.vocabulary)
+
+    def fit(self, rows: Sequence[Mapping[str, object]]) -> "FeatureVectorizer":
+        if self.n_features:
+            return self
+        names = {name for row in rows for name, _ in self._items(row or {})}
+        self.vocabulary = {name: i for i, name in enumerate(sorted(names))}
+        return self
+
+    def transform(self, rows: Sequence[Mapping[str, object]], sparse: bool = False) -> Union[np.ndarray, CSRMatrix]:
+        if sparse:
+            data: List[float] = []
+            indices: List[int] = []
+            indptr = [0]
+            for row in rows:
+                cols: Dict[int, float] = {}
+                for name, v in self._items(row or {}):
+                    j = self._column(name)
+                    if j is not None and v:
+                        cols[j] = cols.get(j, 0.0) + v if self.n_features else v
+                for j in sorted(cols):
+                    indices.append(j)
+                    data.append(cols[j])
+                indptr.append(len(indices))
+            return CSRMatrix(np.array(data), np.array(indices, dtype=np.int64), np.array(indptr), (len(rows), self.width))
+
+        X = np.zeros((len(rows), self.width), dtype=float)
+        for i, row in enumerate(rows):
+            for name, v in self._items(row or {}):
+                j = self._column(name)
+                if j is not None:
+                    # hashed buckets can collide, so they sum
+                    X[i, j] = X[i, j] + v if self.n_features else v
+        return X
+
+    def fit_transform(self, rows: Sequence[Mapping[str, object]], sparse: bool = False) -> Union[np.ndarray, CSRMatrix]:
+        return self.fit(rows).transform(rows, sparse=sparse)
+
+    @property
+    def feature_names(self) -> List[str]:
+        if self.n_features:
+            return [f"hash:{j}" for j in range(self.n_features)]
+        return sorted(self.vocabulary, key=self.vocabulary.get)
+
+
+def balanced_weights(y: np.ndarray) -> np.ndarray:
+    """Per-sample weights n / (2 * n_class), as ``class_weight="balanced"``."""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    n_pos = y.sum()
+    n_neg = n - n_pos
+    w_pos = n / (2.0 * n_pos) if n_pos else 0.0
+    w_neg = n / (2.0 * n_neg) if n_neg else 0.0
+    return np.where(y > 0.5, w_pos, w_neg)
+
+
+@dataclass
+class LogitFit:
+    """Fitted coefficients plus the inverse penalised Hessian.
+
+    ``cov`` is the full (d+1)x(d+1) matrix, or just its diagonal (1-d) for
+    very wide sparse fits; all NaN when fitted with ``covariance=False``.
+    """
+
+    coef: np.ndarray
+    intercept: float
+    cov: np.ndarray
+    feature_names: List[str]
+    l2: float
+    n_iter: int
+    converged: bool
+    log_likelihood: float
+    null_log_likelihood: float
+    meta: Dict[str, object] = field(default_factory=dict)
+
+    @property
+    def params(self) -> np.ndarray:
+        """Intercept followed by coefficients (the layout of ``cov``)."""
+        return np.concatenate([[self.intercept], self.coef])
+
+    @property
+    def standard_errors(self) -> np.ndarray:
+        var = np.diag(self.cov) if self.cov.ndim == 2 else self.cov
+        return np.sqrt(np.clip(var, 0.0, None))
+
+    @property
+    def pseudo_r2(self) -> float:
+        """McFadden's pseudo-R² on the training data."""
+        if not self.null_log_likelihood:
+            return 0.0
+        return 1.0 - self.log_likelihood / self.null_log_likelihood
+
+    def decision_function(self, X: Union[np.ndarray, CSRMatrix]) -> np.ndarray:
+        if isinstance(X, CSRMatrix):
+            return X @ self.coef + self.intercept
+        return np.asarray(X, dtype=float) @ self.coef + self.intercept
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return sigmoid(self.decision_function(X))
+
+    def as_dict(self, top: int = 50) -> Dict[str, object]:
+        se = self.standard_errors
+        ranked = sorted(range(len(self.coef)), key=lambda j: abs(self.coef[j]), reverse=True)
+        return {
+            "available": True,
+            "weights": [
+                {"feature": self.feature_names[j], "coef": float(self.coef[j]), "se": float(se[j + 1])}
+                for j in ranked[:top]
+            ],
+            "intercept": float(self.intercept),
+            "intercept_se": float(se[0]),
+            "l2": self.l2,
+            "n_iter": self.n_iter,
+            "converged": self.converged,
+            "pseudo_r2": round(self.pseudo_r2, 6),
+            **self.meta,
+        }
+
+
+def _log_likelihood(eta: np.ndarray, y: np.ndarray, w: np.ndarray) -> float:
+    # log(1 + e^eta) computed stably
+    return float(np.sum(w * (y * eta - np.logaddexp(0.0, eta))))
+
+
+def _pcg(hess_vec, diag: np.ndarray, g: np.ndarray, rtol: float, max_iter: int) -> np.ndarray:
+    """Jacobi-preconditioned conjugate gradient for ``H x = g``."""
+    x = np.zeros_like(g)
+    r = g.copy()
+    z = r / diag
+    direction = z.copy()
+    rz = float(r @ z)
+    stop = rtol * float(np.linalg.norm(g))
+    for _ in range(max_iter):
+        if np.linalg.norm(r) <= stop:
+            break
+        Hd = hess_vec(direction)
+        curv = float(direction @ Hd)
+        if curv <= 0:
+            break
+        alpha = rz / curv
+        x += alpha * direction
+        r -= alpha * Hd
+        z = r / diag
+        rz_new = float(r @ z)
+        direction = z + (rz_new / rz) * direction
+        rz = rz_new
+    return x
+
+
+def fit_logit(
+    X: Union[np.ndarray, CSRMatrix],
+    y: Sequence[float],
+    l2: float = 1.0,
+    sample_weight: Optional[np.ndarray] = None,
+    class_weight: Optional[str] = None,
+    warm_start: Optional[Union[LogitFit, np.ndarray]] = None,
+    feature_names: Optional[List[str]] = None,
+    max_iter: int = 50,
+    tol: float = 1e-8,
+    max_cov_dim: int = 2000,
+    covariance: bool = True,
+) -> LogitFit:
+    """L2-penalised logistic regression by Newton/IRLS.
+
+    Maximises ``sum_i w_i * loglik_i - l2/2 * ||coef||²`` (the intercept is
+    not penalised), which matches scikit-learn with ``C = 1 / l2``.
+    ``warm_start`` takes a previous fit (or a params vector, intercept
+    first) to start from.
+
+    A :class:`CSRMatrix` is solved by Newton-CG on Hessian-vector products
+    and is never densified. Its covariance is the exact inverse Hessian
+    while ``d <= max_cov_dim`` and the inverse Hessian diagonal beyond that.
+    ``covariance=False`` skips it for any input (standard errors are NaN),
+    for callers that only need the coefficients or predictions.
+    """
+    sparse = isinstance(X, CSRMatrix)
+    if not sparse:
+        X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n, d = X.shape
+    w = np.ones(n) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    if class_weight == "balanced":
+        w = w * balanced_weights(y)
+
+    Xa = None if sparse else np.hstack([np.ones((n, 1)), X])
+    penalty = np.full(d + 1, float(l2))
+    penalty[0] = 0.0
+
+    if isinstance(warm_start, LogitFit):
+        beta = warm_start.params.copy()
+    elif warm_start is not None:
+        beta = np.asarray(warm_start, dtype=float).copy()
+    else:
+        beta = np.zeros(d + 1)
+        rate = np.clip(np.average(y, weights=w) if w.sum() else 0.5, 1e-6, 1 - 1e-6)
+        beta[0] = math.log(rate / (1 - rate))
+
+    def linear(b: np.ndarray) -> np.ndarray:
+        return X @ b[1:] + b[0] if sparse else Xa @ b
+
+    def xt(u: np.ndarray) -> np.ndarray:
+        return np.concatenate([[u.sum()], X.rmatvec(u)]) if sparse else Xa.T @ u
+
+    def hessian(s: np.ndarray) -> np.ndarray:
+        if not sparse:
+            return (Xa * s[:, None]).T @ Xa + np.diag(penalty)
+        H = np.empty((d + 1, d + 1))
+        H[0, 0] = s.sum()
+        H[0, 1:] = H[1:, 0] = X.rmatvec(s)
+        H[1:, 1:] = X.gram(s)
+        return H + np.diag(penalty)
+
+    def newton_step(s: np.ndarray, grad: np.ndarray, gnorm: float) -> np.ndarray:
+        if sparse:
+            diag = np.concatenate([[s.sum()], X.col_sq_sum(s)]) + penalty
+            return _pcg(
+                lambda v: xt(s * linear(v)) + penalty * v,
+                np.maximum(diag, 1e-12),
+                grad,
+                rtol=min(0.1, math.sqrt(gnorm)),
+                max_iter=min(d + 1, 500),
+            )
+        H = hessian(s)
+        try:
+            return np.linalg.solve(H, grad)
+        except np.linalg.LinAlgError:
+            return np.linalg.lstsq(H, grad, rcond=None)[0]
+
+    def objective(b: np.ndarray) -> float:
+        return _log_likelihood(linear(b), y, w) - 0.5 * float(np.sum(penalty * b * b))
+
+    obj = objective(beta)
+    converged = False
+    it = 0
+    for it in range(1, max_iter + 1):
+        p = sigmoid(linear(beta))
+        grad = xt(w * (y - p)) - penalty * beta
+        step = newton_step(w * p * (1 - p), grad, float(np.max(np.abs(grad))))
+
+        # step-halving keeps the penalised likelihood monotone
+        t = 1.0
+        cand = beta + step
+        cand_obj = objective(cand)
+        while cand_obj < obj - 1e-12 and t >= 1e-6:
+            t *= 0.5
+            cand = beta + t * step
+            cand_obj = objective(cand)
+        if cand_obj < obj - 1e-12:
+            break  # no ascent along the Newton direction: keep beta, not converged
+        beta, prev = cand, obj
+        obj = cand_obj
+        if abs(obj - prev) <= tol * (abs(prev) + tol) and np.max(np.abs(t * step)) < 1e-6:
+            converged = True
+            break
+
+    eta = linear(beta)
+    p = sigmoid(eta)
+    s = w * p * (1 - p)
+    if not covariance:
+        cov = np.full(d + 1, np.nan)
+    elif sparse and d + 1 > max_cov_dim:
+        diag = np.concatenate([[s.sum()], X.col_sq_sum(s)]) + penalty
+        cov = 1.0 / np.maximum(diag, 1e-12)  # variances only; a d x d matrix would not fit
+    else:
+        H = hessian(s)
+        try:
+            cov = np.linalg.inv(H)
+        except np.linalg.LinAlgError:
+            cov = np.linalg.pinv(H)
+
+    rate = np.clip(np.average(y, weights=w) if w.sum() else 0.5, 1e-12, 1 - 1e-12)
+    null_ll = float(np.sum(w * (y * math.log(rate) + (1 - y) * math.log(1 - rate))))
+
+    return LogitFit(
+        coef=beta[1:],
+        intercept=float(beta[0]),
+        cov=cov,
+        feature_names=list(feature_names) if feature_names is not None else [f"x{j}" for j in range(d)],
+        l2=float(l2),
+        n_iter=it,
+        converged=converged,
+        log_likelihood=_log_likelihood(eta, y, w),
+        null_log_likelihood=null_ll,
+    )
+
+
+# -- evaluation -----------------------------------------------------------
+
+
+def auc_roc(y: Sequence[float], p: Sequence[float]) -> float:
+    """Mann-Whitney AUC with average ranks for ties."""
+    y = np.asarray(y, dtype=float)
+    p = np.asarray(p, dtype=float)
+    n_pos = int((y > 0.5).sum())
+    n_neg = len(y) - n_pos
+    if not n_pos or not n_neg:
+        return 0.5
+    order = np.argsort(p, kind="mergesort")
+    ranks = np.empty(len(p))
+    ranks[order] = np.arange(1, len(p) + 1)
+    _, inv, counts = np.unique(p, return_inverse=True, return_counts=True)
+    sums = np.bincount(inv, weights=ranks)
+    ranks = (sums / counts)[inv]
+    return float((ranks[y > 0.5].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+
+def brier_score(y: Sequence[float], p: Sequence[float]) -> float:
+    y = np.asarray(y, dtype=float)
+    p = np.asarray(p, dtype=float)
+    return float(np.mean((p - y) ** 2)) if len(y) else 0.0
+
+
+def calibration_curve(y: Sequence[float], p: Sequence[float], bins: int = 10) -> List[Dict[str, float]]:
+    y = np.asarray(y, dtype=float)
+    p = np.asarray(p, dtype=float)
+    idx = np.minimum((p * bins).astype(int), bins - 1)
+    count = np.bincount(idx, minlength=bins)
+    mean_p = np.bincount(idx, weights=p, minlength=bins)
+    rate = np.bincount(idx, weights=y, minlength=bins)
+    return [
+        {
+            "bin": round(b / bins, 2),
+            "count": int(count[b]),
+            "mean_predicted": round(float(mean_p[b] / count[b]), 6),
+            "observed_rate": round(float(rate[b] / count[b]), 6),
+        }
+        for b in range(bins)
+        if count[b]
+    ]
+
+
+def expected_calibration_error(y: Sequence[float], p: Sequence[float], bins: int = 10) -> float:
+    """Count-weighted mean gap between predicted and observed rate per bin."""
+    curve = calibration_curve(y, p, bins=bins)
+    n = sum(b["count"] for b in curve)
+    if not n:
+        return 0.0
+    return float(sum(b["count"] * abs(b["mean_predicted"] - b["observed_rate"]) for b in curve) / n)
+
+
+def evaluate(fit: LogitFit, X: np.ndarray, y: Sequence[float]) -> Dict[str, object]:
+    """The model_spec ``estimation.metrics`` for ``fit`` on (X, y)."""
+    y = np.asarray(y, dtype=float)
+    p = fit.predict_proba(X)
+    eta = fit.decision_function(X)
+    ll = _log_likelihood(eta, y, np.ones(len(y)))
+    rate = np.clip(y.mean(), 1e-12, 1 - 1e-12) if len(y) else 0.5
+    null_ll = float(np.sum(y * math.log(rate) + (1 - y) * math.log(1 - rate)))
+    return {
+        "n": int(len(y)),
+        "auc_roc": round(auc_roc(y, p), 6),
+        "pseudo_r2": round(1.0 - ll / null_ll, 6) if null_ll else 0.0,
+        "brier_score": round(brier_score(y, p), 6),
+        "calibration_curve": calibration_curve(y, p),
+    }
+
+
+# -- regularisation path --------------------------------------------------
+
+
+def cluster_groups(numbers: Sequence[int], clusters: Iterable[Iterable[int]]) -> np.ndarray:
+    """Group id per PR: the smallest member of its (merged) dedupe cluster, else its own number."""
+    parent: Dict[int, int] = {}
+
+    def find(x: int) -> int:
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for cl in clusters:
+        members = [int(n) for n in cl]
+        for n in members[1:]:
+            a, b = find(members[0]), find(n)
+            if a != b:
+                parent[max(a, b)] = min(a, b)
+    return np.array([find(int(n)) for n in numbers], dtype=np.int64)
+
+
+def group_folds(groups: Sequence[int], n_folds: int = 5, seed: int = 42) -> np.ndarray:
+    """Fold index per row; every row of a group lands in the same fold.
+
+    Groups are shuffled, then dealt largest-first to the currently smallest
+    fold so fold sizes stay balanced even with big duplicate clusters.
+    """
+    groups = np.asarray(groups)
+    uniq, inv, counts = np.unique(groups, return_inverse=True, return_counts=True)
+    rng = np.random.default_rng(seed)
+    perm = rng.permutation(len(uniq))
+    order = perm[np.argsort(-counts[perm], kind="stable")]
+    sizes = np.zeros(n_folds, dtype=int)
+    fold_of = np.empty(len(uniq), dtype=int)
+    for g in order:
+        f = int(np.argmin(sizes))
+        fold_of[g] = f
+        sizes[f] += counts[g]
+    return fold_of[inv]
+
+
+def default_lambdas(n: int = 12, high: float = 1e3, low: float = 1e-2) -> np.ndarray:
+    return np.geomspace(high, low, n)
+
+
+def _holdout_metrics(fit: LogitFit, X: np.ndarray, y: np.ndarray) -> Dict[str, float]:
+    eta = fit.decision_function(X)
+    p = sigmoid(eta)
+    ll = _log_likelihood(eta, y, np.ones(len(y)))
+    rate = np.clip(y.mean(), 1e-12, 1 - 1e-12) if len(y) else 0.5
+    null_ll = float(np.sum(y * math.log(rate) + (1 - y) * math.log(1 - rate)))
+    return {
+        "auc_roc": auc_roc(y, p),
+        "brier_score": brier_score(y, p),
+        "pseudo_r2": 1.0 - ll / null_ll if null_ll else 0.0,
+    }
+
+
+def _fold_path(job: tuple) -> List[Dict[str, float]]:
+    # top-level so ProcessPoolExecutor can pickle it
+    X, y, train, test, lambdas, class_weight, sample_weight = job
+    out = []
+    prev: Optional[LogitFit] = None
+    for lam in lambdas:
+        prev = fit_logit(
+            X[train],
+            y[train],
+            l2=float(lam),
+            sample_weight=None if sample_weight is None else sample_weight[train],
+            class_weight=class_weight,
+            warm_start=prev,
+            covariance=False,  # only the held-out metrics are needed
+        )
+        out.append(_holdout_metrics(prev, X[test], y[test]))
+    return out
+
+
+def regularization_path(
+    X: Union[np.ndarray, CSRMatrix],
+    y: Sequence[float],
+    groups: Optional[Sequence[int]] = None,
+    lambdas: Optional[Sequence[float]] = None,
+    n_folds: int = 5,
+    class_weight: Optional[str] = "balanced",
+    sample_weight: Optional[np.ndarray] = None,
+    max_workers: Optional[int] = None,
+    seed: int = 42,
+) -> Dict[str, object]:
+    """Grouped K-fold CV over a descending ``l2`` grid.
+
+    Each fold walks the grid from strongest to weakest penalty, warm-starting
+    every fit from the previous one, so a whole path costs little more than
+    a single cold fit. Folds run in a process pool. ``groups`` keeps
+    duplicate clusters inside one fold (see :func:`cluster_groups`).
+    Returns per-λ mean/std held-out AUC, Brier and pseudo-R², plus
+    ``best_l2`` (highest mean AUC; ties go to the stronger penalty). When no
+    fold has both classes to train on, nothing is scored: ``path`` is empty
+    and ``best_l2`` is None.
+    """
+    if not isinstance(X, CSRMatrix):
+        X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    lambdas = np.sort(np.asarray(default_lambdas() if lambdas is None else lambdas, dtype=float))[::-1]
+    groups = np.arange(len(y)) if groups is None else np.asarray(groups)
+    folds = group_folds(groups, n_folds=n_folds, seed=seed)
+
+    jobs = [
+        (X, y, folds != f, folds == f, lambdas, class_weight, sample_weight)
+        for f in range(n_folds)
+        if (folds == f).any() and len(np.unique(y[folds != f])) == 2
+    ]
+    workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        per_fold = [_fold_path(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            per_fold = list(pool.map(_fold_path, jobs))
+
+    path = []
+    for i, lam in enumerate(lambdas if per_fold else []):
+        row: Dict[str, float] = {"l2": float(lam)}
+        for metric in ("auc_roc", "brier_score", "pseudo_r2"):
+            vals = np.array([fold[i][metric] for fold in per_fold])
+            row[metric] = round(float(vals.mean()), 6)
+            row[f"{metric}_std"] = round(float(vals.std()), 6)
+        path.append(row)
+
+    best = max(path, key=lambda r: r["auc_roc"]) if path else None
+    return {
+        "n_folds": len(per_fold),
+        "n_groups": int(len(np.unique(groups))),
+        "best_l2": None if best is None else best["l2"],
+        "path": path,
+    }
+
+
+# -- cluster bootstrap ----------------------------------------------------
+
+# arrays a bootstrap worker attached from shared memory (set by _attach_shared)
+_SHARED: Dict[str, np.ndarray] = {}
+_SHARED_BLOCKS: List[shared_memory.SharedMemory] = []
+
+
+def _to_shared(arrays: Mapping[str, np.ndarray]) -> Tuple[List[shared_memory.SharedMemory], Dict[str, tuple]]:
+    blocks, spec = [], {}
+    for name, arr in arrays.items():
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        blocks.append(shm)
+        spec[name] = (shm.name, arr.shape, arr.dtype.str)
+    return blocks, spec
+
+
+def _attach_shared(spec: Mapping[str, tuple]) -> None:
+    _SHARED.clear()
+    for name, (shm_name, shape, dtype) in spec.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        _SHARED_BLOCKS.append(shm)
+        _SHARED[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+def _shared_design() -> Union[np.ndarray, CSRMatrix]:
+    if "X" in _SHARED:
+        return _SHARED["X"]
+    return CSRMatrix(_SHARED["data"], _SHARED["indices"], _SHARED["indptr"], tuple(_SHARED["shape"]))
+
+
+def _bootstrap_block(job: tuple) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    # top-level so ProcessPoolExecutor can pickle it; data comes from _SHARED
+    seeds, l2, balanced, start = job
+    X = _shared_design()
+    y, base_w, group_idx = _SHARED["y"], _SHARED["w"], _SHARED["groups"]
+    n_groups = int(group_idx.max()) + 1 if len(group_idx) else 0
+    X_eval = _SHARED.get("X_eval")
+
+    params, preds = [], []
+    for seed in seeds:
+        rng = np.random.default_rng(seed)
+        # resample whole groups; a row's weight is how often its group was drawn
+        counts = np.bincount(rng.integers(0, n_groups, size=n_groups), minlength=n_groups)
+        w = base_w * counts[group_idx]
+        if balanced:
+            pos = float(np.sum(w * y))
+            neg = float(np.sum(w * (1 - y)))
+            total = pos + neg
+            w = w * np.where(y > 0.5, total / (2 * pos) if pos else 0.0, total / (2 * neg) if neg else 0.0)
+        fit = fit_logit(X, y, l2=l2, sample_weight=w, warm_start=start, covariance=False)
+        params.append(fit.params)
+        if X_eval is not None:
+            preds.append(fit.predict_proba(X_eval))
+    return np.array(params), (np.array(preds) if X_eval is not None else None)
+
+
+@dataclass
+class BootstrapResult:
+    """Replicate coefficients (and optional predictions) from a cluster bootstrap."""
+
+    params: np.ndarray  # (n_boot, d + 1), intercept first
+    predictions: Optional[np.ndarray]  # (n_boot, n_eval)
+    n_groups: int
+
+    @property
+    def cov(self) -> np.ndarray:
+        return np.cov(self.params, rowvar=False)
+
+    @property
+    def standard_errors(self) -> np.ndarray:
+        return self.params.std(axis=0, ddof=1)
+
+    @staticmethod
+    def _interval(samples: np.ndarray, confidence: float) -> Tuple[np.ndarray, np.ndarray]:
+        tail = (1.0 - confidence) / 2.0 * 100.0
+        return np.percentile(samples, tail, axis=0), np.percentile(samples, 100.0 - tail, axis=0)
+
+    def param_interval(self, confidence: float = 0.95) -> Tuple[np.ndarray, np.ndarray]:
+        return self._interval(self.params, confidence)
+
+    def prediction_interval(self, confidence: float = 0.95) -> Tuple[np.ndarray, np.ndarray]:
+        """Percentile interval of P(merge) per evaluated row."""
+        if self.predictions is None:
+            raise ValueError("bootstrap was run without X_eval")
+        return self._interval(self.predictions, confidence)
+
+
+def cluster_bootstrap(
+    X: Union[np.ndarray, CSRMatrix],
+    y: Sequence[float],
+    groups: Sequence[object],
+    n_boot: int = 200,
+    l2: float = 1.0,
+    class_weight: Optional[str] = "balanced",
+    sample_weight: Optional[np.ndarray] = None,
+    X_eval: Optional[np.ndarray] = None,
+    fit: Optional[LogitFit] = None,
+    max_workers: Optional[int] = None,
+    seed: int = 0,
+) -> BootstrapResult:
+    """Resample whole groups (e.g. authors) with replacement and refit.
+
+    Rows from one author are correlated, so resampling rows understates the
+    spread; here every replicate draws authors and weights their rows by the
+    draw count. The design matrix (dense or CSR), labels and ``X_eval`` are
+    placed in shared memory once and every worker maps them instead of
+    receiving a copy. Replicates warm-start from ``fit`` (the full-data fit,
+    computed if not given).
+    """
+    y = np.asarray(y, dtype=float)
+    _, group_idx = np.unique(np.asarray(groups).astype(str), return_inverse=True)
+    w = np.ones(len(y)) if sample_weight is None else np.asarray(sample_weight, dtype=float)
+    if fit is None:
+        fit = fit_logit(X, y, l2=l2, sample_weight=w, class_weight=class_weight, covariance=False)
+
+    arrays: Dict[str, np.ndarray] = {"y": y, "w": w, "groups": group_idx.astype(np.int64)}
+    if isinstance(X, CSRMatrix):
+        arrays.update(data=X.data, indices=X.indices, indptr=X.indptr, shape=np.array(X.shape, dtype=np.int64))
+    else:
+        arrays["X"] = np.asarray(X, dtype=float)
+    if X_eval is not None:
+        arrays["X_eval"] = np.asarray(X_eval, dtype=float)
+
+    seeds = np.random.SeedSequence(seed).generate_state(n_boot).tolist()
+    workers = max(1, max_workers or os.cpu_count() or 1)
+    per_block = max(1, math.ceil(n_boot / (workers * 4)))
+    jobs = [
+        (seeds[i : i + per_block], l2, class_weight == "balanced", fit.params)
+        for i in range(0, n_boot, per_block)
+    ]
+
+    blocks, spec = _to_shared(arrays)
+    try:
+        if workers == 1:
+            _attach_shared(spec)
+            results = [_bootstrap_block(job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach_shared, initargs=(spec,)) as pool:
+                results = list(pool.map(_bootstrap_block, jobs))
+    finally:
+        _SHARED.clear()
+        for shm in _SHARED_BLOCKS:
+            shm.close()
+        _SHARED_BLOCKS.clear()
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+    params = np.vstack([r[0] for r in results]) if results else np.zeros((0, len(fit.params)))
+    preds = np.vstack([r[1] for r in results]) if X_eval is not None and results else None
+    return BootstrapResult(params=params, predictions=preds, n_groups=int(group_idx.max()) + 1 if len(y) else 0)
+
+
+# -- temporal strategy (model_spec.temporal_strategy) ---------------------
+
+
+def _month_start(ym: str) -> datetime:
+    y, m = (int(x) for x in ym.strip().split("-")[:2])
+    return datetime(y, m, 1, tzinfo=timezone.utc)
+
+
+def parse_window(spec: str) -> Tuple[float, float]:
+    """``"2025-11 to 2026-01"`` -> [start of 2025-11, start of 2026-02) as epochs."""
+    parts = [p.strip() for p in spec.split(" to ")]
+    start = _month_start(parts[0])
+    last = _month_start(parts[-1])
+    end = datetime(last.year + (last.month == 12), last.month % 12 + 1, 1, tzinfo=timezone.utc)
+    return start.timestamp(), end.timestamp()
+
+
+@dataclass
+class TemporalModels:
+    """Time-windowed fits plus the volume-weighted fit, sharing one design matrix."""
+
+    fits: Dict[str, LogitFit]
+    columns: Dict[str, np.ndarray]
+    windows: Dict[str, Tuple[float, float]]
+
+    def predict(self, X: np.ndarray, created_ts: Sequence[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """P(merge) and ``model_used`` per row.
+
+        A PR is scored by the window model covering its creation time. PRs
+        outside every window use the volume-weighted model, which is fitted
+        on all rows with the volume controls; without it they fall back to
+        the nearest window (earliest before, latest after).
+        """
+        if not self.fits:
+            raise ValueError("no temporal model was fitted (every window lacked rows of both classes)")
+        X = np.asarray(X, dtype=float)
+        ts = np.asarray(created_ts, dtype=float)
+        names = sorted(self.windows, key=lambda k: self.windows[k][0])
+        if "weighted" in self.fits or not names:
+            used = np.full(len(ts), "weighted", dtype=object)
+        else:
+            used = np.full(len(ts), names[-1], dtype=object)
+            used[ts < self.windows[names[0]][0]] = names[0]
+        for name in names:
+            lo, hi = self.windows[name]
+            used[(ts >= lo) & (ts < hi)] = name
+
+        p = np.empty(len(ts))
+        for name in set(used.tolist()):
+            rows = used == name
+            p[rows] = self.fits[name].predict_proba(X[np.ix_(rows, self.columns[name])])
+        return p, used
+
+    def as_dict(self, top: int = 20) -> Dict[str, object]:
+        return {name: fit.as_dict(top=top) for name, fit in self.fits.items()}
+
+
+def fit_temporal_models(
+    X: np.ndarray,
+    y: Sequence[float],
+    created_ts: Sequence[float],
+    feature_names: List[str],
+    strategy: Mapping[str, object],
+    l2: float = 1.0,
+    class_weight: Optional[str] = "balanced",
+    max_workers: Optional[int] = None,
+) -> TemporalModels:
+    """Fit every ``temporal_strategy`` model in parallel over one design matrix.
+
+    Window models (``models[*].train_window``) use the rows created inside
+    their window and leave out the weighted regression's control features.
+    The weighted model uses every row, all features, and
+    ``weight = 1 / weekly_pr_volume``. Each extra window is one more solve
+    on a row subset; the data is never reloaded.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    ts = np.asarray(created_ts, dtype=float)
+    name_idx = {n: j for j, n in enumerate(feature_names)}
+
+    weighted = strategy.get("weighted_regression") or {}
+    controls = {str(c) for c in weighted.get("control_features", [])}
+    window_cols = np.array([j for j, n in enumerate(feature_names) if n not in controls], dtype=int)
+    all_cols = np.arange(len(feature_names))
+
+    jobs = []
+    windows: Dict[str, Tuple[float, float]] = {}
+    for m in strategy.get("models", []):
+        lo, hi = parse_window(str(m["train_window"]))
+        windows[str(m["name"])] = (lo, hi)
+        rows = (ts >= lo) & (ts < hi)
+        jobs.append((str(m["name"]), rows, window_cols, None))
+
+    volume_col = name_idx.get("weekly_pr_volume")
+    if weighted and volume_col is not None:
+        vol = X[:, volume_col]
+        w = np.where(vol > 0, 1.0 / np.maximum(vol, 1.0), 0.0)
+        # rescale so the weights sum to n and l2 keeps its meaning
+        w = w * (len(w) / w.sum()) if w.sum() else w
+        jobs.append(("weighted", np.ones(len(y), dtype=bool), all_cols, w))
+
+    def run(job):
+        name, rows, cols, w = job
+        if rows.sum() < 2 or len(np.unique(y[rows])) < 2:
+            return name, cols, None
+        fit = fit_logit(
+            X[np.ix_(rows, cols)],
+            y[rows],
+            l2=l2,
+            sample_weight=None if w is None else w[rows],
+            class_weight=class_weight,
+            feature_names=[feature_names[j] for j in cols],
+        )
+        fit.meta["model_used"] = name
+        fit.meta["n_train"] = int(rows.sum())
+        return name, cols, fit
+
+    # numpy releases the GIL inside the Newton solves, so threads scale across cores
+    with ThreadPoolExecutor(max_workers=max_workers or min(len(jobs), os.cpu_count() or 1) or 1) as pool:
+        results = list(pool.map(run, jobs))
+
+    fits = {name: fit for name, _, fit in results if fit is not None}
+    columns = {name: cols for name, cols, fit in results if fit is not None}
+    return TemporalModels(
+        fits=fits,
+        columns=columns,
+        windows={k: v for k, v in windows.items() if k in fits},
+    )
@@ -1 +1,196 @@
 """Discover recurring patterns and trends across pull request streams."""
+
+from __future__ import annotations
+
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from src.analysis.deduplicator import MinHasher, pr_file_paths, title_shingles, to_epoch
+
+
+@dataclass
+class Burst:
+    """A group of similar PRs opened within one horizon."""
+
+    horizon_hours: float
+    trigger: int
+    members: List[int]
+    start: float
+    end: float
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "horizon_hours": self.horizon_hours,
+            "trigger": self.trigger,
+            "members": self.members,
+            "size": len(self.members),
+            "span_hours": round((self.end - self.start) / 3600.0, 3),
+        }
+
+
+class BurstDetector:
+    """Flag storms of similar PRs as they arrive.
+
+    PRs are fed in creation order via :meth:`observe`. The detector keeps a
+    sliding window as long as the largest horizon and indexes the live PRs
+    by MinHash LSH band (titles) and by file path, so each arrival only
+    compares against PRs that share a bucket with it. Nothing older than the
+    window is ever revisited.
+
+    An optional ``embed`` callable (PR -> vector) adds cosine similarity
+    against the live window on top of the sketch candidates.
+    """
+
+    def __init__(
+        self,
+        horizons_hours: Sequence[float] = (6.0, 48.0),
+        min_size: int = 3,
+        min_similarity: float = 0.4,
+        num_perm: int = 32,
+        bands: int = 8,
+        max_file_df: int = 25,
+        embed: Optional[Callable[[dict], np.ndarray]] = None,
+        min_cosine: float = 0.85,
+    ) -> None:
+        self.horizons = sorted(float(h) for h in horizons_hours)
+        self.window_seconds = self.horizons[-1] * 3600.0
+        self.min_size = min_size
+        self.min_similarity = min_similarity
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.max_file_df = max_file_df
+        self.embed = embed
+        self.min_cosine = min_cosine
+        self.hasher = MinHasher(num_perm=num_perm)
+
+        self.arrivals: Deque[Tuple[float, int]] = deque()
+        self.ts: Dict[int, float] = {}
+        self.sig: Dict[int, np.ndarray] = {}
+        self.has_title: Dict[int, bool] = {}
+        self.files: Dict[int, Set[str]] = {}
+        self.vec: Dict[int, np.ndarray] = {}
+        self.adj: Dict[int, Set[int]] = defaultdict(set)
+        self.band_index: Dict[Tuple[int, bytes], Set[int]] = defaultdict(set)
+        self.path_index: Dict[str, Set[int]] = defaultdict(set)
+        self.now = 0.0
+        # member sets already reported per horizon, so a burst is re-emitted only when it grows
+        self._reported: Dict[float, Set[frozenset]] = defaultdict(set)
+
+    def _band_keys(self, n: int) -> List[Tuple[int, bytes]]:
+        s = self.sig[n]
+        return [(b, s[b * self.rows : (b + 1) * self.rows].tobytes()) for b in range(self.bands)]
+
+    def _evict(self) -> None:
+        cutoff = self.now - self.window_seconds
+        evicted = False
+        while self.arrivals and self.arrivals[0][0] < cutoff:
+            _, n = self.arrivals.popleft()
+            if n not in self.ts:
+                continue
+            if self.has_title[n]:
+                for key in self._band_keys(n):
+                    self.band_index[key].discard(n)
+                    if not self.band_index[key]:
+                        del self.band_index[key]
+            for path in self.files[n]:
+                self.path_index[path].discard(n)
+                if not self.path_index[path]:
+                    del self.path_index[path]
+            for m in self.adj.pop(n, ()):
+                self.adj[m].discard(n)
+            for store in (self.ts, self.sig, self.has_title, self.files, self.vec):
+                store.pop(n, None)
+            evicted = True
+        if evicted:
+            for h, keys in self._reported.items():
+                self._reported[h] = {k for k in keys if all(m in self.ts for m in k)}
+
+    def _similarity(self, a: int, b: int) -> float:
+        title_sim = float(np.mean(self.sig[a] == self.sig[b])) if self.has_title[a] and self.has_title[b] else 0.0
+        union = self.files[a] | self.files[b]
+        file_sim = len(self.files[a] & self.files[b]) / len(union) if union else 0.0
+        return max(title_sim, file_sim)
+
+    def observe(self, pr: dict) -> List[Burst]:
+        """Add one PR and return the bursts (one per horizon) it completes or grows."""
+        n = int(pr["number"])
+        t = to_epoch(pr.get("created_at"))
+        self.now = max(self.now, t)
+        self._evict()
+        if n in self.ts or t < self.now - self.window_seconds:
+            return []
+
+        shingles = title_shingles(pr.get("title", ""))
+        self.ts[n] = t
+        self.sig[n] = self.hasher.signatures([shingles])[0]
+        self.has_title[n] = bool(shingles)
+        self.files[n] = pr_file_paths(pr)
+        self.arrivals.append((t, n))
+
+        cands: Set[int] = set()
+        if self.has_title[n]:
+            for key in self._band_keys(n):
+                cands |= self.band_index[key]
+                self.band_index[key].add(n)
+        for path in self.files[n]:
+            bucket = self.path_index[path]
+            if len(bucket) <= self.max_file_df:
+                cands |= bucket
+            bucket.add(n)
+        for m in cands:
+            if self._similarity(n, m) >= self.min_similarity:
+                self.adj[n].add(m)
+                self.adj[m].add(n)
+
+        if self.embed is not None:
+            v = np.asarray(self.embed(pr), dtype=float)
+            norm = np.linalg.norm(v)
+            self.vec[n] = v / norm if norm else v
+            if len(self.vec) > 1:
+                others = [m for m in self.vec if m != n]
+                sims = np.stack([self.vec[m] for m in others]) @ self.vec[n]
+                for m, s in zip(others, sims):
+                    if s >= self.min_cosine:
+                        self.adj[n].add(m)
+                        self.adj[m].add(n)
+
+        return self._bursts_for(n)
+
+    def _bursts_for(self, n: int) -> List[Burst]:
+        out: List[Burst] = []
+        for h in self.horizons:
+            lo = self.ts[n] - h * 3600.0
+            seen = {n}
+            stack = [n]
+            while stack:
+                cur = stack.pop()
+                for m in self.adj.get(cur, ()):
+                    if m not in seen and lo <= self.ts[m] <= self.ts[n]:
+                        seen.add(m)
+                        stack.append(m)
+            if len(seen) < self.min_size:
+                continue
+            key = frozenset(seen)
+            if key in self._reported[h]:
+                continue
+            self._reported[h].add(key)
+            times = [self.ts[m] for m in seen]
+            out.append(Burst(horizon_hours=h, trigger=n, members=sorted(seen), start=min(times), end=max(times)))
+        return out
+
+
+def detect_bursts(prs: Sequence[dict], **kwargs) -> List[Dict[str, object]]:
+    """Replay ``prs`` in creation order and keep the final form of each burst."""
+    detector = BurstDetector(**kwargs)
+    ordered = sorted(prs, key=lambda p: (to_epoch(p.get("created_at")), int(p["number"])))
+    latest: Dict[Tuple[float, int], Burst] = {}
+    for pr in ordered:
+        for burst in detector.observe(pr):
+            # a grown burst supersedes the smaller ones it contains
+            for k in [k for k, b in latest.items() if k[0] == burst.horizon_hours and set(b.members) <= set(burst.members)]:
+                del latest[k]
+            latest[(burst.horizon_hours, burst.members[0])] = burst
+    return [b.as_dict() for b in sorted(latest.values(), key=lambda b: (b.horizon_hours, b.start))]
@@ -1 +1,167 @@
 """Extract deterministic and semantic signals from pull requests."""
+
+from __future__ import annotations
+
+import bisect
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence
+
+from src.analysis.deduplicator import pr_file_paths, to_epoch
+
+# weeks_since_open is counted from the repository's first week (model_spec)
+REPO_EPOCH = datetime(2025, 11, 24, tzinfo=timezone.utc).timestamp()
+WEEK_SECONDS = 7 * 86400.0
+
+# built-in channels that live under src/<channel>/ rather than extensions/
+SRC_CHANNEL_DIRS = {"telegram", "discord", "slack", "signal", "imessage", "whatsapp", "line", "web"}
+CONTRIBUTOR_LABELS = {"maintainer", "trusted-contributor", "experienced-contributor"}
+# filled only when the payload carries comments/reviews; their presence marks a "mature" PR
+INTERACTION_FEATURES = ("comment_count", "high_engagement", "review_count", "has_approval", "has_changes_requested")
+
+
+def _labels(pr: dict) -> List[str]:
+    return [l["name"] if isinstance(l, dict) else str(l) for l in pr.get("labels", []) or []]
+
+
+def _merged(pr: dict) -> bool:
+    return bool(pr.get("merged_at") or pr.get("merged"))
+
+
+def _iso_week(ts: Optional[str]) -> str:
+    if not ts:
+        return ""
+    y, w, _ = datetime.fromisoformat(str(ts).replace("Z", "+00:00")).isocalendar()
+    return f"{y}-W{w:02d}"
+
+
+def _merge_time(pr: dict) -> Optional[float]:
+    """When the PR merged; ``None`` if it did not (or the time is unknown)."""
+    if not _merged(pr):
+        return None
+    for ts in (pr.get("merged_at"), pr.get("closed_at")):
+        if not ts:
+            continue
+        try:
+            return to_epoch(ts)
+        except ValueError:
+            continue
+    return None
+
+
+def author_history(prs: Sequence[dict]) -> Dict[int, Dict[str, Any]]:
+    """Prior PR count and merge rate per PR, using only the author's earlier PRs.
+
+    An earlier PR counts as merged only if it merged before this PR was
+    opened; a merge that lands while this PR is open is not yet history.
+    """
+    authored: Dict[str, List[dict]] = {}
+    for pr in prs:
+        authored.setdefault(pr.get("user", ""), []).append(pr)
+
+    out: Dict[int, Dict[str, Any]] = {}
+    for author_prs in authored.values():
+        ordered = sorted(author_prs, key=lambda p: (p.get("created_at") or "", int(p.get("number", 0))))
+        merge_times: List[float] = []  # sorted merge times of the PRs passed so far
+        prior = 0
+        for pr in ordered:
+            merged = bisect.bisect_left(merge_times, to_epoch(pr.get("created_at")))
+            out[int(pr["number"])] = {
+                "prior_prs": prior,
+                "prior_merged": merged,
+                "merge_rate": merged / prior if prior else 0.0,
+            }
+            prior += 1
+            t = _merge_time(pr)
+            if t is not None:
+                bisect.insort(merge_times, t)
+    return out
+
+
+def weekly_volume(prs: Sequence[dict]) -> Dict[str, int]:
+    return dict(Counter(_iso_week(pr.get("created_at")) for pr in prs))
+
+
+def size_label(pr: dict) -> Optional[str]:
+    for l in _labels(pr):
+        if l.startswith("size:"):
+            return l.split(":", 1)[1].strip()
+    return None
+
+
+def extract_features(
+    pr: dict,
+    history: Dict[str, Any],
+    week_volume: int,
+    now: Optional[float] = None,
+) -> Dict[str, Any]:
+    """Deterministic model_spec features for one PR.
+
+    Features that need data the PR payload does not carry are left as
+    ``None`` (the vectorizer encodes them as 0). Interaction features are
+    only filled when comments/reviews are present in the payload.
+    """
+    labels = _labels(pr)
+    files = pr_file_paths(pr)
+    adds = pr.get("additions")
+    dels = pr.get("deletions")
+    changed = pr.get("changed_files", pr.get("changedFiles"))
+    if changed is None and files:
+        changed = len(files)
+    created = to_epoch(pr.get("created_at"))
+
+    channels = {l.split(":", 1)[1].strip() for l in labels if l.startswith("channel:")}
+    for path in files:
+        parts = path.split("/")
+        if len(parts) >= 3 and parts[0] == "src" and parts[1] in SRC_CHANNEL_DIRS:
+            channels.add(parts[1])
+    components = sorted(l for l in labels if l.startswith(("channel:", "app:", "extensions:")))
+    categories = sorted(l for l in labels if ":" not in l and l not in CONTRIBUTOR_LABELS)
+
+    prior_prs = int(history.get("prior_prs", 0))
+    prior_rate = float(history.get("merge_rate", 0.0))
+    out: Dict[str, Any] = {
+        "loc_additions": adds,
+        "loc_deletions": dels,
+        "loc_total": (adds or 0) + (dels or 0) if adds is not None or dels is not None else None,
+        "files_changed": changed,
+        "size_label": size_label(pr),
+        "has_tests": any(".test." in p for p in files) if files else None,
+        "ci_green": pr.get("ci_green"),
+        "is_draft": bool(pr.get("draft", False)),
+        "category": categories or None,
+        "component_area": components or None,
+        "author_prior_prs": prior_prs,
+        "author_prior_merge_rate": prior_rate,
+        "is_low_merge_author": prior_prs >= 5 and prior_rate < 0.05,
+        "has_maintainer_label": "maintainer" in labels,
+        "has_trusted_contributor_label": "trusted-contributor" in labels,
+        "has_experienced_contributor_label": "experienced-contributor" in labels,
+        "weekly_pr_volume": week_volume,
+        "weeks_since_open": int((created - REPO_EPOCH) // WEEK_SECONDS) if created else None,
+        "touches_multiple_channels": len(channels) >= 2,
+        "touches_extensions": any(p.startswith("extensions/") for p in files)
+        or any(l.startswith("extensions:") for l in labels),
+    }
+
+    comments = pr.get("comments")
+    reviews = pr.get("reviews")
+    if comments is not None or reviews is not None:
+        comments = [c for c in comments or [] if isinstance(c, dict)]
+        reviews = [r for r in reviews or [] if isinstance(r, dict)]
+        states = {str(r.get("state", "")).upper() for r in reviews}
+        values = (len(comments), len(comments) >= 4, len(reviews), "APPROVED" in states, "CHANGES_REQUESTED" in states)
+        out.update(zip(INTERACTION_FEATURES, values))
+    if now is not None and created:
+        out["pr_age_hours"] = max(0.0, (now - created) / 3600.0)
+    return out
+
+
+def extract_corpus(prs: Sequence[dict], now: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Feature dicts for every PR, with author history and weekly volume from ``prs``."""
+    history = author_history(prs)
+    volume = weekly_volume(prs)
+    return [
+        extract_features(pr, history.get(int(pr["number"]), {}), volume.get(_iso_week(pr.get("created_at")), 0), now=now)
+        for pr in prs
+    ]
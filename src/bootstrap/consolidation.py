@@ -0,0 +1,257 @@
+"""Fold bootstrap round artifacts into persistent running aggregates."""
+
+from __future__ import annotations
+
+import json
+import math
+import os
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+ROUND_FILE_RE = re.compile(r"^round_(\d+)_(scores|results|patterns)\.json$")
+STATE_VERSION = 2
+BASELINE_ROUNDS = 3  # rounds before any arm injects learned context
+PERSISTENT_MIN_ROUNDS = 3
+PROMOTE_MIN_COUNT = 5
+CONFUSION_KEYS = ("tp", "fp", "tn", "fn")
+ROW_FIELDS = ("pr_number", "prediction", "confidence", "features")
+
+
+@dataclass
+class RunningStats:
+    """Welford running mean/variance that round-trips through JSON."""
+
+    n: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, x: float) -> None:
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def var(self) -> float:
+        """Sample variance (n - 1 denominator); 0 below two observations."""
+        return self.m2 / (self.n - 1) if self.n > 1 else 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {"n": self.n, "mean": self.mean, "m2": self.m2}
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "RunningStats":
+        return cls(int(d.get("n", 0)), float(d.get("mean", 0.0)), float(d.get("m2", 0.0)))
+
+
+def welch_t(a: RunningStats, b: RunningStats) -> float:
+    """Welch t of ``b`` over ``a``; 0 when either side has fewer than two rounds."""
+    if a.n < 2 or b.n < 2:
+        return 0.0
+    denom = math.sqrt(a.var / a.n + b.var / b.n)
+    return (b.mean - a.mean) / denom if denom else 0.0
+
+
+def discover_rounds(bootstrap_dir: Path) -> Dict[int, Dict[str, Path]]:
+    """``round -> {"scores"|"results"|"patterns": path}`` for every round file present."""
+    found: Dict[int, Dict[str, Path]] = {}
+    for path in bootstrap_dir.glob("round_*_*.json"):
+        m = ROUND_FILE_RE.match(path.name)
+        if m:
+            found.setdefault(int(m.group(1)), {})[m.group(2)] = path
+    return dict(sorted(found.items()))
+
+
+def _signature(files: Mapping[str, Path]) -> Dict[str, List[int]]:
+    out = {}
+    for kind, path in sorted(files.items()):
+        st = path.stat()
+        out[kind] = [st.st_size, st.st_mtime_ns]
+    return out
+
+
+@dataclass
+class ConsolidationState:
+    """Everything consolidation needs from rounds already read.
+
+    ``rounds`` records the size and mtime of each folded round file; when a
+    folded file changes or disappears the state is rebuilt from scratch,
+    otherwise only files not seen before are read (a round whose results
+    land after its scores folds just the results). Prediction rows for
+    the logit and the confidence calibration are appended to a JSONL file
+    next to the state, stripped to :data:`ROW_FIELDS` plus the round number.
+    """
+
+    rounds: Dict[str, Dict[str, List[int]]] = field(default_factory=dict)
+    accuracy: Dict[str, RunningStats] = field(
+        default_factory=lambda: {"baseline": RunningStats(), "learning": RunningStats(), "all": RunningStats()}
+    )
+    curve: List[Dict[str, Any]] = field(default_factory=list)
+    confusion: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(CONFUSION_KEYS, 0))
+    dedupe_rounds: List[Dict[str, Any]] = field(default_factory=list)
+    dedupe_f1: RunningStats = field(default_factory=RunningStats)
+    error_rounds: Counter = field(default_factory=Counter)
+    pattern_counts: Counter = field(default_factory=Counter)
+    rows: int = 0
+    rows_bytes: int = 0  # rows file size at the last save; later bytes are from an interrupted update
+
+    def fold(self, round_num: int, files: Mapping[str, Path], rows_out) -> None:
+        """Add one round's scores, patterns and prediction rows to the aggregates."""
+        if "scores" in files:
+            payload = json.load(files["scores"].open())
+            merge = payload.get("merge", {})
+            if "accuracy" in merge:
+                acc = float(merge["accuracy"])
+                self.accuracy["all"].add(acc)
+                self.accuracy["baseline" if round_num <= BASELINE_ROUNDS else "learning"].add(acc)
+                self.curve.append({"round": round_num, "accuracy": acc, "f1": merge.get("f1")})
+            for k in CONFUSION_KEYS:
+                self.confusion[k] += int(merge.get("confusion", {}).get(k, 0))
+            dedupe = payload.get("dedupe", {})
+            self.dedupe_rounds.append({"round": round_num, **dedupe})
+            self.dedupe_f1.add(float(dedupe.get("f1", 0.0)))
+            for e in payload.get("errors", []):
+                self.error_rounds[str(int(e["pr_number"]))] += 1
+        if "patterns" in files:
+            for p in json.load(files["patterns"].open()).get("patterns", []):
+                if p.get("pattern"):
+                    self.pattern_counts[p["pattern"]] += 1
+        if "results" in files:
+            for pred in json.load(files["results"].open()).get("predictions", []):
+                if isinstance(pred, dict) and pred.get("pr_number") is not None:
+                    rows_out.write(json.dumps({"round": round_num, **{k: pred.get(k) for k in ROW_FIELDS}}) + "\n")
+                    self.rows += 1
+        self.rounds[str(round_num)] = {**self.rounds.get(str(round_num), {}), **_signature(files)}
+
+    def summary(self, min_rounds: int = PERSISTENT_MIN_ROUNDS) -> Dict[str, Any]:
+        """The ``consolidated.json`` fields that do not need the prediction rows."""
+        base, learn = self.accuracy["baseline"], self.accuracy["learning"]
+        return {
+            "rounds_scored": self.accuracy["all"].n,
+            "rounds_seen": sorted(int(r) for r in self.rounds),
+            "learning_curve": {
+                "baseline_rounds_1_3_mean_accuracy": base.mean,
+                "learning_rounds_4_plus_mean_accuracy": learn.mean,
+                # pre-aggregate name, still read by existing reports
+                "learning_rounds_4_10_mean_accuracy": learn.mean,
+                "delta": learn.mean - base.mean,
+                "welch_t_stat": welch_t(base, learn),
+                "rounds": sorted(self.curve, key=lambda c: c["round"]),
+            },
+            "confusion": dict(self.confusion),
+            "promoted_patterns": [p for p, c in self.pattern_counts.items() if c >= PROMOTE_MIN_COUNT],
+            "persistent_error_count": sum(1 for c in self.error_rounds.values() if c >= min_rounds),
+        }
+
+    def persistent_errors(self, min_rounds: int = PERSISTENT_MIN_ROUNDS) -> List[Dict[str, int]]:
+        return [
+            {"pr_number": int(n), "error_rounds": c}
+            for n, c in sorted(self.error_rounds.items(), key=lambda x: (-x[1], int(x[0])))
+            if c >= min_rounds
+        ]
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "version": STATE_VERSION,
+            "rounds": self.rounds,
+            "accuracy": {k: v.as_dict() for k, v in self.accuracy.items()},
+            "curve": self.curve,
+            "confusion": self.confusion,
+            "dedupe_rounds": self.dedupe_rounds,
+            "dedupe_f1": self.dedupe_f1.as_dict(),
+            "error_rounds": dict(self.error_rounds),
+            "pattern_counts": dict(self.pattern_counts),
+            "rows": self.rows,
+            "rows_bytes": self.rows_bytes,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Mapping[str, Any]) -> "ConsolidationState":
+        return cls(
+            rounds={str(k): v for k, v in d.get("rounds", {}).items()},
+            accuracy={k: RunningStats.from_dict(v) for k, v in d.get("accuracy", {}).items()},
+            curve=list(d.get("curve", [])),
+            confusion={k: int(d.get("confusion", {}).get(k, 0)) for k in CONFUSION_KEYS},
+            dedupe_rounds=list(d.get("dedupe_rounds", [])),
+            dedupe_f1=RunningStats.from_dict(d.get("dedupe_f1", {})),
+            error_rounds=Counter(d.get("error_rounds", {})),
+            pattern_counts=Counter(d.get("pattern_counts", {})),
+            rows=int(d.get("rows", 0)),
+            rows_bytes=int(d.get("rows_bytes", 0)),
+        )
+
+
+class Consolidator:
+    """Persisted aggregate over one bootstrap directory.
+
+    :meth:`update` discovers round files, folds any round not yet in the
+    state and saves it, so adding round N+1 costs one round's read no
+    matter how many came before.
+    """
+
+    def __init__(self, bootstrap_dir: Path, state_path: Optional[Path] = None, rows_path: Optional[Path] = None) -> None:
+        self.bootstrap_dir = bootstrap_dir
+        self.state_path = state_path or bootstrap_dir / "consolidation_state.json"
+        self.rows_path = rows_path or self.state_path.with_name(self.state_path.stem + "_rows.jsonl")
+        self.state = self._load()
+
+    def _load(self) -> ConsolidationState:
+        if not self.state_path.exists() or not self.rows_path.exists():
+            return ConsolidationState()
+        try:
+            payload = json.load(self.state_path.open())
+        except (OSError, json.JSONDecodeError):
+            return ConsolidationState()
+        if payload.get("version") != STATE_VERSION:
+            return ConsolidationState()
+        return ConsolidationState.from_dict(payload)
+
+    def _stale(self, rounds: Mapping[int, Mapping[str, Path]]) -> bool:
+        for r, sig in self.state.rounds.items():
+            files = rounds.get(int(r), {})
+            for kind, seen in sig.items():
+                if kind not in files or _signature({kind: files[kind]})[kind] != seen:
+                    return True
+        return False
+
+    def update(self) -> List[int]:
+        """Fold new round files; returns the round numbers read this call."""
+        rounds = discover_rounds(self.bootstrap_dir)
+        if self._stale(rounds):
+            self.state = ConsolidationState()
+        unseen = {
+            r: {k: p for k, p in files.items() if k not in self.state.rounds.get(str(r), {})}
+            for r, files in rounds.items()
+        }
+        new = [r for r, files in unseen.items() if files]
+        self.rows_path.parent.mkdir(parents=True, exist_ok=True)
+        if self.state.rounds:
+            os.truncate(self.rows_path, self.state.rows_bytes)
+        with self.rows_path.open("a" if self.state.rounds else "w") as rows_out:
+            for r in new:
+                self.state.fold(r, unseen[r], rows_out)
+        self.state.rows_bytes = self.rows_path.stat().st_size
+        self.save()
+        return new
+
+    def save(self) -> None:
+        tmp = self.state_path.with_suffix(".tmp")
+        with tmp.open("w") as f:
+            json.dump(self.state.as_dict(), f, indent=2)
+        tmp.replace(self.state_path)
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Prediction rows of every folded round, in fold order."""
+        if not self.rows_path.exists():
+            return
+        with self.rows_path.open() as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def dedupe(self) -> Tuple[List[Dict[str, Any]], float]:
+        rounds = sorted(self.state.dedupe_rounds, key=lambda d: d["round"])
+        return rounds, self.state.dedupe_f1.mean
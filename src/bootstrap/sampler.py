@@ -0,0 +1,339 @@
+"""Stratified round sampling with duplicate-cluster co-location."""
+
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+AXES = ("outcome", "size", "category", "era")
+SIZE_ORDER = ("XS", "S", "M", "L", "XL", "XXL")
+# first matching substring wins, checked label by label
+CATEGORY_MAP = (
+    ("bug", "bug"),
+    ("fix", "bug"),
+    ("feature", "feature"),
+    ("enhancement", "feature"),
+    ("documentation", "docs"),
+    ("docs", "docs"),
+    ("infrastructure", "infra"),
+    ("ci", "infra"),
+    ("build", "infra"),
+    ("chore", "infra"),
+    ("refactor", "infra"),
+)
+LOC_SIZES = ((10, "XS"), (50, "S"), (200, "M"), (500, "L"))
+
+# (PRs, batch_size) -> batches of PR numbers, e.g. deduplicator.pack_batches
+PackFn = Callable[[List[dict], int], List[List[int]]]
+
+
+def _label_names(pr: dict) -> List[str]:
+    return [l["name"] if isinstance(l, dict) else str(l) for l in pr.get("labels", []) or []]
+
+
+def is_merged(pr: dict) -> bool:
+    return bool(pr.get("merged_at") or pr.get("merged"))
+
+
+def size_bucket(pr: dict, labels: Optional[Sequence[str]] = None) -> str:
+    """``size:`` label when present, else a bucket from lines changed."""
+    for l in labels if labels is not None else _label_names(pr):
+        if l.startswith("size:"):
+            return l.split(":", 1)[1].strip()
+    adds, dels = pr.get("additions"), pr.get("deletions")
+    if adds is None and dels is None:
+        return "none"
+    loc = (adds or 0) + (dels or 0)
+    return next((name for limit, name in LOC_SIZES if loc <= limit), "XL")
+
+
+def category_bucket(labels: Sequence[str]) -> str:
+    for l in labels:
+        low = l.lower()
+        for key, cat in CATEGORY_MAP:
+            if key in low:
+                return cat
+    return "other"
+
+
+def era_bucket(created_at: Optional[str], era_days: int = 30) -> str:
+    """Index of the ``era_days``-long window the PR was opened in."""
+    if not created_at:
+        return "none"
+    ts = datetime.fromisoformat(str(created_at).replace("Z", "+00:00")).timestamp()
+    return str(int(ts // (era_days * 86400)))
+
+
+def classify_pr(pr: dict, era_days: int = 30) -> Dict[str, str]:
+    labels = _label_names(pr)
+    return {
+        "outcome": "merged" if is_merged(pr) else "closed",
+        "size": size_bucket(pr, labels),
+        "category": category_bucket(labels),
+        "era": era_bucket(pr.get("created_at"), era_days),
+    }
+
+
+def _largest_remainder(weights: np.ndarray, total: int, cap: np.ndarray) -> np.ndarray:
+    """Integer quotas proportional to ``weights`` summing to ``total``, each within ``cap``."""
+    quota = np.zeros(len(weights), dtype=np.int64)
+    remaining = int(min(total, cap.sum()))
+    w = weights.astype(float).copy()
+    while remaining > 0:
+        open_ = (quota < cap) & (w > 0)
+        if not open_.any():
+            open_ = quota < cap
+            w = open_.astype(float)
+        share = np.where(open_, w, 0.0)
+        ideal = remaining * share / share.sum()
+        add = np.minimum(np.floor(ideal).astype(np.int64), cap - quota)
+        left = remaining - int(add.sum())
+        if left > 0:
+            frac = np.where(open_ & (quota + add < cap), ideal - np.floor(ideal), -1.0)
+            top = np.argsort(-frac, kind="stable")[:left]
+            add[top[frac[top] >= 0]] += 1
+        quota += add
+        taken = int(add.sum())
+        if taken == 0:
+            break
+        remaining -= taken
+    return quota
+
+
+class StratifiedSampler:
+    """Round samples stratified on outcome × size × category × era.
+
+    PRs are classified once into integer strata. Each round draws its own
+    RNG stream from ``(seed, round)``, so any round can be regenerated
+    without replaying the ones before it. Within a round, whole duplicate
+    clusters are placed first (each in its own batch, large clusters
+    chained over consecutive batches sharing one PR), and the remaining
+    quota is split across strata by largest remainder in proportion to
+    what is still available, optionally reweighting outcomes towards
+    ``merge_target``. Membership is tracked in boolean masks and each
+    stratum's quota is drawn from a precomputed per-stratum index, so a
+    round costs a few vector passes plus work proportional to its size.
+    """
+
+    def __init__(
+        self,
+        prs: Sequence[dict],
+        clusters: Iterable[Sequence[int]] = (),
+        axes: Sequence[str] = AXES,
+        era_days: int = 30,
+        seed: int = 42,
+        merge_target: Optional[float] = None,
+        pack: Optional[PackFn] = None,
+    ) -> None:
+        unknown = set(axes) - set(AXES)
+        if unknown:
+            raise ValueError(f"unknown stratification axes: {sorted(unknown)}")
+        self.prs = list(prs)
+        self.axes = tuple(axes)
+        self.seed = seed
+        self.merge_target = merge_target
+        self.pack = pack
+        self.numbers = np.array([int(pr["number"]) for pr in self.prs], dtype=np.int64)
+        self.index = {int(n): i for i, n in enumerate(self.numbers)}
+        self.merged = np.array([is_merged(pr) for pr in self.prs], dtype=bool)
+
+        keys = ["|".join(c[a] for a in self.axes) for c in (classify_pr(pr, era_days) for pr in self.prs)]
+        self.strata_names, self.stratum = np.unique(np.array(keys, dtype=object), return_inverse=True)
+        self.stratum = self.stratum.astype(np.int64)
+        self.stratum_merged = np.bincount(self.stratum, weights=self.merged, minlength=len(self.strata_names)) > 0
+        self._by_stratum = np.argsort(self.stratum, kind="stable")
+        self._starts = np.searchsorted(self.stratum[self._by_stratum], np.arange(len(self.strata_names) + 1))
+
+        self.clusters: List[np.ndarray] = []
+        self.cluster_of = np.full(len(self.prs), -1, dtype=np.int64)
+        for members in clusters:
+            idx = [self.index[int(n)] for n in members if int(n) in self.index]
+            idx = [i for i in idx if self.cluster_of[i] < 0]
+            if len(idx) > 1:
+                self.cluster_of[idx] = len(self.clusters)
+                self.clusters.append(np.array(sorted(idx, key=lambda i: self.numbers[i]), dtype=np.int64))
+
+    def rng(self, round_num: int) -> np.random.Generator:
+        return np.random.default_rng([self.seed, round_num])
+
+    def _quota(self, available: np.ndarray, need: int, merge_share: Optional[float]) -> np.ndarray:
+        """Per-stratum counts summing to ``need``, proportional to availability.
+
+        With a ``merge_share`` the merged/closed split is fixed first and
+        each side is then allocated across its own strata.
+        """
+        cap = np.bincount(self.stratum[available], minlength=len(self.strata_names))
+        if merge_share is None or "outcome" not in self.axes:
+            return _largest_remainder(cap, need, cap)
+        merged_cap = np.where(self.stratum_merged, cap, 0)
+        closed_cap = cap - merged_cap
+        k = min(int(round(merge_share * need)), int(merged_cap.sum()))
+        k = max(k, need - int(closed_cap.sum()))
+        return _largest_remainder(merged_cap, k, merged_cap) + _largest_remainder(closed_cap, need - k, closed_cap)
+
+    def _draw(self, rng: np.random.Generator, stratum: int, k: int, available: np.ndarray) -> np.ndarray:
+        """``k`` available PRs from one stratum, uniformly without replacement."""
+        members = self._by_stratum[self._starts[stratum] : self._starts[stratum + 1]]
+        if 4 * k < len(members):
+            # small quota from a big stratum: oversample, keep the available ones
+            cand = members[rng.choice(len(members), size=min(len(members), 4 * k + 16), replace=False)]
+            cand = cand[available[cand]]
+            if len(cand) >= k:
+                return cand[:k]
+        free = members[available[members]]
+        return free[rng.permutation(len(free))[:k]]
+
+    def pick_clusters(self, rng: np.random.Generator, used: np.ndarray, pool: np.ndarray, k: int, n: int) -> List[np.ndarray]:
+        if not self.clusters or k <= 0:
+            return []
+        blocked = np.bincount(self.cluster_of[used | ~pool][self.cluster_of[used | ~pool] >= 0], minlength=len(self.clusters))
+        eligible = np.flatnonzero(blocked == 0)
+        picked: List[np.ndarray] = []
+        size = 0
+        for c in rng.permutation(eligible):
+            members = self.clusters[c]
+            if size + len(members) > n:
+                continue
+            picked.append(members)
+            size += len(members)
+            if len(picked) >= k:
+                break
+        return picked
+
+    def _batches(
+        self, rng: np.random.Generator, clusters: List[np.ndarray], filler: np.ndarray, batch_size: int
+    ) -> Tuple[List[List[int]], Dict[str, List[int]]]:
+        batches: List[List[int]] = []
+        cluster_map: Dict[str, List[int]] = {}
+        for members in clusters:
+            nums = [int(x) for x in self.numbers[members]]
+            start = len(batches)
+            if len(nums) <= batch_size:
+                batches.append(nums)
+            else:
+                # chain large clusters: consecutive batches share one PR
+                step = batch_size - 1
+                for i in range(0, len(nums) - 1, step):
+                    batches.append(nums[i : i + batch_size])
+            cluster_map["-".join(map(str, nums))] = list(range(start + 1, len(batches) + 1))
+
+        if self.pack is not None:
+            fill_batches = self.pack([self.prs[i] for i in filler], batch_size)
+            fill = [n for b in fill_batches for n in b]
+        else:
+            fill = [int(x) for x in self.numbers[rng.permutation(filler)]]
+        # top up cluster batches first, then open new ones
+        ptr = 0
+        for b in batches:
+            take = batch_size - len(b)
+            if take > 0:
+                b.extend(fill[ptr : ptr + take])
+                ptr += take
+        batches.extend(fill[i : i + batch_size] for i in range(ptr, len(fill), batch_size))
+        return batches, cluster_map
+
+    def sample_round(
+        self,
+        round_num: int,
+        n: int,
+        used: Optional[np.ndarray] = None,
+        pool: Optional[np.ndarray] = None,
+        batch_size: int = 10,
+        clusters_per_round: int = 0,
+    ) -> dict:
+        """One round of ``n`` PRs drawn from ``pool`` minus ``used`` (boolean masks).
+
+        ``used`` is updated in place with the PRs drawn.
+        """
+        rng = self.rng(round_num)
+        size = len(self.prs)
+        used = np.zeros(size, dtype=bool) if used is None else used
+        pool = np.ones(size, dtype=bool) if pool is None else pool
+
+        chosen_clusters = self.pick_clusters(rng, used, pool, clusters_per_round, n)
+        selected = np.zeros(size, dtype=bool)
+        for members in chosen_clusters:
+            selected[members] = True
+
+        available = pool & ~used & ~selected
+        if clusters_per_round > 0:
+            # a partial cluster would leak a duplicate without its partner
+            available &= self.cluster_of < 0
+        need = n - int(selected.sum())
+        merge_share = None
+        if self.merge_target is not None and need > 0:
+            # clusters are taken whole, so the filler makes up their merge rate
+            merge_share = min(1.0, max(0.0, (self.merge_target * n - self.merged[selected].sum()) / need))
+        quota = self._quota(available, need, merge_share)
+
+        filler = np.concatenate(
+            [self._draw(rng, s, int(quota[s]), available) for s in np.flatnonzero(quota)] or [np.zeros(0, dtype=np.int64)]
+        )
+        return self.assemble(rng, round_num, n, chosen_clusters, filler, used, batch_size)
+
+    def assemble(
+        self,
+        rng: np.random.Generator,
+        round_num: int,
+        n: int,
+        clusters: List[np.ndarray],
+        filler: np.ndarray,
+        used: np.ndarray,
+        batch_size: int = 10,
+    ) -> dict:
+        """The round record for ``clusters`` plus ``filler`` (row indices); marks them in ``used``."""
+        selected = np.zeros(len(self.prs), dtype=bool)
+        for members in clusters:
+            selected[members] = True
+        selected[filler] = True
+        used |= selected
+
+        batches, cluster_map = self._batches(rng, clusters, filler, batch_size)
+        sampled = np.flatnonzero(selected)
+        per_stratum = np.bincount(self.stratum[sampled], minlength=len(self.strata_names))
+        return {
+            "round": round_num,
+            "prs_per_round": n,
+            "seed": self.seed,
+            "sampled_pr_numbers": sorted(int(x) for x in self.numbers[sampled]),
+            "dedupe_clusters_selected": [[int(x) for x in self.numbers[m]] for m in clusters],
+            "batch_assignments": {str(i): b for i, b in enumerate(batches, start=1)},
+            "cluster_batch_map": cluster_map,
+            "stats": {
+                "sample_size": int(len(sampled)),
+                "merge_rate": round(float(self.merged[sampled].mean()), 6) if len(sampled) else 0.0,
+                "dedupe_cluster_count": len(clusters),
+                "axes": list(self.axes),
+                "strata": {str(self.strata_names[s]): int(c) for s, c in enumerate(per_stratum) if c},
+            },
+        }
+
+    def pool_mask(self, pool: Optional[Iterable[int]]) -> Optional[np.ndarray]:
+        if pool is None:
+            return None
+        mask = np.zeros(len(self.prs), dtype=bool)
+        mask[[self.index[int(x)] for x in pool if int(x) in self.index]] = True
+        return mask
+
+    def rounds(
+        self,
+        n_rounds: int,
+        n: int,
+        start: int = 1,
+        pool: Optional[Set[int]] = None,
+        batch_size: int = 10,
+        clusters_per_round: int = 0,
+        replace: bool = False,
+    ) -> List[dict]:
+        """Rounds ``start..n_rounds``; without ``replace`` no PR appears in two rounds."""
+        pool_mask = self.pool_mask(pool)
+        used = np.zeros(len(self.prs), dtype=bool)
+        out = []
+        for r in range(start, n_rounds + 1):
+            mask = np.zeros(len(self.prs), dtype=bool) if replace else used
+            out.append(
+                self.sample_round(r, n, used=mask, pool=pool_mask, batch_size=batch_size, clusters_per_round=clusters_per_round)
+            )
+        return out
@@ -1 +1,692 @@
 """Run sequential bootstrap training rounds and track learning gains."""
+
+from __future__ import annotations
+
+import json
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from src.bootstrap.consolidation import BASELINE_ROUNDS
+from src.bootstrap.sampler import StratifiedSampler
+from src.reporting.error_index import ErrorIndex
+from src.utils.llm import LLMClient, estimate_tokens, pack_by_tokens
+
+ROOT = Path(__file__).resolve().parents[2]
+SCRIPTS = ROOT / "scripts"
+EMPTY_OUTPUT = {"predictions": [], "duplicates": []}
+DEFAULT_AUTHOR_STATS = {"prior_prs": 0, "prior_merged": 0, "merge_rate": 0.0}
+PATTERN_POLICIES = {"none", "qualitative", "all"}
+PRIOR_ERROR_POLICIES = {"none", "last_round", "window"}
+
+
+@dataclass
+class PromptContext:
+    """Everything an arm's prompt builder may draw on for one batch."""
+
+    round: int
+    batch: List[dict]
+    feature_spec: List[dict]
+    patterns: List[Dict[str, str]] = field(default_factory=list)
+    prior_errors: List[Dict[str, Any]] = field(default_factory=list)
+    discovered: List[Dict[str, Any]] = field(default_factory=list)
+    feature_schema: Optional[Dict[str, Any]] = None
+
+
+PromptBuilder = Callable[[PromptContext], str]
+
+
+@dataclass
+class FeatureDiscovery:
+    """Hooks for arms that grow a feature registry from their own errors."""
+
+    load: Callable[[Path, int], tuple]  # (registry_path, active_cap) -> (discovered, schema)
+    enforce: Callable[[List[dict], Dict[str, Any]], List[dict]]
+    script: str = "analyze_error_features_v4b.py"
+    max_new: int = 5
+    active_cap: int = 20
+
+
+@dataclass
+class ArmConfig:
+    """One experiment arm: how prompts are built and what context they learn from.
+
+    ``pattern_policy`` picks which entries of the arm's patterns_state.json
+    reach the prompt (from ``pattern_start_round``); ``pattern_script``
+    updates that state after each round. ``prior_errors`` injects concrete
+    mistakes: ``last_round`` (all of round r-1) or ``window`` (up to
+    ``prior_per_round`` sampled from each of the last ``prior_window``
+    rounds).
+    """
+
+    name: str
+    prompt_builder: PromptBuilder
+    format_pr: Optional[Callable[[dict], str]] = None
+    pattern_policy: str = "none"
+    pattern_start_round: int = 4
+    pattern_script: Optional[str] = None
+    prior_errors: str = "none"
+    prior_start_round: int = 4
+    prior_window: int = 3
+    prior_per_round: int = 10
+    discovery: Optional[FeatureDiscovery] = None
+    reflection: bool = False
+    posthoc_patterns: bool = False
+    batch_workers: int = 4
+
+    def __post_init__(self) -> None:
+        if self.pattern_policy not in PATTERN_POLICIES:
+            raise ValueError(f"unknown pattern policy: {self.pattern_policy}")
+        if self.prior_errors not in PRIOR_ERROR_POLICIES:
+            raise ValueError(f"unknown prior-error policy: {self.prior_errors}")
+
+
+@dataclass
+class Corpus:
+    """The loaded population every arm samples from, shared read-only."""
+
+    prs: Dict[int, dict]
+    prs_path: Path
+    feature_spec: List[dict]
+    split_path: Path
+    author_stats: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    sanitize: Callable[[dict], dict] = lambda pr: pr
+
+    def batch(self, numbers: Sequence[int]) -> List[dict]:
+        out = []
+        for n in numbers:
+            pr = self.prs.get(int(n))
+            if pr is None:
+                continue
+            pr = dict(pr)
+            pr.update(self.author_stats.get(int(n), DEFAULT_AUTHOR_STATS))
+            out.append(self.sanitize(pr))
+        return out
+
+
+def log_line(path: Path, msg: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a") as f:
+        f.write(f"[{datetime.now(timezone.utc).isoformat()}] {msg}\n")
+
+
+def run_py(script: str, args: List[str]) -> None:
+    cmd = [sys.executable, str(SCRIPTS / script)] + args
+    subprocess.run(cmd, check=True)
+
+
+def _load_errors(path: Path) -> List[Dict[str, Any]]:
+    if not path.exists():
+        return []
+    try:
+        payload = json.load(path.open())
+    except (OSError, json.JSONDecodeError):
+        return []
+    errs = payload.get("errors", []) if isinstance(payload, dict) else payload
+    return [e for e in errs if isinstance(e, dict)]
+
+
+def load_prior_errors_window(
+    out_dir: Path,
+    round_num: int,
+    window: int,
+    per_round: int,
+    seed: int,
+    errors_for: Optional[Callable[[int], List[Dict[str, Any]]]] = None,
+) -> List[Dict[str, Any]]:
+    """Load compact prior-errors from the last N rounds.
+
+    Sampling policy: up to `per_round` random errors from EACH prior round.
+    Example: window=3 and per_round=10 -> up to 30 errors total.
+    ``errors_for(round)`` replaces reading round_N_errors.json, e.g. an
+    :class:`~src.reporting.error_index.ErrorIndex` lookup.
+    """
+    if round_num <= 1 or window <= 0 or per_round <= 0:
+        return []
+
+    collected: List[Dict[str, Any]] = []
+    for rr in range(round_num - 1, max(0, round_num - window - 1), -1):
+        errs = errors_for(rr) if errors_for is not None else _load_errors(out_dir / f"round_{rr}_errors.json")
+        if not errs:
+            continue
+        rng = random.Random(seed + (round_num * 1000) + rr)
+        sampled = errs if len(errs) <= per_round else rng.sample(errs, per_round)
+        for e in sampled:
+            refl = str(e.get("reflection", "") or e.get("reasoning", "")).strip()
+            collected.append(
+                {
+                    "round": rr,
+                    "pr_number": e.get("pr_number"),
+                    "error_type": e.get("error_type"),
+                    "reflection": refl[:260],
+                }
+            )
+    return collected
+
+
+def load_patterns(path: Path, policy: str) -> List[Dict[str, str]]:
+    """Active/revised patterns from a patterns_state.json, filtered by policy."""
+    if policy == "none" or not path.exists():
+        return []
+    state = json.load(path.open())
+    return [
+        {"pattern": str(p.get("pattern", "")), "anti_pattern": str(p.get("anti_pattern", ""))}
+        for p in state.get("patterns", [])
+        if p.get("status") in {"active", "revised"}
+        and p.get("pattern")
+        and (policy == "all" or p.get("kind") == "qualitative")
+    ]
+
+
+def reflection_prompts(
+    errors: Sequence[Dict[str, Any]],
+    prs: Mapping[int, dict],
+    format_pr: Callable[[dict], str],
+    batch_size: int = 10,
+    context_tokens: int = 0,
+) -> List[str]:
+    """Prompts asking the model why it got each error wrong, ``batch_size`` errors per call.
+
+    With ``context_tokens`` set, errors are instead bin-packed into prompts
+    of that many (estimated) tokens, still at most ``batch_size`` each.
+    """
+    blocks = []
+    for e in errors:
+        pr_data = prs.get(int(e["pr_number"]), {})
+        pr_content = format_pr(pr_data) if pr_data else "(PR content not available)"
+        desc = "merged (WRONG — actually closed)" if e["error_type"] == "fp" else "closed (WRONG — actually merged)"
+        blocks.append(
+            f"PR #{int(e['pr_number'])}: You predicted {desc}.\n"
+            f"Your original reasoning: {e.get('reasoning', '(empty)')}\n"
+            f"Features you extracted: {json.dumps(e.get('features', {}))}\n\n"
+            f"Full PR content:\n{pr_content}"
+        )
+    header = (
+        "You made prediction errors on the following PRs. For EACH error, explain:\n"
+        "1. What did you miss or weigh incorrectly?\n"
+        "2. What signal in the PR content should have changed your prediction?\n"
+        "3. What pattern or heuristic led you astray?\n\n"
+        "Be specific and self-critical. Reference concrete details from the PR.\n\n"
+    )
+    footer = "\n\nOutput JSON:\n" '{"reflections": [{"pr_number": 123, "reflection": "I missed X because Y..."}]}'
+    if context_tokens > 0:
+        costs = [estimate_tokens(b) + 2 for b in blocks]
+        groups = pack_by_tokens(costs, context_tokens - estimate_tokens(header + footer), max_size=batch_size)
+    else:
+        groups = [list(range(i, min(i + batch_size, len(blocks)))) for i in range(0, len(blocks), batch_size)]
+    return [header + "\n---\n".join(blocks[i] for i in g) + footer for g in groups]
+
+
+def prediction_p_merge(pred: Mapping[str, Any]) -> float:
+    """P(merge) implied by one LLM prediction; NaN when it has no usable confidence."""
+    try:
+        conf = float(pred.get("confidence"))
+    except (TypeError, ValueError):
+        return float("nan")
+    return conf if str(pred.get("prediction", "")).lower().strip() == "merged" else 1.0 - conf
+
+
+def load_llm_scores(dirs: Sequence[Path]) -> Dict[int, float]:
+    """Mean LLM P(merge) per PR over every round_*_results.json in ``dirs``."""
+    sums: Dict[int, float] = {}
+    counts: Dict[int, int] = {}
+    for d in dirs:
+        for path in sorted(Path(d).glob("round_*_results.json")):
+            for pred in json.load(path.open()).get("predictions", []):
+                if not isinstance(pred, dict) or pred.get("pr_number") is None:
+                    continue
+                p = prediction_p_merge(pred)
+                if p != p:
+                    continue
+                n = int(pred["pr_number"])
+                sums[n] = sums.get(n, 0.0) + p
+                counts[n] = counts.get(n, 0) + 1
+    return {n: sums[n] / counts[n] for n in sums}
+
+
+SELECTION_WEIGHTS = {"uncertainty": 1.0, "disagreement": 1.0, "coverage": 0.5}
+
+
+class ActiveSelector:
+    """Round samples drawn where the current models learn the most.
+
+    Each PR's priority is a weighted sum of three terms, computed for the
+    whole population in one vectorised pass over cached scores:
+
+    - uncertainty: ``1 - |2p - 1|`` of the logit P(merge), so bot closes
+      and maintainer-label merges the router already gets right score ~0;
+    - disagreement: ``|p_logit - p_llm|`` where an earlier LLM run scored
+      the PR (see :func:`load_llm_scores`);
+    - coverage: ``1 / (1 + r_s / r)`` for the PR's stratum, with ``r_s``
+      its sampling rate so far and ``r`` the overall rate, so strata the
+      previous rounds skipped are pulled forward.
+
+    The selection is prior-only: both scores are fixed before the run, and
+    only the coverage term moves as rounds are drawn. A run's own
+    predictions are not fed back, since they only cover PRs already drawn,
+    which are never drawn again.
+
+    An ``explore`` share of each round is still drawn uniformly so error
+    rates measured on the sample do not only describe the hard cases.
+    Whole duplicate clusters, batching and the record shape come from the
+    wrapped :class:`StratifiedSampler`. Calling the selector with a round
+    number yields that round's sample and marks its PRs used, so it can be
+    passed to :class:`ExperimentRunner` as ``sample_fn``.
+    """
+
+    def __init__(
+        self,
+        sampler: StratifiedSampler,
+        logit_p: Mapping[int, float],
+        llm_p: Optional[Mapping[int, float]] = None,
+        prs_per_round: int = 100,
+        pool: Optional[Sequence[int]] = None,
+        batch_size: int = 10,
+        clusters_per_round: int = 0,
+        weights: Optional[Mapping[str, float]] = None,
+        explore: float = 0.2,
+    ) -> None:
+        unknown = set(weights or {}) - set(SELECTION_WEIGHTS)
+        if unknown:
+            raise ValueError(f"unknown selection weights: {sorted(unknown)}")
+        self.sampler = sampler
+        self.weights = {**SELECTION_WEIGHTS, **(weights or {})}
+        self.prs_per_round = prs_per_round
+        self.batch_size = batch_size
+        self.clusters_per_round = clusters_per_round
+        self.explore = explore
+        self.pool = sampler.pool_mask(pool)
+        self.used = np.zeros(len(sampler.prs), dtype=bool)
+        self.logit_p = self._column(logit_p)
+        self.llm_p = self._column(llm_p or {})
+        self.stratum_size = np.bincount(sampler.stratum, minlength=len(sampler.strata_names))
+
+    def _column(self, scores: Mapping[int, float]) -> np.ndarray:
+        return np.array([scores.get(int(n), np.nan) for n in self.sampler.numbers], dtype=float)
+
+    def observe_sample(self, sample: Mapping[str, Any]) -> None:
+        """Mark a sample generated elsewhere (e.g. on resume) as used."""
+        idx = [self.sampler.index[int(n)] for n in sample.get("sampled_pr_numbers", []) if int(n) in self.sampler.index]
+        self.used[idx] = True
+
+    def priority(self) -> Dict[str, np.ndarray]:
+        p = np.where(np.isnan(self.logit_p), 0.5, self.logit_p)
+        uncertainty = 1.0 - np.abs(2.0 * p - 1.0)
+        disagreement = np.nan_to_num(np.abs(self.logit_p - self.llm_p), nan=0.0)
+        sampled = np.bincount(self.sampler.stratum[self.used], minlength=len(self.stratum_size))
+        rate = sampled / np.maximum(self.stratum_size, 1)
+        overall = sampled.sum() / max(int(self.stratum_size.sum()), 1)
+        coverage = (1.0 / (1.0 + rate / overall) if overall > 0 else np.ones_like(rate))[self.sampler.stratum]
+        terms = {"uncertainty": uncertainty, "disagreement": disagreement, "coverage": coverage}
+        terms["score"] = sum(self.weights[k] * terms[k] for k in SELECTION_WEIGHTS)
+        return terms
+
+    def sample_round(self, round_num: int) -> dict:
+        sampler = self.sampler
+        rng = sampler.rng(round_num)
+        pool = np.ones(len(sampler.prs), dtype=bool) if self.pool is None else self.pool
+        n = self.prs_per_round
+        clusters = sampler.pick_clusters(rng, self.used, pool, self.clusters_per_round, n)
+        taken = np.zeros(len(sampler.prs), dtype=bool)
+        for members in clusters:
+            taken[members] = True
+
+        available = pool & ~self.used & ~taken
+        if self.clusters_per_round > 0:
+            available &= sampler.cluster_of < 0
+        idx = np.flatnonzero(available)
+        need = min(n - int(taken.sum()), len(idx))
+        terms = self.priority()
+        n_explore = int(round(self.explore * need))
+        # random jitter only breaks ties between equal scores
+        score = terms["score"][idx] + rng.random(len(idx)) * 1e-9
+        top = idx[np.argpartition(-score, need - n_explore - 1)[: need - n_explore]] if need > n_explore else idx[:0]
+        rest = np.setdiff1d(idx, top, assume_unique=True)
+        filler = np.concatenate([top, rng.choice(rest, size=min(n_explore, len(rest)), replace=False)])
+
+        sample = sampler.assemble(rng, round_num, n, clusters, filler, self.used, self.batch_size)
+        sample["stats"]["selection"] = {
+            "strategy": "active",
+            "explore": int(n_explore),
+            "weights": dict(self.weights),
+            **{k: round(float(terms[k][filler].mean()), 6) if len(filler) else 0.0 for k in SELECTION_WEIGHTS},
+        }
+        return sample
+
+    def __call__(self, round_num: int) -> dict:
+        return self.sample_round(round_num)
+
+
+@dataclass
+class ArmResult:
+    name: str
+    out_dir: Path
+    rounds: Dict[int, Dict[str, Any]]
+    seconds: float
+    error: Optional[str] = None
+
+
+class ExperimentRunner:
+    """Run several arms side by side over one corpus, one LLM budget and one cache.
+
+    Arms run on their own threads, and each arm sends its batches of a round
+    concurrently, so the shared :class:`LLMClient` (rate limiter + response
+    cache) is the only throttle. Every arm sees the same per-round samples,
+    written once to ``out_dir/samples``. Scoring and the per-arm learning
+    scripts run as subprocesses in the arm's own directory.
+
+    By default each sample batch is one prompt. With ``context_tokens`` set,
+    whole sample batches (so duplicate clusters stay together) are
+    bin-packed into prompts of up to that many estimated tokens, with at
+    most ``max_prs_per_prompt`` PRs so the reply fits its token limit.
+    """
+
+    def __init__(
+        self,
+        arms: Sequence[ArmConfig],
+        corpus: Corpus,
+        client: LLMClient,
+        out_dir: Path,
+        sample_fn: Callable[[int], dict],
+        rounds: int = 10,
+        start_round: int = 1,
+        seed: int = 42,
+        max_batches: int = 0,
+        dry_run: bool = False,
+        run_script: Callable[[str, List[str]], None] = run_py,
+        metrics_db: Optional[Path] = None,
+        context_tokens: int = 0,
+        max_prs_per_prompt: int = 20,
+    ) -> None:
+        names = [a.name for a in arms]
+        if len(set(names)) != len(names):
+            raise ValueError(f"arm names must be unique: {names}")
+        self.arms = list(arms)
+        self.corpus = corpus
+        self.client = client
+        self.out_dir = out_dir
+        self.sample_fn = sample_fn
+        self.rounds = rounds
+        self.start_round = start_round
+        self.seed = seed
+        self.max_batches = max_batches
+        self.dry_run = dry_run
+        self.run_script = run_script
+        self.metrics_db = metrics_db
+        self.context_tokens = context_tokens
+        self.max_prs_per_prompt = max_prs_per_prompt
+        self.logf = out_dir / "execution_log.txt"
+
+    def arm_dir(self, arm: ArmConfig) -> Path:
+        return self.out_dir / arm.name
+
+    def samples(self) -> Dict[int, dict]:
+        sample_dir = self.out_dir / "samples"
+        sample_dir.mkdir(parents=True, exist_ok=True)
+        out = {}
+        for r in range(self.start_round, self.rounds + 1):
+            path = sample_dir / f"round_{r}_sample.json"
+            if not path.exists():
+                json.dump(self.sample_fn(r), path.open("w"), indent=2)
+            elif isinstance(self.sample_fn, ActiveSelector):
+                self.sample_fn.observe_sample(json.load(path.open()))
+            out[r] = json.load(path.open())
+        return out
+
+    def _indexed_errors(self, arm: ArmConfig) -> Optional[Callable[[int], List[Dict[str, Any]]]]:
+        """Round errors from the error index, when the runner writes one."""
+        if self.metrics_db is None:
+            return None
+
+        def lookup(round_num: int) -> List[Dict[str, Any]]:
+            with ErrorIndex(self.metrics_db) as index:
+                return index.round_errors(self.out_dir.name, arm.name, round_num)
+
+        return lookup
+
+    def _dry(self) -> List[str]:
+        return ["--dry-run"] if self.dry_run else []
+
+    def _predict(self, arm: ArmConfig, ctx_for: Callable[[List[dict]], PromptContext], sample: dict) -> tuple:
+        batch_ids = sorted(sample["batch_assignments"], key=int)
+        if self.max_batches:
+            batch_ids = batch_ids[: self.max_batches]
+        batches = [self.corpus.batch(sample["batch_assignments"][b]) for b in batch_ids]
+        if self.context_tokens > 0 and arm.format_pr is not None:
+            base = estimate_tokens(arm.prompt_builder(ctx_for([])))
+            costs = [sum(estimate_tokens(arm.format_pr(pr)) for pr in b) for b in batches]
+            bins = pack_by_tokens(costs, self.context_tokens - base, [len(b) for b in batches], self.max_prs_per_prompt)
+            batches = [[pr for i in group for pr in batches[i]] for group in bins]
+        contexts = [ctx_for(b) for b in batches]
+
+        def one(ctx: PromptContext) -> dict:
+            out = self.client.complete_json(arm.prompt_builder(ctx), default=EMPTY_OUTPUT)
+            return out if isinstance(out, dict) else EMPTY_OUTPUT
+
+        with ThreadPoolExecutor(max_workers=max(1, arm.batch_workers)) as pool:
+            outputs = list(pool.map(one, contexts))
+
+        predictions: List[dict] = []
+        dedupes: List[dict] = []
+        for ctx, out in zip(contexts, outputs):
+            preds = out.get("predictions", []) or []
+            if arm.discovery is not None and ctx.feature_schema is not None:
+                preds = arm.discovery.enforce(preds, ctx.feature_schema)
+            predictions.extend(preds)
+            dedupes.extend(out.get("duplicates", []) or [])
+        return predictions, dedupes
+
+    def _reflect(self, arm: ArmConfig, errors: List[Dict[str, Any]]) -> None:
+        reflections: Dict[int, str] = {}
+        for prompt in reflection_prompts(errors, self.corpus.prs, arm.format_pr, context_tokens=self.context_tokens):
+            out = self.client.complete_json(prompt, default={"reflections": []})
+            for ref in (out or {}).get("reflections", []):
+                if isinstance(ref, dict) and "pr_number" in ref:
+                    reflections[int(ref["pr_number"])] = ref.get("reflection", "")
+        for e in errors:
+            e["reflection"] = reflections.get(int(e["pr_number"]), "")
+
+    def run_round(self, arm: ArmConfig, r: int, sample: dict) -> Dict[str, Any]:
+        out = self.arm_dir(arm)
+        sample_path = out / f"round_{r}_sample.json"
+        json.dump(sample, sample_path.open("w"), indent=2)
+
+        patterns = load_patterns(out / "patterns_state.json", arm.pattern_policy) if r >= arm.pattern_start_round else []
+        prior: List[Dict[str, Any]] = []
+        if arm.prior_errors == "last_round" and r >= arm.prior_start_round:
+            prior = _load_errors(out / f"round_{r - 1}_errors.json")
+        elif arm.prior_errors == "window" and r >= arm.prior_start_round:
+            prior = load_prior_errors_window(
+                out, r, arm.prior_window, arm.prior_per_round, self.seed, errors_for=self._indexed_errors(arm)
+            )
+        discovered: List[Dict[str, Any]] = []
+        schema = None
+        if arm.discovery is not None:
+            discovered, schema = arm.discovery.load(out / "feature_registry.json", arm.discovery.active_cap)
+            json.dump(schema, (out / "feature_schema.json").open("w"), indent=2)
+
+        def ctx_for(batch: List[dict]) -> PromptContext:
+            return PromptContext(r, batch, self.corpus.feature_spec, patterns, prior, discovered, schema)
+
+        predictions, dedupes = self._predict(arm, ctx_for, sample)
+        rr_path = out / f"round_{r}_results.json"
+        json.dump({"round": r, "predictions": predictions, "duplicates": dedupes}, rr_path.open("w"), indent=2)
+
+        score_path = out / f"round_{r}_scores.json"
+        self.run_script(
+            "score_round.py",
+            [
+                "--results", str(rr_path),
+                "--sample", str(sample_path),
+                "--all-prs", str(self.corpus.prs_path),
+                "--split", str(self.corpus.split_path),
+                "--output", str(score_path),
+                "--experiment", self.out_dir.name,
+                "--arm", arm.name,
+            ]
+            # without a runner DB the scorer must not fall back to the repo's data/metrics.sqlite
+            + (["--metrics-db", str(self.metrics_db)] if self.metrics_db is not None else ["--no-metrics-db"]),
+        )
+        scores = json.load(score_path.open())
+
+        errors = [e for e in scores.get("errors", []) if isinstance(e, dict)]
+        if arm.reflection and errors and arm.format_pr is not None:
+            self._reflect(arm, errors)
+            if self.metrics_db is not None:
+                with ErrorIndex(self.metrics_db) as index:
+                    index.record_reflections(self.out_dir.name, arm.name, r, errors)
+        errors_path = out / f"round_{r}_errors.json"
+        json.dump({"errors": errors}, errors_path.open("w"), indent=2)
+
+        if arm.pattern_script:
+            state = out / "patterns_state.json"
+            self.run_script(
+                arm.pattern_script,
+                [
+                    "--errors", str(errors_path),
+                    "--all-prs", str(self.corpus.prs_path),
+                    "--patterns-state", str(state),
+                    "--round", str(r),
+                    "--output", str(state),
+                ]
+                + self._dry(),
+            )
+            if self.metrics_db is not None and state.exists():
+                with ErrorIndex(self.metrics_db) as index:
+                    index.record_attributions(self.out_dir.name, arm.name, json.load(state.open()).get("patterns", []))
+        if arm.discovery is not None:
+            registry = out / "feature_registry.json"
+            self.run_script(
+                arm.discovery.script,
+                [
+                    "--errors", str(errors_path),
+                    "--all-prs", str(self.corpus.prs_path),
+                    "--registry", str(registry),
+                    "--round", str(r),
+                    "--max-new", str(arm.discovery.max_new),
+                    "--output", str(registry),
+                ]
+                + self._dry(),
+            )
+        log_line(
+            self.logf,
+            f"{arm.name} round {r} complete predictions={len(predictions)} patterns={len(patterns)} "
+            f"prior_errors={len(prior)} discovered={len(discovered)}",
+        )
+        return scores
+
+    def run_arm(self, arm: ArmConfig, samples: Mapping[int, dict]) -> ArmResult:
+        out = self.arm_dir(arm)
+        out.mkdir(parents=True, exist_ok=True)
+        started = time.monotonic()
+        rounds: Dict[int, Dict[str, Any]] = {}
+        try:
+            for r in range(self.start_round, self.rounds + 1):
+                rounds[r] = self.run_round(arm, r, samples[r])
+            if arm.posthoc_patterns:
+                self.run_script(
+                    "extract_patterns_posthoc_v4a.py",
+                    [
+                        "--bootstrap-dir", str(out),
+                        "--all-prs", str(self.corpus.prs_path),
+                        "--start-round", "1",
+                        "--end-round", str(self.rounds),
+                        "--output", str(out / "patterns_state_posthoc.json"),
+                    ]
+                    + self._dry(),
+                )
+            self.run_script(
+                "consolidate_v2.py",
+                [
+                    "--bootstrap-dir", str(out),
+                    "--all-prs", str(self.corpus.prs_path),
+                    "--output", str(out / "consolidated.json"),
+                    "--errors-output", str(out / "errors_persistent.json"),
+                    "--dedupe-output", str(out / "dedupe_consolidated.json"),
+                    "--calibration-output", str(out / "calibration.json"),
+                    "--split", str(self.corpus.split_path),
+                ],
+            )
+        except Exception as e:  # one failing arm must not sink the others
+            log_line(self.logf, f"{arm.name} failed: {e!r}")
+            return ArmResult(arm.name, out, rounds, time.monotonic() - started, error=repr(e))
+        return ArmResult(arm.name, out, rounds, time.monotonic() - started)
+
+    def run(self) -> Dict[str, Any]:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        samples = self.samples()
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=len(self.arms)) as pool:
+            results = list(pool.map(lambda arm: self.run_arm(arm, samples), self.arms))
+        comparison = compare_arms(results)
+        comparison["wall_seconds"] = round(time.monotonic() - started, 3)
+        comparison["llm"] = dict(self.client.stats)
+        json.dump(comparison, (self.out_dir / "comparison.json").open("w"), indent=2)
+        log_line(self.logf, f"experiment complete arms={len(results)} wall={comparison['wall_seconds']}s")
+        return comparison
+
+
+def _round_metrics(scores: Mapping[str, Any]) -> Dict[str, float]:
+    merge = scores.get("merge", {})
+    dedupe = scores.get("dedupe", {})
+    return {
+        "accuracy": float(merge.get("accuracy", 0.0)),
+        "f1": float(merge.get("f1", 0.0)),
+        "dedupe_f1": float(dedupe.get("f1", 0.0)),
+    }
+
+
+def _mean(values: Sequence[float]) -> Optional[float]:
+    return round(sum(values) / len(values), 6) if values else None
+
+
+def compare_arms(results: Sequence[ArmResult], baseline_rounds: int = BASELINE_ROUNDS) -> Dict[str, Any]:
+    """Side-by-side per-round metrics and the R(baseline+1..) gain over R1..baseline."""
+    arms: Dict[str, Any] = {}
+    for res in results:
+        per_round = {r: _round_metrics(s) for r, s in sorted(res.rounds.items())}
+        summary: Dict[str, Any] = {}
+        for metric in ("accuracy", "f1", "dedupe_f1"):
+            base = _mean([m[metric] for r, m in per_round.items() if r <= baseline_rounds])
+            late = _mean([m[metric] for r, m in per_round.items() if r > baseline_rounds])
+            summary[metric] = {
+                "baseline": base,
+                "learned": late,
+                "delta": round(late - base, 6) if base is not None and late is not None else None,
+            }
+        arms[res.name] = {
+            "rounds": {str(r): m for r, m in per_round.items()},
+            "summary": summary,
+            "seconds": round(res.seconds, 3),
+            "error": res.error,
+        }
+    return {"baseline_rounds": baseline_rounds, "arms": arms}
+
+
+def format_comparison(comparison: Mapping[str, Any]) -> str:
+    """Markdown table: one row per arm, accuracy/F1 before and after learning kicks in."""
+    lines = [
+        "| arm | acc R1-3 | acc R4+ | Δacc | F1 R1-3 | F1 R4+ | ΔF1 | dedupe F1 R4+ | seconds |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+
+    def fmt(v: Optional[float]) -> str:
+        return "—" if v is None else f"{v:.3f}"
+
+    for name, arm in comparison.get("arms", {}).items():
+        s = arm["summary"]
+        lines.append(
+            f"| {name}{' (failed)' if arm.get('error') else ''} | {fmt(s['accuracy']['baseline'])} | "
+            f"{fmt(s['accuracy']['learned'])} | {fmt(s['accuracy']['delta'])} | {fmt(s['f1']['baseline'])} | "
+            f"{fmt(s['f1']['learned'])} | {fmt(s['f1']['delta'])} | {fmt(s['dedupe_f1']['learned'])} | "
+            f"{arm['seconds']:.1f} |"
+        )
+    return "\n".join(lines)
@@ -1 +1,149 @@
 """Re-estimate merge probability model with newly observed labels."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional
+
+import numpy as np
+
+from src.analysis.deduplicator import to_epoch
+from src.analysis.logit_estimator import FeatureVectorizer, LogitFit, sigmoid
+
+
+class OnlineLogit:
+    """Logit coefficients updated one maintainer decision at a time.
+
+    Each update is an online Newton (Laplace / extended Kalman) step: the
+    posterior covariance gets a rank-one Sherman-Morrison update and the
+    coefficients move along it, so an update costs O(d²) no matter how many
+    decisions came before. Exponential forgetting inflates the covariance
+    before each step, letting recent decisions outweigh old ones; with
+    ``half_life_days`` the discount follows wall-clock time between events,
+    otherwise every event is discounted by ``forgetting``.
+    """
+
+    def __init__(
+        self,
+        feature_names: List[str],
+        params: Optional[np.ndarray] = None,
+        cov: Optional[np.ndarray] = None,
+        l2: float = 1.0,
+        forgetting: float = 1.0,
+        half_life_days: Optional[float] = None,
+    ) -> None:
+        d = len(feature_names) + 1
+        self.feature_names = list(feature_names)
+        self.vectorizer = FeatureVectorizer()
+        self.vectorizer.vocabulary = {n: i for i, n in enumerate(self.feature_names)}
+        self.params = np.zeros(d) if params is None else np.asarray(params, dtype=float).copy()
+        if cov is None:
+            cov = np.eye(d) / max(l2, 1e-12)
+            cov[0, 0] = 1e4  # near-flat prior on the intercept
+        self.cov = np.asarray(cov, dtype=float).copy()
+        self.forgetting = float(forgetting)
+        self.half_life_days = half_life_days
+        self.n_updates = 0
+        self.last_ts: Optional[float] = None
+
+    @classmethod
+    def from_fit(cls, fit: LogitFit, **kwargs) -> "OnlineLogit":
+        """Start from a batch fit (coefficients and Hessian-based covariance)."""
+        cov = fit.cov if fit.cov.ndim == 2 else np.diag(fit.cov)
+        return cls(fit.feature_names, params=fit.params, cov=cov, l2=fit.l2, **kwargs)
+
+    @property
+    def coef(self) -> np.ndarray:
+        return self.params[1:]
+
+    @property
+    def intercept(self) -> float:
+        return float(self.params[0])
+
+    def _discount(self, ts: Optional[float]) -> float:
+        if self.half_life_days is None or ts is None:
+            return self.forgetting
+        if self.last_ts is None or ts <= self.last_ts:
+            return 1.0
+        return 0.5 ** ((ts - self.last_ts) / (self.half_life_days * 86400.0))
+
+    def _row(self, features: Mapping[str, object]) -> np.ndarray:
+        return np.concatenate([[1.0], self.vectorizer.transform([features])[0]])
+
+    def update_vector(self, x: np.ndarray, merged: bool, weight: float = 1.0, ts: Optional[float] = None) -> float:
+        """Fold in one decision given its feature vector (without intercept).
+
+        Returns the pre-update P(merge), i.e. the prequential prediction.
+        """
+        xa = np.concatenate([[1.0], np.asarray(x, dtype=float)])
+        lam = self._discount(ts)
+        S = self.cov / lam if lam < 1.0 else self.cov
+
+        p = float(sigmoid(np.array([xa @ self.params]))[0])
+        h = weight * p * (1.0 - p)
+        Sx = S @ xa
+        S = S - np.outer(Sx, Sx) * (h / (1.0 + h * float(xa @ Sx)))
+        self.params = self.params + S @ xa * (weight * ((1.0 if merged else 0.0) - p))
+        self.cov = 0.5 * (S + S.T)
+
+        self.n_updates += 1
+        if ts is not None:
+            self.last_ts = ts if self.last_ts is None else max(self.last_ts, ts)
+        return p
+
+    def update(self, features: Mapping[str, object], merged: bool, weight: float = 1.0, decided_at: Optional[str] = None) -> float:
+        """Fold in one decision given its feature dict; unknown features are ignored."""
+        ts = to_epoch(decided_at) if decided_at else None
+        return self.update_vector(self._row(features)[1:], merged, weight=weight, ts=ts)
+
+    def predict_proba(self, features: Mapping[str, object]) -> float:
+        return float(sigmoid(np.array([self._row(features) @ self.params]))[0])
+
+    def as_fit(self) -> LogitFit:
+        return LogitFit(
+            coef=self.coef.copy(),
+            intercept=self.intercept,
+            cov=self.cov.copy(),
+            feature_names=list(self.feature_names),
+            l2=0.0,
+            n_iter=self.n_updates,
+            converged=True,
+            log_likelihood=0.0,
+            null_log_likelihood=0.0,
+            meta={"online_updates": self.n_updates},
+        )
+
+    # -- persistence ------------------------------------------------------
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "feature_names": self.feature_names,
+            "params": self.params.tolist(),
+            "cov": self.cov.tolist(),
+            "forgetting": self.forgetting,
+            "half_life_days": self.half_life_days,
+            "n_updates": self.n_updates,
+            "last_ts": self.last_ts,
+        }
+
+    @classmethod
+    def from_dict(cls, payload: Mapping[str, object]) -> "OnlineLogit":
+        model = cls(
+            list(payload["feature_names"]),
+            params=np.asarray(payload["params"]),
+            cov=np.asarray(payload["cov"]),
+            forgetting=float(payload.get("forgetting", 1.0)),
+            half_life_days=payload.get("half_life_days"),
+        )
+        model.n_updates = int(payload.get("n_updates", 0))
+        model.last_ts = payload.get("last_ts")
+        return model
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        json.dump(self.to_dict(), path.open("w"), indent=2)
+
+    @classmethod
+    def load(cls, path: Path) -> "OnlineLogit":
+        return cls.from_dict(json.load(path.open()))
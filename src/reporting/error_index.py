@@ -0,0 +1,252 @@
+"""Cross-experiment index of per-PR prediction errors."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from src.reporting.metrics_store import connect
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    arm TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS outcomes (
+    id INTEGER PRIMARY KEY,
+    batch INTEGER NOT NULL,
+    experiment TEXT NOT NULL,
+    arm TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    pr_number INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    error_type TEXT,
+    prediction TEXT,
+    confidence REAL,
+    reflection_hash TEXT
+);
+CREATE INDEX IF NOT EXISTS outcomes_pr ON outcomes (pr_number);
+CREATE INDEX IF NOT EXISTS outcomes_round ON outcomes (experiment, arm, round, batch);
+CREATE TABLE IF NOT EXISTS outcome_features (
+    outcome_id INTEGER NOT NULL,
+    feature TEXT NOT NULL,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outcome_features_key ON outcome_features (feature, value);
+CREATE TABLE IF NOT EXISTS reflections (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    arm TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    pr_number INTEGER NOT NULL,
+    reflection_hash TEXT NOT NULL,
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS texts (
+    hash TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attributions (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    arm TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    pr_number INTEGER NOT NULL,
+    error_type TEXT,
+    pattern_id TEXT NOT NULL,
+    recorded_at TEXT NOT NULL,
+    UNIQUE (experiment, arm, round, pr_number, error_type, pattern_id)
+);
+-- a rescored round is a new batch; only the newest batch per round counts
+CREATE VIEW IF NOT EXISTS current_outcomes AS
+    SELECT o.* FROM outcomes o
+    JOIN (SELECT experiment, arm, round, max(batch) AS batch FROM outcomes GROUP BY experiment, arm, round)
+    USING (experiment, arm, round, batch);
+-- post-hoc reflections override the scorer's reasoning text
+CREATE VIEW IF NOT EXISTS current_errors AS
+    SELECT o.*, coalesce(
+        (SELECT r.reflection_hash FROM reflections r
+         WHERE r.experiment = o.experiment AND r.arm = o.arm AND r.round = o.round AND r.pr_number = o.pr_number
+         ORDER BY r.id DESC LIMIT 1),
+        o.reflection_hash) AS text_hash
+    FROM current_outcomes o WHERE o.correct = 0;
+"""
+
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class ErrorIndex:
+    """PR -> every (experiment, arm, round, error_type, reflection) it was scored in.
+
+    The scorer records one outcome row per sampled PR, with the LLM's
+    extracted features, so error rates can be sliced by feature value.
+    Reflections and pattern attributions arrive later in a round and
+    are appended as their own events. Everything is append-only. A
+    rescored round becomes a new batch, and queries read the newest batch.
+    Reflection and reasoning texts are stored once, keyed by hash.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.conn = connect(path, SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "ErrorIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _text(self, text: str) -> Optional[str]:
+        if not text:
+            return None
+        h = text_hash(text)
+        self.conn.execute("INSERT OR IGNORE INTO texts (hash, text) VALUES (?, ?)", (h, text))
+        return h
+
+    def record_outcomes(
+        self, experiment: str, arm: str, round_num: int, outcomes: Iterable[Mapping[str, Any]], source: str = "scorer"
+    ) -> int:
+        """Replace a round's outcomes with a new batch; returns the batch id.
+
+        Each outcome has ``pr_number`` and ``correct``, plus optional
+        ``error_type``, ``prediction``, ``confidence``, ``features`` and
+        ``reflection``/``reasoning``.
+        """
+        with self.conn:
+            batch = self.conn.execute(
+                "INSERT INTO batches (experiment, arm, round, source, recorded_at) VALUES (?, ?, ?, ?, ?)",
+                (experiment, arm, round_num, source, _now()),
+            ).lastrowid
+            for o in outcomes:
+                text = str(o.get("reflection") or o.get("reasoning") or "").strip()
+                cur = self.conn.execute(
+                    "INSERT INTO outcomes (batch, experiment, arm, round, pr_number, correct, error_type, prediction, "
+                    "confidence, reflection_hash) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        batch, experiment, arm, round_num, int(o["pr_number"]), int(bool(o["correct"])),
+                        o.get("error_type"), o.get("prediction"), o.get("confidence"),
+                        self._text(text) if not o["correct"] else None,
+                    ),
+                )
+                features = o.get("features") or {}
+                self.conn.executemany(
+                    "INSERT INTO outcome_features (outcome_id, feature, value) VALUES (?, ?, ?)",
+                    [(cur.lastrowid, str(k), json.dumps(v)) for k, v in features.items()],
+                )
+        return int(batch)
+
+    def record_reflections(self, experiment: str, arm: str, round_num: int, errors: Iterable[Mapping[str, Any]]) -> None:
+        with self.conn:
+            for e in errors:
+                h = self._text(str(e.get("reflection") or "").strip())
+                if h is not None:
+                    self.conn.execute(
+                        "INSERT INTO reflections (experiment, arm, round, pr_number, reflection_hash, recorded_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (experiment, arm, round_num, int(e["pr_number"]), h, _now()),
+                    )
+
+    def record_attributions(self, experiment: str, arm: str, patterns: Sequence[Mapping[str, Any]]) -> int:
+        """Ingest the ``attributions`` events of a patterns_state; re-ingesting is a no-op."""
+        rows = [
+            (experiment, arm, int(a["round"]), int(a["pr_number"]), a.get("error_type"), str(p["id"]), _now())
+            for p in patterns
+            for a in p.get("attributions", []) or []
+            if isinstance(a, dict) and not a.get("ambiguous") and a.get("round") is not None and a.get("pr_number") is not None
+        ]
+        with self.conn:
+            before = self.conn.total_changes
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO attributions (experiment, arm, round, pr_number, error_type, pattern_id, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            return self.conn.total_changes - before
+
+    def round_errors(self, experiment: str, arm: str, round_num: int) -> List[Dict[str, Any]]:
+        """A round's errors in round_N_errors.json shape (without features)."""
+        rows = self.conn.execute(
+            "SELECT e.pr_number, e.error_type, t.text FROM current_errors e LEFT JOIN texts t ON t.hash = e.text_hash "
+            "WHERE e.experiment = ? AND e.arm = ? AND e.round = ? ORDER BY e.id",
+            (experiment, arm, round_num),
+        )
+        return [{"pr_number": n, "error_type": et, "reflection": text or ""} for n, et, text in rows]
+
+    def pr_history(self, pr_number: int) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT experiment, arm, round, error_type, text_hash FROM current_errors WHERE pr_number = ? "
+            "ORDER BY experiment, arm, round",
+            (int(pr_number),),
+        )
+        keys = ("experiment", "arm", "round", "error_type", "reflection_hash")
+        return [dict(zip(keys, r)) for r in rows]
+
+    def persistent(self, min_errors: int = 3, min_arms: int = 1, max_accuracy: float = 1.0) -> List[Dict[str, Any]]:
+        """PRs wrong in at least ``min_errors`` rounds across at least ``min_arms`` experiment/arms.
+
+        ``max_accuracy=0`` keeps only PRs no arm ever got right.
+        """
+        rows = self.conn.execute(
+            """
+            SELECT pr_number,
+                   sum(correct = 0) AS errors,
+                   count(*) AS scored,
+                   count(DISTINCT CASE WHEN correct = 0 THEN experiment || '/' || arm END) AS arms,
+                   group_concat(DISTINCT CASE WHEN correct = 0 THEN error_type END) AS error_types
+            FROM current_outcomes GROUP BY pr_number
+            HAVING errors >= ? AND arms >= ? AND 1.0 - 1.0 * errors / scored <= ?
+            ORDER BY errors DESC, arms DESC, pr_number
+            """,
+            (min_errors, min_arms, max_accuracy),
+        )
+        keys = ("pr_number", "errors", "scored", "arms", "error_types")
+        return [dict(zip(keys, r)) for r in rows]
+
+    def by_feature(self, feature: str, experiment: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Error rate per value of one LLM-extracted feature."""
+        sql = (
+            "SELECT f.value, count(*) AS scored, sum(o.correct = 0) AS errors, sum(o.error_type IS 'fp'), "
+            "sum(o.error_type IS 'fn'), count(DISTINCT o.pr_number) "
+            "FROM current_outcomes o JOIN outcome_features f ON f.outcome_id = o.id WHERE f.feature = ?"
+        )
+        params: List[Any] = [feature]
+        if experiment is not None:
+            sql += " AND o.experiment = ?"
+            params.append(experiment)
+        sql += " GROUP BY f.value ORDER BY errors DESC"
+        return [
+            {"value": json.loads(v), "scored": n, "errors": e, "fp": fp, "fn": fn, "prs": prs, "error_rate": round(e / n, 6)}
+            for v, n, e, fp, fn, prs in self.conn.execute(sql, params)
+        ]
+
+    def by_pattern(self, pattern_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Errors attributed to each learned pattern, across experiments."""
+        sql = (
+            "SELECT pattern_id, count(*), count(DISTINCT pr_number), count(DISTINCT experiment || '/' || arm), "
+            "group_concat(DISTINCT pr_number) FROM attributions"
+        )
+        params: List[Any] = []
+        if pattern_id is not None:
+            sql += " WHERE pattern_id = ?"
+            params.append(pattern_id)
+        sql += " GROUP BY pattern_id ORDER BY count(*) DESC"
+        return [
+            {"pattern_id": p, "errors": n, "prs": prs, "arms": arms, "pr_numbers": sorted(int(x) for x in nums.split(","))}
+            for p, n, prs, arms, nums in self.conn.execute(sql, params)
+        ]
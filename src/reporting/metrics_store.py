@@ -0,0 +1,262 @@
+"""Append-only store of round metrics with learning-curve analytics."""
+
+from __future__ import annotations
+
+import math
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from src.bootstrap.consolidation import BASELINE_ROUNDS, RunningStats, welch_t
+
+ALL = "all"
+DRIFT_METRICS = ("merge.fn", "merge.fp")
+ROLLING_WINDOW = 3
+SPIKE_RATIO = 3.0  # value >= ratio x prior-window mean ...
+SPIKE_MIN_DELTA = 5.0  # ... and at least this many more errors
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    arm TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    value REAL,
+    recorded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metrics_key ON metrics (experiment, arm, metric, segment, round);
+CREATE TABLE IF NOT EXISTS rolling (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    arm TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    segment TEXT NOT NULL,
+    window INTEGER NOT NULL,
+    n INTEGER NOT NULL,
+    mean REAL,
+    std REAL,
+    recorded_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    experiment TEXT NOT NULL,
+    arm TEXT NOT NULL,
+    round INTEGER NOT NULL,
+    metric TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    value REAL,
+    baseline REAL,
+    detail TEXT,
+    recorded_at TEXT NOT NULL
+);
+-- rescoring a round appends; readers see the newest row per key
+CREATE VIEW IF NOT EXISTS latest AS
+    SELECT m.* FROM metrics m
+    JOIN (SELECT max(id) AS id FROM metrics GROUP BY experiment, arm, round, metric, segment) USING (id);
+CREATE VIEW IF NOT EXISTS latest_rolling AS
+    SELECT r.* FROM rolling r
+    JOIN (SELECT max(id) AS id FROM rolling GROUP BY experiment, arm, round, metric, segment, window) USING (id);
+"""
+
+
+def connect(path: Path, schema: str) -> sqlite3.Connection:
+    """Open (creating if needed) a store shared by concurrent scorer processes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(path), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(schema)
+    return conn
+
+
+def _ece(bins: Sequence[Mapping[str, Any]]) -> Optional[float]:
+    total = sum(int(b.get("count", 0)) for b in bins)
+    if not total:
+        return None
+    return sum(int(b["count"]) * abs(float(b["avg_confidence"]) - float(b["accuracy"])) for b in bins) / total
+
+
+def score_metrics(payload: Mapping[str, Any]) -> List[Tuple[str, str, float]]:
+    """``(metric, segment, value)`` rows for one ``score_round`` payload."""
+    rows: List[Tuple[str, str, float]] = []
+    merge = payload.get("merge", {})
+    for k in ("accuracy", "precision", "recall", "f1"):
+        if k in merge:
+            rows.append((f"merge.{k}", ALL, float(merge[k])))
+    for k, v in merge.get("confusion", {}).items():
+        rows.append((f"merge.{k}", ALL, float(v)))
+    dedupe = payload.get("dedupe", {})
+    for k in ("precision", "recall", "f1", "ari"):
+        if k in dedupe:
+            rows.append((f"dedupe.{k}", ALL, float(dedupe[k])))
+    if "bcubed" in dedupe:
+        rows.append(("dedupe.bcubed_f1", ALL, float(dedupe["bcubed"]["f1"])))
+    ece = _ece(payload.get("calibration", []))
+    if ece is not None:
+        rows.append(("merge.ece", ALL, round(ece, 6)))
+    for segment, m in payload.get("segments", {}).items():
+        for k, v in m.items():
+            rows.append((f"merge.{k}", segment, float(v)))
+    return rows
+
+
+class MetricsStore:
+    """Round metrics keyed by (experiment, arm, round, metric, segment).
+
+    Rows are only ever inserted. Each :meth:`record` call also appends the
+    rolling mean/std over the last ``window`` rounds for every ``all``
+    segment metric, and an alert when FN or FP jumps against the prior
+    window (``spike``) or has crept up from the baseline rounds
+    (``drift``). When the other error type fell at the same time the alert
+    is an ``overcorrection``, e.g. FN 1 -> 12 while FP collapses. Several
+    scorer processes may write at once; sqlite serialises them.
+    """
+
+    def __init__(self, path: Path, window: int = ROLLING_WINDOW) -> None:
+        self.path = path
+        self.window = window
+        self.conn = connect(path, SCHEMA)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "MetricsStore":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def record(self, experiment: str, arm: str, round_num: int, rows: Iterable[Tuple[str, str, float]]) -> List[Dict[str, Any]]:
+        """Append one round's metrics plus its rolling windows; returns new drift alerts."""
+        now = datetime.now(timezone.utc).isoformat()
+        rows = list(rows)
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO metrics (experiment, arm, round, metric, segment, value, recorded_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(experiment, arm, round_num, m, s, v, now) for m, s, v in rows],
+            )
+            window = self.conn.execute(
+                "SELECT metric, count(*), avg(value), avg(value * value) FROM latest "
+                "WHERE experiment = ? AND arm = ? AND segment = ? AND round > ? AND round <= ? GROUP BY metric",
+                (experiment, arm, ALL, round_num - self.window, round_num),
+            ).fetchall()
+            self.conn.executemany(
+                "INSERT INTO rolling (experiment, arm, round, metric, segment, window, n, mean, std, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (experiment, arm, round_num, m, ALL, self.window, n, mean, math.sqrt(max(sq - mean * mean, 0.0)), now)
+                    for m, n, mean, sq in window
+                    if mean is not None
+                ],
+            )
+            alerts = self._drift(experiment, arm, round_num)
+            self.conn.executemany(
+                "INSERT INTO alerts (experiment, arm, round, metric, kind, value, baseline, detail, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(experiment, arm, round_num, a["metric"], a["kind"], a["value"], a["baseline"], a["detail"], now) for a in alerts],
+            )
+        return alerts
+
+    def _error_means(self, experiment: str, arm: str, lo: int, hi: int) -> Dict[str, float]:
+        """Mean of each drift metric over rounds ``lo..hi`` inclusive."""
+        marks = ",".join("?" * len(DRIFT_METRICS))
+        rows = self.conn.execute(
+            "SELECT metric, avg(value) FROM latest WHERE experiment = ? AND arm = ? AND segment = ? "
+            f"AND round >= ? AND round <= ? AND metric IN ({marks}) GROUP BY metric",
+            (experiment, arm, ALL, lo, hi, *DRIFT_METRICS),
+        )
+        return {m: float(v) for m, v in rows if v is not None}
+
+    def _drift(self, experiment: str, arm: str, round_num: int) -> List[Dict[str, Any]]:
+        """FN/FP spikes against the prior window, else drift from the baseline rounds."""
+        cur = self._error_means(experiment, arm, round_num, round_num)
+        references = [("spike", f"the prior {self.window} rounds", self._error_means(experiment, arm, round_num - self.window, round_num - 1))]
+        if round_num > BASELINE_ROUNDS:
+            references.append(("drift", f"baseline rounds 1-{BASELINE_ROUNDS}", self._error_means(experiment, arm, 1, BASELINE_ROUNDS)))
+        alerts = []
+        for metric in DRIFT_METRICS:
+            for kind, label, ref in references:
+                if metric not in cur or metric not in ref:
+                    continue
+                value, base = cur[metric], ref[metric]
+                if value < SPIKE_RATIO * max(base, 1.0) or value - base < SPIKE_MIN_DELTA:
+                    continue
+                other = DRIFT_METRICS[1 - DRIFT_METRICS.index(metric)]
+                fell = other in cur and other in ref and cur[other] < ref[other]
+                alerts.append(
+                    {
+                        "metric": metric,
+                        "kind": "overcorrection" if fell else kind,
+                        "value": value,
+                        "baseline": round(base, 6),
+                        "detail": f"{metric} {base:g} -> {value:g} against {label}"
+                        + (f"; {other} {ref[other]:g} -> {cur[other]:g}" if fell else ""),
+                    }
+                )
+                break
+        return alerts
+
+    def curve(self, metric: str, segment: str = ALL, experiments: Optional[Sequence[str]] = None) -> List[Dict[str, Any]]:
+        """Latest value per (experiment, arm, round) for one metric."""
+        sql = "SELECT experiment, arm, round, value FROM latest WHERE metric = ? AND segment = ?"
+        params: List[Any] = [metric, segment]
+        if experiments:
+            sql += f" AND experiment IN ({','.join('?' * len(experiments))})"
+            params.extend(experiments)
+        sql += " ORDER BY experiment, arm, round"
+        return [dict(zip(("experiment", "arm", "round", "value"), r)) for r in self.conn.execute(sql, params)]
+
+    def rolling(self, metric: str, experiment: str, arm: str) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT round, n, mean, std FROM latest_rolling WHERE metric = ? AND experiment = ? AND arm = ? "
+            "AND segment = ? AND window = ? ORDER BY round",
+            (metric, experiment, arm, ALL, self.window),
+        )
+        return [dict(zip(("round", "n", "mean", "std"), r)) for r in rows]
+
+    def alerts(self, experiment: Optional[str] = None) -> List[Dict[str, Any]]:
+        sql = "SELECT experiment, arm, round, metric, kind, value, baseline, detail FROM alerts"
+        params: List[Any] = []
+        if experiment is not None:
+            sql += " WHERE experiment = ?"
+            params.append(experiment)
+        sql += " ORDER BY experiment, arm, round, id"
+        keys = ("experiment", "arm", "round", "metric", "kind", "value", "baseline", "detail")
+        return [dict(zip(keys, r)) for r in self.conn.execute(sql, params)]
+
+    def contrast(
+        self, metric: str = "merge.accuracy", segment: str = ALL, baseline_rounds: int = BASELINE_ROUNDS
+    ) -> List[Dict[str, Any]]:
+        """Baseline (rounds <= ``baseline_rounds``) vs learning rounds, per experiment and arm."""
+        rows = self.conn.execute(
+            """
+            SELECT experiment, arm, round > ? AS learning, count(*), avg(value), sum(value * value)
+            FROM latest WHERE metric = ? AND segment = ?
+            GROUP BY experiment, arm, learning ORDER BY experiment, arm
+            """,
+            (baseline_rounds, metric, segment),
+        ).fetchall()
+        groups: Dict[Tuple[str, str], Dict[str, RunningStats]] = {}
+        for exp, arm, learning, n, mean, sq in rows:
+            stats = RunningStats(int(n), float(mean), max(float(sq) - n * mean * mean, 0.0))
+            groups.setdefault((exp, arm), {})["learning" if learning else "baseline"] = stats
+        out = []
+        for (exp, arm), g in groups.items():
+            base, learn = g.get("baseline", RunningStats()), g.get("learning", RunningStats())
+            out.append(
+                {
+                    "experiment": exp,
+                    "arm": arm,
+                    "metric": metric,
+                    "baseline_rounds": base.n,
+                    "baseline_mean": base.mean if base.n else None,
+                    "learning_rounds": learn.n,
+                    "learning_mean": learn.mean if learn.n else None,
+                    "delta": learn.mean - base.mean if base.n and learn.n else None,
+                    "welch_t": welch_t(base, learn),
+                }
+            )
+        return out
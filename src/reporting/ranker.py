@@ -1 +1,300 @@
 """Rank pull requests by calibrated merge probability and priority."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+from statistics import NormalDist
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from src.analysis.logit_estimator import FeatureVectorizer, LogitFit, cluster_bootstrap, fit_logit, sigmoid
+from src.analysis.signal_extractor import INTERACTION_FEATURES, extract_corpus
+
+
+def _base(column: str) -> str:
+    """``category=docs`` -> ``category`` (one-hot columns share their source key)."""
+    return column.split("=", 1)[0]
+
+
+def interaction_features(feature_sets: Mapping[str, Mapping[str, object]]) -> List[str]:
+    """Mature-only features whose presence routes a PR to the mature model.
+
+    ``weeks_since_open`` and the like are mature-only in model_spec but are
+    known at creation, so only the comment/review signals trigger routing.
+    """
+    early = set(feature_sets.get("early_model", {}).get("features", []))
+    mature = feature_sets.get("mature_model", {}).get("features", [])
+    return [f for f in mature if f not in early and f in INTERACTION_FEATURES]
+
+
+@dataclass
+class RoutedModel:
+    """One feature-set model laid out over the router's shared columns."""
+
+    name: str
+    fit: LogitFit
+    columns: np.ndarray  # index of each fit feature in the shared design matrix
+    coef: np.ndarray  # fit.coef scattered to full width, zero where unused
+
+    @property
+    def intercept(self) -> float:
+        return self.fit.intercept
+
+
+@dataclass
+class ScoreTable:
+    """Column-oriented scores for a queue of PRs (one row per PR, input order)."""
+
+    numbers: np.ndarray
+    p_merge: np.ndarray
+    ci_low: np.ndarray
+    ci_high: np.ndarray
+    model_used: np.ndarray
+    feature_names: List[str]
+    # top-k contribution (coef * value) column indices and values, best first
+    pos_idx: np.ndarray
+    pos_val: np.ndarray
+    neg_idx: np.ndarray
+    neg_val: np.ndarray
+    confidence: float = 0.95
+
+    def __len__(self) -> int:
+        return len(self.numbers)
+
+    def calibrated(self, calibrator, segments: Optional[Mapping[str, Sequence[object]]] = None) -> "ScoreTable":
+        """A copy with P(merge) and CI bounds mapped through a SegmentedCalibrator.
+
+        Segments default to ``model_used``; the maps are monotone, so bounds
+        stay ordered.
+        """
+        segments = segments if segments is not None else {"model_used": self.model_used}
+        return replace(
+            self,
+            p_merge=calibrator.apply(self.p_merge, segments),
+            ci_low=calibrator.apply(self.ci_low, segments),
+            ci_high=calibrator.apply(self.ci_high, segments),
+        )
+
+    def order(self) -> np.ndarray:
+        """Row indices by P(merge), highest first."""
+        return np.argsort(-self.p_merge, kind="stable")
+
+    def _drivers(self, idx: np.ndarray, val: np.ndarray, positive: bool) -> List[Dict[str, object]]:
+        return [
+            {"feature": self.feature_names[j], "contribution": round(float(v), 6)}
+            for j, v in zip(idx, val)
+            if (v > 0 if positive else v < 0)
+        ]
+
+    def records(self, ranked: bool = True) -> List[Dict[str, object]]:
+        """The model_spec ``outputs`` per PR."""
+        rows = self.order() if ranked else range(len(self))
+        return [
+            {
+                "number": int(self.numbers[i]),
+                "p_merge": round(float(self.p_merge[i]), 6),
+                "confidence_interval": [round(float(self.ci_low[i]), 6), round(float(self.ci_high[i]), 6)],
+                "model_used": str(self.model_used[i]),
+                "top_positive_drivers": self._drivers(self.pos_idx[i], self.pos_val[i], True),
+                "top_negative_drivers": self._drivers(self.neg_idx[i], self.neg_val[i], False),
+            }
+            for i in rows
+        ]
+
+
+def _top_k(values: np.ndarray, k: int) -> tuple:
+    """Per-row indices/values of the k largest entries, sorted descending."""
+    if not values.shape[1] or k <= 0:
+        empty = np.zeros((len(values), 0))
+        return empty.astype(int), empty
+    k = min(k, values.shape[1])
+    part = np.argpartition(-values, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(values, part, axis=1)
+    order = np.argsort(-vals, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+class ModelRouter:
+    """Score PRs with the early or the mature model, whichever fits the PR.
+
+    A PR goes to the mature model once any interaction feature (comment or
+    review signals) is populated, otherwise to the early model.
+    Both models share one vocabulary: a queue is vectorised once and each
+    model is a single matrix-vector product over the rows routed to it.
+    """
+
+    def __init__(self, fits: Mapping[str, LogitFit], interaction: Sequence[str]) -> None:
+        names = sorted({n for fit in fits.values() for n in fit.feature_names})
+        self.vectorizer = FeatureVectorizer()
+        self.vectorizer.vocabulary = {n: i for i, n in enumerate(names)}
+        self.interaction = list(interaction)
+        self.models: Dict[str, RoutedModel] = {}
+        for name, fit in fits.items():
+            cols = np.array([self.vectorizer.vocabulary[n] for n in fit.feature_names], dtype=int)
+            coef = np.zeros(len(names))
+            coef[cols] = fit.coef
+            self.models[name] = RoutedModel(name=name, fit=fit, columns=cols, coef=coef)
+
+    @property
+    def feature_names(self) -> List[str]:
+        return self.vectorizer.feature_names
+
+    def design(self, rows: Sequence[Mapping[str, object]]) -> np.ndarray:
+        return self.vectorizer.transform(rows)
+
+    def route(self, rows: Sequence[Mapping[str, object]]) -> np.ndarray:
+        mature = np.array(
+            [any(row.get(f) is not None for f in self.interaction) for row in rows],
+            dtype=bool,
+        )
+        if "mature" not in self.models:
+            mature[:] = False
+        if "early" not in self.models:
+            mature[:] = True
+        return np.where(mature, "mature", "early").astype(object)
+
+    def decision_function(self, X: np.ndarray, used: np.ndarray) -> np.ndarray:
+        z = np.empty(len(X))
+        for name, model in self.models.items():
+            rows = used == name
+            if rows.any():
+                z[rows] = X[rows] @ model.coef + model.intercept
+        return z
+
+    def predict(self, rows: Sequence[Mapping[str, object]]) -> tuple:
+        """P(merge) and ``model_used`` for each feature dict."""
+        used = self.route(rows)
+        return sigmoid(self.decision_function(self.design(rows), used)), used
+
+    def score_rows(
+        self,
+        rows: Sequence[Mapping[str, object]],
+        numbers: Sequence[int],
+        top_k: int = 3,
+        confidence: float = 0.95,
+    ) -> ScoreTable:
+        """Score feature dicts in bulk: P(merge), delta-method CI and top drivers.
+
+        The CI is taken on the logit scale, ``eta ± z * sqrt(x' Σ x)`` with
+        Σ the routed model's coefficient covariance, then mapped through the
+        sigmoid. Everything is batched per model; there is no per-PR loop.
+        """
+        X = self.design(rows)
+        used = self.route(rows)
+        n, d = X.shape
+        eta = np.zeros(n)
+        var = np.zeros(n)
+        contrib = np.zeros((n, d))
+        for model in self.models.values():
+            r = used == model.name
+            if not r.any():
+                continue
+            Xr = X[r]
+            eta[r] = Xr @ model.coef + model.intercept
+            Xa = np.hstack([np.ones((len(Xr), 1)), Xr[:, model.columns]])
+            cov = model.fit.cov
+            var[r] = np.sum((Xa @ cov) * Xa, axis=1) if cov.ndim == 2 else (Xa * Xa) @ cov
+            contrib[r] = Xr * model.coef
+
+        z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+        se = np.sqrt(np.clip(var, 0.0, None))
+        pos_idx, pos_val = _top_k(contrib, top_k)
+        neg_idx, neg_val = _top_k(-contrib, top_k)
+        return ScoreTable(
+            numbers=np.asarray(numbers, dtype=int),
+            p_merge=sigmoid(eta),
+            ci_low=sigmoid(eta - z * se),
+            ci_high=sigmoid(eta + z * se),
+            model_used=used,
+            feature_names=self.feature_names,
+            pos_idx=pos_idx,
+            pos_val=pos_val,
+            neg_idx=neg_idx,
+            neg_val=-neg_val,
+            confidence=confidence,
+        )
+
+    def score_many(
+        self,
+        prs: Sequence[dict],
+        context: Sequence[dict] = (),
+        now: Optional[float] = None,
+        top_k: int = 3,
+        confidence: float = 0.95,
+    ) -> ScoreTable:
+        """Score a queue of PRs.
+
+        ``context`` is the closed history the author features are computed
+        from; it is not scored.
+        """
+        rows = extract_corpus(list(context) + list(prs), now=now)[len(context):]
+        return self.score_rows(rows, [int(pr["number"]) for pr in prs], top_k=top_k, confidence=confidence)
+
+    def rank(
+        self,
+        prs: Sequence[dict],
+        context: Sequence[dict] = (),
+        now: Optional[float] = None,
+        top_k: int = 3,
+    ) -> List[Dict[str, object]]:
+        """Open PRs ordered by P(merge), highest first."""
+        return self.score_many(prs, context=context, now=now, top_k=top_k).records()
+
+
+def fit_router(
+    rows: Sequence[Mapping[str, object]],
+    y: Sequence[float],
+    feature_sets: Mapping[str, Mapping[str, object]],
+    l2: float = 1.0,
+    class_weight: Optional[str] = "balanced",
+    groups: Optional[Sequence[object]] = None,
+    n_boot: int = 0,
+    max_workers: Optional[int] = None,
+) -> ModelRouter:
+    """Fit the early model on every row and the mature model on rows with interaction data.
+
+    With ``groups`` (PR authors) and ``n_boot > 0`` each model's covariance
+    comes from an author-level cluster bootstrap instead of the Hessian, so
+    ``confidence_interval`` reflects correlated PRs from the same author.
+    """
+    interaction = interaction_features(feature_sets)
+    vec = FeatureVectorizer()
+    X = vec.fit_transform(rows)
+    y = np.asarray(y, dtype=float)
+    names = vec.feature_names
+
+    fits: Dict[str, LogitFit] = {}
+    for short, key, mask in (
+        ("early", "early_model", np.ones(len(rows), dtype=bool)),
+        ("mature", "mature_model", np.array([any(r.get(f) is not None for f in interaction) for r in rows], dtype=bool)),
+    ):
+        allowed = set(feature_sets.get(key, {}).get("features", []))
+        cols = [j for j, n in enumerate(names) if _base(n) in allowed]
+        if not cols or mask.sum() < 2 or len(np.unique(y[mask])) < 2:
+            continue
+        fit = fit_logit(
+            X[np.ix_(mask, cols)],
+            y[mask],
+            l2=l2,
+            class_weight=class_weight,
+            feature_names=[names[j] for j in cols],
+        )
+        fit.meta["model_used"] = short
+        fit.meta["n_train"] = int(mask.sum())
+        if n_boot > 0 and groups is not None:
+            boot = cluster_bootstrap(
+                X[np.ix_(mask, cols)],
+                y[mask],
+                np.asarray(groups, dtype=object)[mask],
+                n_boot=n_boot,
+                l2=l2,
+                class_weight=class_weight,
+                fit=fit,
+                max_workers=max_workers,
+            )
+            fit.cov = boot.cov
+            fit.meta["cov_source"] = "author_bootstrap"
+            fit.meta["n_boot"] = n_boot
+        fits[short] = fit
+    return ModelRouter(fits, interaction)
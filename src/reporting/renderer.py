@@ -1 +1,47 @@
 """Render markdown and structured reports for maintainers."""
+
+from __future__ import annotations
+
+from typing import Dict, Mapping, Optional, Sequence
+
+
+def _drivers(drivers: Sequence[Mapping[str, object]]) -> str:
+    return ", ".join(f"{d['feature']} ({float(d['contribution']):+.2f})" for d in drivers) or "—"
+
+
+def render_ranking(
+    records: Sequence[Mapping[str, object]],
+    titles: Optional[Mapping[int, str]] = None,
+    limit: Optional[int] = 50,
+) -> str:
+    """Markdown table of ranked PRs (``ScoreTable.records`` output)."""
+    titles = titles or {}
+    lines = [
+        "| # | PR | P(merge) | CI | model | up | down |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for rank, rec in enumerate(records[:limit] if limit else records, start=1):
+        num = int(rec["number"])
+        lo, hi = rec["confidence_interval"]
+        title = str(titles.get(num, "")).replace("|", "\\|")
+        lines.append(
+            f"| {rank} | #{num} {title} | {float(rec['p_merge']):.2f} | {float(lo):.2f}–{float(hi):.2f} | "
+            f"{rec['model_used']} | {_drivers(rec['top_positive_drivers'])} | {_drivers(rec['top_negative_drivers'])} |"
+        )
+    return "\n".join(lines) + "\n"
+
+
+def render_summary(records: Sequence[Mapping[str, object]]) -> Dict[str, object]:
+    """Structured counterpart of :func:`render_ranking` for JSON reports."""
+    p = [float(r["p_merge"]) for r in records]
+    used: Dict[str, int] = {}
+    for r in records:
+        used[str(r["model_used"])] = used.get(str(r["model_used"]), 0) + 1
+    return {
+        "n": len(records),
+        "mean_p_merge": round(sum(p) / len(p), 6) if p else None,
+        "likely_merge": sum(v >= 0.5 for v in p),
+        "model_used": used,
+        "top": [int(r["number"]) for r in records[:10]],
+    }
+
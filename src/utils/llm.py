@@ -1 +1,539 @@
 """LLM adapter interfaces for constrained model-assisted tasks."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+API_URL = "https://api.anthropic.com/v1/messages"
+DEFAULT_MODEL = "claude-haiku-4-5"
+RETRY_STATUSES = {429, 500, 502, 503, 529}
+PR_HEADING_RE = re.compile(r"^#+ PR #(\d+)", re.MULTILINE)
+TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+# BPE-like pieces: a word or up to three digits with its leading space, one
+# symbol, or a whitespace run
+TOKEN_PIECE_RE = re.compile(r" ?[A-Za-z]+| ?\d{1,3}| ?[^\sA-Za-z\d]|\s+")
+WORD_CHARS_PER_TOKEN = 6
+TRUNCATION_MARK = "…"
+# Token budget for a PR's free-text sections, split by how much each tends
+# to decide the outcome (see fit_pr_sections)
+PR_SECTION_TOKENS = 2000
+PR_SECTION_WEIGHTS = {"reviews": 3.0, "comments": 2.0, "greptile": 1.5, "body": 1.0, "files": 0.5}
+GREPTILE_MARKER = "<!-- greptile_comment -->"
+
+# (prompt, model, max_tokens) -> response text
+Backend = Callable[[str, str, int], str]
+
+
+class LLMHTTPError(RuntimeError):
+    """Non-2xx response from an LLM backend."""
+
+    def __init__(self, status: int, message: str = "") -> None:
+        super().__init__(f"HTTP {status}: {message}" if message else f"HTTP {status}")
+        self.status = status
+
+
+def get_token() -> tuple[str, str]:
+    api_key = os.environ.get("ANTHROPIC_API_KEY")
+    if api_key:
+        return api_key, "api_key"
+    auth_file = Path.home() / ".openclaw" / "agents" / "main" / "agent" / "auth-profiles.json"
+    if auth_file.exists():
+        profiles = json.load(auth_file.open())
+        preferred = os.environ.get("ANTHROPIC_PROFILE")
+        profile_order = ["anthropic:eva-new", "anthropic:bruno-new", "anthropic:openclaw"]
+        if preferred:
+            profile_order = [preferred] + [p for p in profile_order if p != preferred]
+        for profile_name in profile_order:
+            p = profiles.get("profiles", {}).get(profile_name, {})
+            token = p.get("token") or p.get("access")
+            if token:
+                return token, "oauth"
+    raise RuntimeError("No Anthropic token found")
+
+
+def http_backend(prompt: str, model: str, max_tokens: int) -> str:
+    """Anthropic Messages API over urllib (API key or OpenClaw OAuth profile)."""
+    token, auth_type = get_token()
+    headers = {
+        "Content-Type": "application/json",
+        "anthropic-version": "2023-06-01",
+    }
+    if auth_type == "oauth":
+        headers["Authorization"] = f"Bearer {token}"
+        headers["anthropic-beta"] = "oauth-2025-04-20"
+    else:
+        headers["x-api-key"] = token
+    payload = {"model": model, "max_tokens": max_tokens, "messages": [{"role": "user", "content": prompt}]}
+    req = urllib.request.Request(API_URL, data=json.dumps(payload).encode(), headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(req, timeout=180) as resp:
+            data = json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        raise LLMHTTPError(e.code, str(e.reason)) from e
+    return data["content"][0]["text"]
+
+
+def dry_run_backend(prompt: str, model: str, max_tokens: int) -> str:
+    """Offline stand-in: "closed" at 0.5 for every ``PR #n`` heading in the prompt."""
+    nums = [int(n) for n in PR_HEADING_RE.findall(prompt)]
+    return json.dumps(
+        {
+            "predictions": [
+                {"pr_number": n, "prediction": "closed", "confidence": 0.5, "reasoning": "dry-run", "features": {}}
+                for n in nums
+            ],
+            "duplicates": [],
+            "reflections": [],
+        }
+    )
+
+
+def parse_json_response(text: str) -> Any:
+    """Parse a model reply, tolerating ```json fences and trailing commas."""
+    if "```json" in text:
+        text = text.split("```json", 1)[1].split("```", 1)[0]
+    return json.loads(TRAILING_COMMA_RE.sub(r"\1", text.strip()))
+
+
+def _piece_tokens(piece: str) -> int:
+    word = piece.lstrip(" ")
+    if len(word) > WORD_CHARS_PER_TOKEN and word.isalpha():
+        return 1 + (len(word) - 1) // WORD_CHARS_PER_TOKEN
+    return 1
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate BPE token count without a tokenizer.
+
+    Common words cost one token and long identifiers one per
+    :data:`WORD_CHARS_PER_TOKEN` letters; digits go three to a token and
+    every symbol is its own, so JSON, paths and hashes are not
+    undercounted the way ``len(text) / 4`` undercounts them.
+    """
+    return sum(_piece_tokens(p) for p in TOKEN_PIECE_RE.findall(text))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """``text`` cut at a piece boundary to at most ``max_tokens``, marked with an ellipsis."""
+    if max_tokens <= 0:
+        return ""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    used = 0
+    end = 0
+    for m in TOKEN_PIECE_RE.finditer(text):
+        used += _piece_tokens(m.group())
+        if used > max_tokens - 1:
+            break
+        end = m.end()
+    return text[:end].rstrip() + TRUNCATION_MARK
+
+
+def allocate_budget(needs: Mapping[str, int], budget: int, weights: Optional[Mapping[str, float]] = None) -> Dict[str, int]:
+    """Split ``budget`` tokens across sections in proportion to ``weights``.
+
+    Water-filling: a section never gets more than it needs, and whatever a
+    short section leaves is shared again among the rest by weight.
+    """
+    weight = {k: float((weights or {}).get(k, 1.0)) for k in needs}
+    alloc = dict.fromkeys(needs, 0)
+    open_ = {k for k, n in needs.items() if n > 0 and weight[k] > 0}
+    left = float(budget)
+    while open_ and left >= 1:
+        total = sum(weight[k] for k in open_)
+        share = {k: left * weight[k] / total for k in open_}
+        filled = {k for k in open_ if needs[k] - alloc[k] <= share[k]}
+        if not filled:
+            for k in open_:
+                alloc[k] += int(share[k])
+            break
+        for k in filled:
+            left -= needs[k] - alloc[k]
+            alloc[k] = needs[k]
+        open_ -= filled
+    return alloc
+
+
+def fit_sections(
+    sections: Mapping[str, Sequence[str]],
+    budget: int,
+    weights: Optional[Mapping[str, float]] = None,
+    min_entry_tokens: int = 16,
+) -> Dict[str, List[str]]:
+    """Entries of each prompt section, trimmed to fit ``budget`` tokens overall.
+
+    The budget is first allocated across sections (:func:`allocate_budget`).
+    Within a section, leading entries are kept while each can still get
+    ``min_entry_tokens`` (or its full size, if smaller); the section's
+    allocation is then water-filled across the kept entries, so short
+    entries stay whole and only the longest ones are truncated.
+    """
+    costs = {k: [estimate_tokens(e) for e in entries] for k, entries in sections.items()}
+    alloc = allocate_budget({k: sum(c) for k, c in costs.items()}, budget, weights)
+    out: Dict[str, List[str]] = {}
+    for k, entries in sections.items():
+        if sum(costs[k]) <= alloc[k]:
+            out[k] = list(entries)
+            continue
+        kept = 0
+        floor = 0
+        for c in costs[k]:
+            if floor + min(c, min_entry_tokens) > alloc[k]:
+                break
+            floor += min(c, min_entry_tokens)
+            kept += 1
+        per_entry = allocate_budget({str(i): costs[k][i] for i in range(kept)}, alloc[k])
+        out[k] = [truncate_to_tokens(entries[i], per_entry[str(i)]) for i in range(kept)]
+    return out
+
+
+def pr_sections(pr: dict, greptile_summary: str = "") -> Dict[str, List[str]]:
+    """Untruncated prompt entries per variable-length PR section.
+
+    A non-empty ``greptile_summary`` gets a section of its own and the body
+    is cut where the Greptile comment starts, so it is not paid for twice.
+    """
+    body = pr.get("body") or ""
+    if greptile_summary:
+        body = body[: body.lower().find(GREPTILE_MARKER)].rstrip()
+    comments = []
+    for c in pr.get("comments", []) or []:
+        if not isinstance(c, dict):
+            continue
+        user = c.get("author", {}).get("login") if isinstance(c.get("author"), dict) else c.get("user")
+        assoc = c.get("authorAssociation") or c.get("author_association") or ""
+        comments.append(f"- **{user or '?'}** ({assoc}): " + (c.get("body", "") or "").replace("\n", " "))
+    reviews = []
+    for r in pr.get("reviews", []) or []:
+        if not isinstance(r, dict):
+            continue
+        user = r.get("author", {}).get("login") if isinstance(r.get("author"), dict) else r.get("user")
+        reviews.append(f"- **{user or '?'}**: {r.get('state', '?')} — " + (r.get("body", "") or "").replace("\n", " "))
+    files = []
+    for f in pr.get("files", []) or []:
+        path = (f.get("path") or f.get("filename") or "?") if isinstance(f, dict) else str(f)
+        files.append(f"- {path}")
+    return {
+        "body": [body],
+        "greptile": [greptile_summary] if greptile_summary else [],
+        "comments": comments,
+        "reviews": reviews,
+        "files": files,
+    }
+
+
+def fit_pr_sections(
+    pr: dict,
+    greptile_summary: str = "",
+    budget: int = PR_SECTION_TOKENS,
+    weights: Optional[Mapping[str, float]] = None,
+) -> tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """``(sections, fitted)`` for one PR: :func:`pr_sections` and what fits ``budget``.
+
+    ``weights`` defaults to :data:`PR_SECTION_WEIGHTS`.
+    """
+    sections = pr_sections(pr, greptile_summary)
+    return sections, fit_sections(sections, budget, PR_SECTION_WEIGHTS if weights is None else weights)
+
+
+def pack_by_tokens(
+    costs: Sequence[int],
+    budget: int,
+    sizes: Optional[Sequence[int]] = None,
+    max_size: int = 0,
+) -> List[List[int]]:
+    """Bin-pack items into prompts of at most ``budget`` tokens; returns index lists.
+
+    First-fit decreasing by token cost. ``sizes`` (e.g. PRs per item) are
+    capped at ``max_size`` per prompt when it is set, which bounds the
+    reply length. An item over the budget on its own gets a prompt to
+    itself. Items keep their input order within a prompt and prompts are
+    ordered by their first item.
+    """
+    sizes = list(sizes) if sizes is not None else [1] * len(costs)
+    bins: List[List[int]] = []
+    load: List[List[int]] = []  # [tokens, size] per bin
+    for i in sorted(range(len(costs)), key=lambda i: (-costs[i], i)):
+        for b, (tokens, size) in enumerate(load):
+            if tokens + costs[i] <= budget and (not max_size or size + sizes[i] <= max_size):
+                bins[b].append(i)
+                load[b][0] += costs[i]
+                load[b][1] += sizes[i]
+                break
+        else:
+            bins.append([i])
+            load.append([costs[i], sizes[i]])
+    return sorted((sorted(b) for b in bins), key=lambda b: b[0])
+
+
+def prompt_key(prompt: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+class RateLimiter:
+    """Thread-safe request spacing shared by every caller of one LLM budget.
+
+    ``pause`` pushes the next slot back for everyone, so a 429 seen by one
+    worker slows all of them instead of each hammering the API in turn.
+    """
+
+    def __init__(self, requests_per_minute: float = 50.0) -> None:
+        self.interval = 60.0 / requests_per_minute if requests_per_minute > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._next = max(self._next, time.monotonic() + seconds)
+
+
+class ResponseCache:
+    """Response text keyed by prompt hash; appended to a JSONL file as it grows."""
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self.entries: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if path is not None and path.exists():
+            for line in path.open():
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn final line from an interrupted run
+                self.entries[row["key"]] = row["text"]
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            return self.entries.get(key)
+
+    def put(self, key: str, text: str) -> None:
+        with self._lock:
+            self.entries[key] = text
+            if self.path is not None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                with self.path.open("a") as f:
+                    f.write(json.dumps({"key": key, "text": text}) + "\n")
+
+
+class ReplayStore:
+    """Recorded LLM output, looked up by prompt hash or by the PRs a prompt asks about.
+
+    Exact entries come from ResponseCache JSONL files written by real runs.
+    Older runs only kept parsed per-round results (round_*_results.json), so
+    those are indexed per PR number and a response is reassembled from the
+    ``PR #n`` headings of the prompt; the most recently loaded record wins.
+    PRs with no record get a closed/0.5 placeholder unless ``fill_missing``
+    is off, in which case they are left out of the reply.
+    """
+
+    def __init__(self, fill_missing: bool = True) -> None:
+        self.fill_missing = fill_missing
+        self.exact: Dict[str, str] = {}
+        self.predictions: Dict[int, dict] = {}
+        self.duplicates: Dict[tuple, dict] = {}
+
+    def add_cache(self, path: Path) -> "ReplayStore":
+        self.exact.update(ResponseCache(path).entries)
+        return self
+
+    def add_results(self, path: Path) -> "ReplayStore":
+        payload = json.load(path.open())
+        for pred in payload.get("predictions", []):
+            try:
+                self.predictions[int(pred["pr_number"])] = pred
+            except (KeyError, TypeError, ValueError):
+                continue
+        for dup in payload.get("duplicates", []):
+            if not isinstance(dup, dict):
+                continue
+            prs = tuple(sorted(int(n) for n in dup.get("prs") or [] if str(n).isdigit()))
+            if len(prs) > 1:
+                self.duplicates[prs] = dup
+        return self
+
+    @classmethod
+    def from_dirs(cls, *dirs: Path, fill_missing: bool = True) -> "ReplayStore":
+        store = cls(fill_missing=fill_missing)
+        for d in dirs:
+            for path in sorted(d.glob("round_*_results.json")):
+                store.add_results(path)
+            for path in sorted(d.glob("*.jsonl")):
+                store.add_cache(path)
+        return store
+
+    def lookup(self, prompt: str, model: str) -> tuple:
+        """``(text, n_missing)``; ``n_missing`` counts PRs with no recorded prediction."""
+        hit = self.exact.get(prompt_key(prompt, model))
+        if hit is not None:
+            return hit, 0
+        nums = [int(n) for n in PR_HEADING_RE.findall(prompt)]
+        asked = set(nums)
+        preds = []
+        missing = 0
+        for n in nums:
+            pred = self.predictions.get(n)
+            if pred is None:
+                missing += 1
+                if not self.fill_missing:
+                    continue
+                pred = {"pr_number": n, "prediction": "closed", "confidence": 0.5, "reasoning": "replay-miss", "features": {}}
+            preds.append(pred)
+        dups = [d for prs, d in self.duplicates.items() if asked.issuperset(prs)]
+        return json.dumps({"predictions": preds, "duplicates": dups, "reflections": []}), missing
+
+
+class ReplayBackend:
+    """Offline backend serving a :class:`ReplayStore` with injected faults.
+
+    Every call sleeps ``latency`` ± ``jitter`` seconds, then fails with a
+    retryable status (429/529) with probability ``error_rate``, or returns
+    a malformed reply with probability ``malformed_rate``: half of those
+    are truncated mid-JSON (as when max_tokens runs out), half are fenced
+    with trailing commas, which :func:`parse_json_response` repairs.
+    Draws are seeded by prompt and attempt number, so a run is reproducible
+    whatever the thread interleaving.
+    """
+
+    def __init__(
+        self,
+        store: ReplayStore,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        error_statuses: tuple = (429, 529),
+        malformed_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.store = store
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_statuses = error_statuses
+        self.malformed_rate = malformed_rate
+        self.seed = seed
+        self.attempts: Dict[str, int] = {}
+        self.stats = {"calls": 0, "exact": 0, "assembled": 0, "missing_prs": 0, "errors": 0, "malformed": 0}
+        self._lock = threading.Lock()
+
+    def __call__(self, prompt: str, model: str, max_tokens: int) -> str:
+        key = prompt_key(prompt, model)
+        with self._lock:
+            attempt = self.attempts.get(key, 0)
+            self.attempts[key] = attempt + 1
+            self.stats["calls"] += 1
+        rng = random.Random(f"{self.seed}:{key}:{attempt}")
+        delay = self.latency + self.jitter * (2.0 * rng.random() - 1.0)
+        if delay > 0:
+            time.sleep(delay)
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.stats["errors"] += 1
+            raise LLMHTTPError(rng.choice(self.error_statuses), "injected")
+
+        text, missing = self.store.lookup(prompt, model)
+        with self._lock:
+            self.stats["exact" if key in self.store.exact else "assembled"] += 1
+            self.stats["missing_prs"] += missing
+        if rng.random() < self.malformed_rate:
+            with self._lock:
+                self.stats["malformed"] += 1
+            if rng.random() < 0.5:
+                return text[: max(1, int(len(text) * rng.uniform(0.3, 0.9)))]
+            return "```json\n" + re.sub(r"([}\]])", r"\1,", text, count=1) + "\n```"
+        return text
+
+
+class LLMClient:
+    """One model behind a backend, with shared rate budget, cache and retries.
+
+    Transient HTTP errors (429/5xx/529) are retried with linear backoff and
+    pause the shared limiter; replies that fail to parse as JSON are
+    re-requested with a larger token budget, bypassing the cache.
+    """
+
+    def __init__(
+        self,
+        model: str = DEFAULT_MODEL,
+        backend: Backend = http_backend,
+        limiter: Optional[RateLimiter] = None,
+        cache: Optional[ResponseCache] = None,
+        max_attempts: int = 3,
+        backoff_seconds: float = 60.0,
+    ) -> None:
+        self.model = model
+        self.backend = backend
+        self.limiter = limiter
+        self.cache = cache
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.stats = {"calls": 0, "cache_hits": 0, "retries": 0, "parse_failures": 0, "seconds": 0.0}
+        self._lock = threading.Lock()
+
+    def _count(self, key: str, amount: float = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+
+    def complete(self, prompt: str, max_tokens: int = 8000, refresh: bool = False) -> str:
+        key = prompt_key(prompt, self.model)
+        if self.cache is not None and not refresh:
+            hit = self.cache.get(key)
+            if hit is not None:
+                self._count("cache_hits")
+                return hit
+
+        for attempt in range(self.max_attempts):
+            if self.limiter is not None:
+                self.limiter.acquire()
+            started = time.monotonic()
+            try:
+                text = self.backend(prompt, self.model, max_tokens)
+            except LLMHTTPError as e:
+                if e.status in RETRY_STATUSES and attempt < self.max_attempts - 1:
+                    wait = self.backoff_seconds * (attempt + 1)
+                    self._count("retries")
+                    if self.limiter is not None:
+                        self.limiter.pause(wait)
+                    print(f"HTTP {e.status}; sleeping {wait}s (attempt {attempt + 1}/{self.max_attempts})")
+                    time.sleep(wait)
+                    continue
+                raise
+            finally:
+                self._count("seconds", time.monotonic() - started)
+            self._count("calls")
+            if self.cache is not None:
+                self.cache.put(key, text)
+            return text
+        raise RuntimeError(f"LLM call failed after {self.max_attempts} attempts")
+
+    def complete_json(self, prompt: str, max_tokens: int = 8000, default: Any = None) -> Any:
+        """Parsed JSON reply; ``default`` when every attempt comes back malformed."""
+        for attempt in range(self.max_attempts):
+            text = self.complete(prompt, max_tokens=max_tokens, refresh=attempt > 0)
+            try:
+                return parse_json_response(text)
+            except json.JSONDecodeError as e:
+                self._count("parse_failures")
+                print(f"JSON parse error at char {e.pos}/{len(text)}; retrying (attempt {attempt + 1}/{self.max_attempts})")
+                max_tokens = min(max_tokens + 2000, 8192)
+        return default
@@ -1 +1,93 @@
 """Benchmark tests for accuracy, speed, and calibration targets."""
+
+import json
+
+from src.utils.llm import LLMClient, ReplayBackend, ReplayStore, prompt_key
+
+
+def _store(tmp_path):
+    preds = [{"pr_number": n, "prediction": "merged", "confidence": 0.8, "features": {}} for n in (1, 2, 3)]
+    dups = [{"prs": [1, 2], "confidence": 0.9}, {"prs": [3, None]}]
+    json.dump({"round": 1, "predictions": preds, "duplicates": dups}, open(tmp_path / "round_1_results.json", "w"))
+    return ReplayStore.from_dirs(tmp_path)
+
+
+def test_replay_assembles_recorded_predictions_by_pr(tmp_path):
+    store = _store(tmp_path)
+    text, missing = store.lookup("## PR #2\n## PR #1\n## PR #9", "m")
+    out = json.loads(text)
+    assert [p["pr_number"] for p in out["predictions"]] == [2, 1, 9] and missing == 1
+    assert out["predictions"][0]["prediction"] == "merged" and out["duplicates"] == [{"prs": [1, 2], "confidence": 0.9}]
+    store.exact[prompt_key("exact prompt", "m")] = '{"predictions": []}'
+    assert store.lookup("exact prompt", "m") == ('{"predictions": []}', 0)
+
+
+def test_client_recovers_from_injected_faults_deterministically(tmp_path):
+    def run():
+        backend = ReplayBackend(_store(tmp_path), error_rate=0.4, malformed_rate=0.4, seed=3)
+        client = LLMClient(model="m", backend=backend, max_attempts=6, backoff_seconds=0.0)
+        outs = [client.complete_json(f"batch {i}\n## PR #1\n## PR #3", default=None) for i in range(20)]
+        return outs, backend.stats, client.stats
+
+    outs, replay, stats = run()
+    assert replay["errors"] > 0 and replay["malformed"] > 0
+    assert stats["retries"] == replay["errors"]
+    assert sum(o is not None for o in outs) >= 18
+    assert all(o["predictions"][1]["pr_number"] == 3 for o in outs if o is not None)
+    assert run()[1] == replay
+
+
+def test_synthetic_corpus_is_deterministic_and_scales_authors():
+    from benchmarks.synthetic import synthesize
+
+    a = synthesize(400, seed=5)
+    assert a == synthesize(400, seed=5)
+    assert [p["number"] for p in a] == list(range(1, 401))
+    assert len({p["user"] for p in synthesize(4000, seed=5)}) > len({p["user"] for p in a})
+
+
+def test_stage_runner_and_regression_check(tmp_path):
+    from benchmarks.run_benchmark import STAGES, check_regressions, run_stages
+    from benchmarks.synthetic import synthesize
+
+    path = tmp_path / "corpus.json"
+    json.dump(synthesize(300, seed=1), open(path, "w"))
+    stages = {r.pop("stage"): r for r in run_stages(path)}
+    assert list(stages) == list(STAGES)
+    assert all(r["items"] > 0 and r["peak_rss_mb"] > 0 for r in stages.values())
+
+    run = {"host": "h", "sizes": {"3k": {"stages": stages, "peak_rss_mb": 100.0}}}
+    slow = {"host": "h", "sizes": {"3k": {"stages": {"logit_fit": {"seconds": 10.0}}, "peak_rss_mb": 100.0}}}
+    fast = {"host": "h", "sizes": {"3k": {"stages": {"logit_fit": {"seconds": 1e-3}}, "peak_rss_mb": 10.0}}}
+    assert check_regressions(run, [slow], {}) == []
+    stages["logit_fit"]["seconds"] = 0.5
+    kinds = {r["kind"] for r in check_regressions(run, [fast], {"min_seconds": 0.01, "budgets": {"3k": {"logit_fit": 0.1}}})}
+    assert kinds == {"slowdown", "budget", "rss"}
+
+
+def test_duplicate_pairs_and_metrics():
+    import numpy as np
+
+    from benchmarks.accuracy import accuracy_regressions, build_duplicate_pairs, merge_metrics
+
+    prs = [
+        {"number": 1, "title": "fix login bug", "user": "a", "labels": ["size: XS"], "created_at": "2026-01-01T00:00:00Z"},
+        {"number": 2, "title": "fix login bug", "user": "b", "labels": ["size: XS"], "created_at": "2026-01-01T01:00:00Z"},
+        {"number": 3, "title": "add docs", "user": "a", "labels": ["docs"], "created_at": "2026-01-01T02:00:00Z"},
+        {"number": 4, "title": "new feature x", "user": "c", "labels": ["docs"], "created_at": "2026-01-02T00:00:00Z"},
+        {"number": 5, "title": "new feature y", "user": "c", "labels": ["docs"], "created_at": "2026-01-09T00:00:00Z"},
+    ]
+    pairs = build_duplicate_pairs(prs, [[1, 3]], n_random=2, seed=0)
+    kinds = {(p["a"], p["b"]): p["kind"] for p in pairs}
+    # hard negatives come from time/author/label proximity, not from title similarity
+    assert kinds[(1, 3)] == "cluster" and kinds[(3, 4)] == "hard"
+    assert kinds.get((1, 2)) != "hard" and kinds.get((4, 5)) != "hard"
+    assert sum(k == "random" for k in kinds.values()) == 2
+
+    y = np.array([1.0, 0.0, 1.0, 0.0])
+    m = merge_metrics(y, np.array([0.9, 0.2, np.nan, 0.6]))
+    assert m["coverage"] == 0.75 and m["n"] == 3 and m["recall"] == 1.0 and m["precision"] == 0.5
+
+    prev = {"merge": {"logit": {"auc": 0.9, "brier": 0.10, "prs_per_second": 10.0}}}
+    card = {"merge": {"logit": {"auc": 0.85, "brier": 0.105, "prs_per_second": 99.0}}}
+    assert [r["metric"] for r in accuracy_regressions(card, prev, max_drop=0.01)] == ["auc"]
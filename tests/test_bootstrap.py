@@ -1 +1,295 @@
 """Tests for sequential bootstrap learning improvements across rounds."""
+
+import json
+import statistics
+import threading
+import time
+
+from src.bootstrap.consolidation import Consolidator
+from src.bootstrap.sampler import StratifiedSampler
+from src.bootstrap.sequential_trainer import (
+    ROOT,
+    ActiveSelector,
+    ArmConfig,
+    Corpus,
+    ExperimentRunner,
+    load_prior_errors_window,
+    run_py,
+)
+from src.utils.llm import (
+    PR_HEADING_RE,
+    LLMClient,
+    RateLimiter,
+    ResponseCache,
+    allocate_budget,
+    dry_run_backend,
+    estimate_tokens,
+    fit_pr_sections,
+    fit_sections,
+    pack_by_tokens,
+)
+
+PRS = {n: {"number": n, "title": f"PR {n}", "user": f"u{n % 3}"} for n in range(1, 9)}
+
+
+def _sample(r):
+    return {"round": r, "sampled_pr_numbers": list(PRS), "batch_assignments": {"1": [1, 2, 3, 4], "2": [5, 6, 7, 8]}}
+
+
+def _prompt(tag):
+    def build(ctx):
+        heads = "\n".join(f"## PR #{pr['number']}" for pr in ctx.batch)
+        return f"{tag} round={ctx.round} prior={len(ctx.prior_errors)}\n{heads}"
+
+    return build
+
+
+def _fake_scorer(calls):
+    """Writes score_round-shaped output: every odd PR counts as an error."""
+
+    def run(script, args):
+        calls.append(script)
+        if script != "score_round.py":
+            return
+        opts = dict(zip(args[::2], args[1::2]))
+        preds = json.load(open(opts["--results"]))["predictions"]
+        errors = [
+            {"pr_number": p["pr_number"], "error_type": "fn", "reasoning": "guess"} for p in preds if p["pr_number"] % 2
+        ]
+        acc = 1 - len(errors) / max(len(preds), 1)
+        payload = {"merge": {"accuracy": acc, "f1": acc}, "dedupe": {"f1": 0.0}, "errors": errors}
+        json.dump(payload, open(opts["--output"], "w"))
+
+    return run
+
+
+def test_arms_share_cache_and_run_concurrently(tmp_path):
+    in_flight = {"now": 0, "max": 0}
+    lock = threading.Lock()
+
+    def slow_backend(prompt, model, max_tokens):
+        with lock:
+            in_flight["now"] += 1
+            in_flight["max"] = max(in_flight["max"], in_flight["now"])
+        time.sleep(0.05)
+        with lock:
+            in_flight["now"] -= 1
+        return dry_run_backend(prompt, model, max_tokens)
+
+    client = LLMClient(backend=slow_backend, limiter=RateLimiter(0), cache=ResponseCache(tmp_path / "cache.jsonl"))
+    corpus = Corpus(prs=PRS, prs_path=tmp_path / "prs.json", feature_spec=[], split_path=tmp_path / "split.json")
+    arms = [
+        ArmConfig(name="plain", prompt_builder=_prompt("plain")),
+        ArmConfig(name="prior", prompt_builder=_prompt("plain"), prior_errors="window", prior_start_round=2),
+    ]
+    calls = []
+    runner = ExperimentRunner(
+        arms, corpus, client, tmp_path / "exp", sample_fn=_sample, rounds=2, run_script=_fake_scorer(calls)
+    )
+    comparison = runner.run()
+
+    assert set(comparison["arms"]) == {"plain", "prior"}
+    assert comparison["arms"]["plain"]["rounds"]["1"]["accuracy"] == 0.5
+    assert in_flight["max"] > 1  # batches and arms overlap
+    # round 1 prompts are identical across arms; round 2 differs once prior errors kick in
+    assert client.stats["calls"] + client.stats["cache_hits"] == 8
+    assert client.stats["calls"] >= 6
+    assert calls.count("consolidate_v2.py") == 2
+    assert json.load(open(tmp_path / "exp" / "comparison.json"))["arms"]["prior"]["error"] is None
+
+    # a rerun over the same cache makes no new calls
+    before = client.stats["calls"]
+    rerun = LLMClient(backend=slow_backend, cache=ResponseCache(tmp_path / "cache.jsonl"))
+    ExperimentRunner(arms, corpus, rerun, tmp_path / "exp2", sample_fn=_sample, rounds=2, run_script=_fake_scorer([])).run()
+    assert rerun.stats["calls"] == 0 and client.stats["calls"] == before
+
+
+def test_runner_without_metrics_db_writes_no_sqlite_outside_tmp(tmp_path):
+    prs_path, split_path = tmp_path / "prs.json", tmp_path / "split.json"
+    json.dump([dict(pr, merged_at=None) for pr in PRS.values()], prs_path.open("w"))
+    json.dump({"train": [], "holdout": [], "dedupe_clusters": []}, split_path.open("w"))
+    before = {p: p.stat().st_mtime_ns for p in ROOT.rglob("*.sqlite*") if tmp_path not in p.parents}
+
+    def scorer_only(script, args):
+        if script == "score_round.py":
+            run_py(script, args)
+
+    corpus = Corpus(prs=PRS, prs_path=prs_path, feature_spec=[], split_path=split_path)
+    client = LLMClient(backend=dry_run_backend, limiter=RateLimiter(0))
+    arm = ArmConfig(name="plain", prompt_builder=_prompt("plain"))
+    ExperimentRunner([arm], corpus, client, tmp_path / "exp", sample_fn=_sample, rounds=1, run_script=scorer_only).run()
+    assert (tmp_path / "exp" / "plain" / "round_1_scores.json").exists()
+    after = {p: p.stat().st_mtime_ns for p in ROOT.rglob("*.sqlite*") if tmp_path not in p.parents}
+    assert after == before
+    assert not list(tmp_path.rglob("*.sqlite"))
+
+    db = tmp_path / "m.sqlite"
+    ExperimentRunner(
+        [arm], corpus, client, tmp_path / "exp2", sample_fn=_sample, rounds=1, run_script=scorer_only, metrics_db=db
+    ).run()
+    assert db.exists()
+
+
+def test_prior_error_window_samples_each_round(tmp_path):
+    for rr in (1, 2, 3):
+        errs = [{"pr_number": rr * 100 + i, "error_type": "fp", "reasoning": "x"} for i in range(20)]
+        json.dump({"errors": errs}, open(tmp_path / f"round_{rr}_errors.json", "w"))
+    prior = load_prior_errors_window(tmp_path, 4, window=2, per_round=5, seed=1)
+    assert sorted({e["round"] for e in prior}) == [2, 3] and len(prior) == 10
+    assert prior == load_prior_errors_window(tmp_path, 4, window=2, per_round=5, seed=1)
+
+
+def test_dry_run_backend_answers_every_heading():
+    prompt = "intro\n## PR #12: a\nbody\n## PR #7: b"
+    out = json.loads(dry_run_backend(prompt, "m", 10))
+    assert [p["pr_number"] for p in out["predictions"]] == [12, 7]
+    assert PR_HEADING_RE.findall(prompt) == ["12", "7"]
+
+
+def test_token_packer_fills_prompts_and_budgets_sections(tmp_path):
+    assert estimate_tokens("the cat sat") == 3
+    assert estimate_tokens('{"pr_number": 12345}') > len('{"pr_number": 12345}') / 4
+    assert pack_by_tokens([50, 30, 30, 20, 90, 10], 100, max_size=3) == [[0, 1, 3], [2], [4, 5]]
+    assert pack_by_tokens([150, 10], 100) == [[0], [1]]  # oversize items still get a prompt
+    assert allocate_budget({"reviews": 100, "body": 10, "files": 1000}, 300, {"reviews": 1, "files": 2}) == {
+        "reviews": 96,
+        "body": 10,
+        "files": 193,
+    }
+
+    sections = {"comments": ["ok", "long " * 300, "fine"], "files": [f"- f{i}.py" for i in range(50)]}
+    fitted = fit_sections(sections, 120, {"comments": 3})
+    assert fitted["comments"][0] == "ok" and fitted["comments"][1].endswith("…") and fitted["comments"][2] == "fine"
+    assert 0 < len(fitted["files"]) < 50
+    assert sum(estimate_tokens(e) for k in fitted for e in fitted[k]) <= 120
+
+    pr = {"body": "Adds retries.\n<!-- greptile_comment -->summary", "reviews": [{"user": "m", "state": "APPROVED", "body": ""}]}
+    sections, fitted = fit_pr_sections(pr, "summary")
+    assert sections["body"] == ["Adds retries."] and fitted["greptile"] == ["summary"]
+    assert fit_pr_sections(pr, weights={"body": 1.0})[0]["greptile"] == []
+
+    # two 4-PR sample batches fit one prompt once token packing is on
+    client = LLMClient(backend=dry_run_backend, limiter=RateLimiter(0))
+    corpus = Corpus(prs=PRS, prs_path=tmp_path / "prs.json", feature_spec=[], split_path=tmp_path / "split.json")
+    arm = ArmConfig(name="plain", prompt_builder=_prompt("plain"), format_pr=lambda pr: f"## PR #{pr['number']}")
+    runner = ExperimentRunner(
+        [arm], corpus, client, tmp_path / "exp", sample_fn=_sample, rounds=1, run_script=_fake_scorer([]),
+        context_tokens=1000, max_prs_per_prompt=8,
+    )
+    assert runner.run()["arms"]["plain"]["rounds"]["1"]["accuracy"] == 0.5
+    assert client.stats["calls"] == 1
+
+
+def _population(n=400):
+    sizes = ["size: XS", "size: M", "size: XL"]
+    return [
+        {
+            "number": i,
+            "labels": [sizes[i % 3], "bug" if i % 4 else "docs"],
+            "merged_at": "2024-01-02T00:00:00Z" if i % 5 == 0 else None,
+            "created_at": f"2024-0{1 + i % 6}-01T00:00:00Z",
+        }
+        for i in range(1, n + 1)
+    ]
+
+
+def test_sampler_rounds_reproducible_disjoint_and_colocated():
+    clusters = [[1, 2, 3], [10, 11], [20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31, 32]]
+    sampler = StratifiedSampler(_population(), clusters=clusters, seed=7, merge_target=0.3)
+    rounds = sampler.rounds(4, 50, clusters_per_round=2)
+
+    # any round regenerates on its own from (seed, round)
+    again = StratifiedSampler(_population(), clusters=clusters, seed=7, merge_target=0.3).sample_round(1, 50, clusters_per_round=2)
+    assert again == rounds[0]
+
+    seen = [n for r in rounds for n in r["sampled_pr_numbers"]]
+    assert len(seen) == len(set(seen)) == 200
+    for r in rounds:
+        assert r["stats"]["merge_rate"] == 0.3
+        assert all(len(b) <= 10 for b in r["batch_assignments"].values())
+        assert {n for b in r["batch_assignments"].values() for n in b} == set(r["sampled_pr_numbers"])
+        for cluster in r["dedupe_clusters_selected"]:
+            batches = r["cluster_batch_map"]["-".join(map(str, cluster))]
+            covered = {n for b in batches for n in r["batch_assignments"][str(b)]}
+            assert set(cluster) <= covered
+    # the 13-PR cluster spans chained batches; no cluster member is ever drawn alone
+    in_clusters = {n for cl in clusters for n in cl}
+    chosen = {n for r in rounds for cl in r["dedupe_clusters_selected"] for n in cl}
+    assert (set(seen) & in_clusters) == chosen
+
+
+def test_active_selector_prefers_uncertain_and_disputed_prs():
+    prs = _population(200)
+    # the router is sure about everything except 1..30; the LLM disputes 31..40
+    logit = {pr["number"]: 0.5 if pr["number"] <= 30 else 0.02 for pr in prs}
+    llm = {n: 0.9 for n in range(31, 41)}
+    selector = ActiveSelector(StratifiedSampler(prs, seed=3), logit, llm, prs_per_round=50, explore=0.2)
+
+    first = selector(1)
+    picked = set(first["sampled_pr_numbers"])
+    assert set(range(1, 41)) <= picked and len(picked) == 50
+    assert first["stats"]["selection"]["explore"] == 10
+
+    # used PRs never come back; a resumed selector skips samples it is shown
+    second = selector(2)
+    assert not picked & set(second["sampled_pr_numbers"])
+    resumed = ActiveSelector(StratifiedSampler(prs, seed=3), logit, llm, prs_per_round=50, explore=0.2)
+    resumed.observe_sample(first)
+    assert resumed(2) == second
+
+
+def _write_round(d, r, acc, errors=()):
+    scores = {
+        "round": r,
+        "merge": {"accuracy": acc, "f1": acc, "confusion": {"tp": 1, "fp": 1, "tn": 1, "fn": 1}},
+        "dedupe": {"f1": 0.5},
+        "errors": [{"pr_number": n} for n in errors],
+    }
+    (d / f"round_{r}_scores.json").write_text(json.dumps(scores))
+    preds = [{"pr_number": r, "prediction": "merged", "confidence": 0.7, "features": {}, "reasoning": "long"}]
+    (d / f"round_{r}_results.json").write_text(json.dumps({"predictions": preds}))
+
+
+def test_consolidator_folds_only_new_rounds(tmp_path):
+    accs = [0.6, 0.7, 0.65, 0.8, 0.75, 0.9, 0.85, 0.8, 0.95, 0.9, 0.92, 0.88]
+    for r, acc in enumerate(accs[:11], start=1):
+        _write_round(tmp_path, r, acc, errors=[7] if r % 2 else [])
+    assert Consolidator(tmp_path).update() == list(range(1, 12))
+
+    _write_round(tmp_path, 12, accs[11], errors=[7])
+    c = Consolidator(tmp_path)
+    assert c.update() == [12] and c.update() == []
+    learn = c.state.accuracy["learning"]
+    assert learn.n == 9 and abs(learn.mean - statistics.mean(accs[3:])) < 1e-12
+    assert abs(learn.var - statistics.variance(accs[3:])) < 1e-12
+    assert c.state.summary()["confusion"]["tp"] == 12
+    assert c.state.persistent_errors() == [{"pr_number": 7, "error_rounds": 7}]
+    assert [row["pr_number"] for row in c.rows()] == list(range(1, 13))
+
+    # rows appended by an interrupted update are dropped; a rewritten round forces a rebuild
+    with c.rows_path.open("a") as f:
+        f.write(json.dumps({"pr_number": 99}) + "\n")
+    _write_round(tmp_path, 13, 0.9)
+    assert Consolidator(tmp_path).update() == [13]
+    assert [row["pr_number"] for row in c.rows()] == list(range(1, 14))
+    _write_round(tmp_path, 2, 0.125)
+    assert Consolidator(tmp_path).update() == list(range(1, 14))
+
+
+def test_consolidator_folds_late_results_without_rebuild(tmp_path):
+    for r in (1, 2, 3, 4):
+        _write_round(tmp_path, r, 0.5 + r / 10)
+    results = tmp_path / "round_4_results.json"
+    late = results.read_text()
+    results.unlink()
+    c = Consolidator(tmp_path)
+    assert c.update() == [1, 2, 3, 4]
+    assert [row["pr_number"] for row in c.rows()] == [1, 2, 3]
+
+    results.write_text(late)
+    c = Consolidator(tmp_path)
+    assert c.update() == [4]
+    assert c.state.accuracy["all"].n == 4
+    assert [row["pr_number"] for row in c.rows()] == [1, 2, 3, 4]
+    curve = c.state.summary()["learning_curve"]
+    assert curve["learning_rounds_4_10_mean_accuracy"] == curve["learning_rounds_4_plus_mean_accuracy"] == 0.9
@@ -0,0 +1,65 @@
+"""Tests for per-segment probability calibration."""
+
+import numpy as np
+
+from src.analysis.calibration import SegmentedCalibrator, fit_isotonic, fit_platt
+
+
+def _overconfident(n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    true = rng.uniform(0.05, 0.95, size=n)
+    y = (rng.random(n) < true).astype(float)
+    raw = np.clip(0.5 + 1.8 * (true - 0.5), 0.0, 1.0)  # stretched towards the extremes
+    return raw, y, true
+
+
+def test_isotonic_is_monotone_and_fixes_overconfidence():
+    raw, y, true = _overconfident()
+    table = fit_isotonic(raw, y)
+    assert np.all(np.diff(table.x) > 0) and np.all(np.diff(table.y) >= 0)
+    assert np.mean((table.apply(raw) - true) ** 2) < np.mean((raw - true) ** 2) / 4
+
+
+def test_platt_table_matches_logistic_shape():
+    raw, y, true = _overconfident(seed=1)
+    table = fit_platt(raw, y)
+    assert table.apply([0.0])[0] < 0.2 and table.apply([1.0])[0] > 0.8
+    assert np.mean((table.apply(raw) - y) ** 2) <= np.mean((raw - y) ** 2)
+
+
+def test_segments_fall_back_to_coarser_maps(tmp_path):
+    raw, y, true = _overconfident(n=3000, seed=2)
+    model = np.where(np.arange(len(raw)) % 2, "b", "a")
+    p = np.where(model == "b", 0.5 + 0.3 * (true - 0.5), raw)  # "b" is underconfident instead
+    category = np.where(np.arange(len(raw)) % 3 == 0, "docs", "rare")
+    category[:2950] = "docs"
+
+    cal = SegmentedCalibrator(min_samples=100).fit(p, y, {"model_used": model, "category": category})
+    assert "model_used=b" in cal.maps and "category=rare" not in cal.maps
+    assert "category=docs|model_used=b" in cal.maps
+
+    out = cal.apply([0.6, 0.6], {"model_used": ["a", "b"], "category": ["rare", "rare"]})
+    assert out[1] > out[0] + 0.15
+
+    cal.save(tmp_path / "cal.json")
+    again = SegmentedCalibrator.load(tmp_path / "cal.json")
+    assert np.allclose(again.apply(p[:50], {"model_used": model[:50]}), cal.apply(p[:50], {"model_used": model[:50]}), atol=1e-5)
+
+
+def test_confidence_calibration_reports_held_out_round():
+    from consolidate_v2 import fit_confidence_calibration
+
+    raw, y, _ = _overconfident(n=3000, seed=3)
+    rounds = [{"round": r, "predictions": []} for r in (1, 2, 3)]
+    prs = {}
+    for i, (p, merged) in enumerate(zip(raw, y)):
+        prs[i] = {"number": i, "merged_at": "2026-02-01T00:00:00Z" if merged else None}
+        rounds[i % 3]["predictions"].append({"pr_number": i, "prediction": "merged", "confidence": float(p)})
+
+    _, report = fit_confidence_calibration(rounds, prs)
+    held = report["holdout"]
+    assert held["round"] == 3 and held["n"] == 1000 and held["n_fit"] == 2000
+    assert held["ece_calibrated"] < held["ece_raw"] / 2
+
+    _, report = fit_confidence_calibration(rounds[:1], prs)
+    assert report["available"] and not report["holdout"]["available"]
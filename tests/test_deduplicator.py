@@ -1 +1,145 @@
 """Tests for duplicate detection precision, recall, and ranking."""
+
+from src.analysis.deduplicator import ClusterRanker, candidate_pairs, elect_canonical, pack_batches
+
+
+def _pr(n, p_merge, ci=None, rate=0.0, updated="2026-02-10T00:00:00Z", files=()):
+    return {
+        "number": n,
+        "p_merge": p_merge,
+        "ci_green": ci,
+        "author_merge_rate": rate,
+        "updated_at": updated,
+        "files": list(files),
+    }
+
+
+def test_canonical_prefers_strongest_member():
+    prs = {
+        1: _pr(1, 0.2, ci=False, files=["a.ts"]),
+        2: _pr(2, 0.8, ci=True, rate=0.6, files=["a.ts", "a.test.ts"]),
+        3: _pr(3, 0.3, files=["a.ts"]),
+    }
+    [election] = elect_canonical([[1, 2, 3]], prs)
+    assert election["canonical"] == 2
+    assert {s["close"] for s in election["suggestions"]} == {1, 3}
+    assert all(s["in_favour_of"] == 2 for s in election["suggestions"])
+
+
+def test_ranker_updates_incrementally():
+    ranker = ClusterRanker()
+    for pr in (_pr(10, 0.5), _pr(11, 0.4), _pr(12, 0.9)):
+        ranker.update(pr)
+    ranker.add_pair(10, 11)
+    assert [e.canonical for e in ranker.elections()] == [10]
+
+    ranker.add_pair(11, 12)
+    [election] = ranker.elections()
+    assert election.canonical == 12
+    assert len(election.ranked) == 3
+
+    ranker.remove(12)
+    assert [e.canonical for e in ranker.elections()] == [10]
+    ranker.remove(11)
+    assert ranker.elections() == []
+
+
+def test_ranker_remove_splits_cluster_at_bridge():
+    ranker = ClusterRanker()
+    for pr in (_pr(1, 0.9), _pr(2, 0.1), _pr(3, 0.5), _pr(4, 0.4), _pr(5, 0.3), _pr(6, 0.2)):
+        ranker.update(pr)
+    ranker.add_pair(1, 2)
+    ranker.add_pair(2, 3)
+    ranker.add_cluster([4, 5, 6])
+    assert sorted(e.canonical for e in ranker.elections()) == [1, 4]
+
+    ranker.remove(2)
+    assert sorted(e.canonical for e in ranker.elections()) == [4]
+    ranker.remove(4)
+    [election] = ranker.elections()
+    assert election.canonical == 5
+    assert [n for n, _ in election.ranked] == [5, 6]
+
+
+def test_elect_canonical_uses_external_signals():
+    prs = {1: _pr(1, 0.0, files=["a.ts"]), 2: _pr(2, 0.0, files=["a.ts"])}
+    [election] = elect_canonical([[1, 2]], prs, p_merge={1: 0.2, 2: 0.9})
+    assert election["canonical"] == 2
+
+    [election] = elect_canonical([[1, 2]], prs, features={1: {"ci_green": True}, 2: {"ci_green": False}})
+    assert election["canonical"] == 1
+
+
+def test_pack_batches_colocates_similar_titles():
+    titles = {
+        1: "fix(telegram): handle topic threads in replies",
+        2: "docs: typo in README",
+        3: "feat: add matrix reactions",
+        4: "fix: telegram handle topic threads in replies",
+        5: "chore: bump deps",
+        6: "fix(telegram): handle topic threads in group replies",
+    }
+    prs = [{"number": n, "title": t} for n, t in titles.items()]
+    batches = pack_batches(prs, batch_size=3)
+    assert sorted(len(b) for b in batches) == [3, 3]
+    assert sorted(batches[0]) == [1, 4, 6]
+
+
+def test_candidate_pairs_uses_shared_files():
+    prs = [
+        {"number": 1, "title": "one", "files": ["src/a.ts", "src/b.ts"]},
+        {"number": 2, "title": "two", "files": [{"path": "src/a.ts"}, {"path": "src/b.ts"}]},
+        {"number": 3, "title": "three", "files": ["src/c.ts"]},
+    ]
+    assert candidate_pairs(prs) == {(1, 2): 1.0}
+
+
+def test_candidate_pairs_skips_oversized_title_buckets():
+    prs = [{"number": n, "title": "Update dependencies"} for n in range(1, 8)]
+    prs.append({"number": 8, "title": "Fix gateway reconnect loop"})
+    prs.append({"number": 9, "title": "Fix gateway reconnect loop"})
+    pairs = candidate_pairs(prs, max_bucket=5)
+    assert pairs == {(8, 9): 1.0}
+    assert len(candidate_pairs(prs, max_bucket=10)) == 21 + 1
+
+
+def test_score_dedupe_matches_pair_counts():
+    from score_round import score_dedupe
+
+    gt = [[1, 2, 3], [4, 5]]
+    pred = [[1, 2], [4, 5, 6]]
+    out = score_dedupe(range(1, 11), gt, pred)
+    # gt pairs: 3 + 1, predicted pairs: 1 + 3, shared: (1,2) and (4,5)
+    assert (out["tp"], out["fp"], out["fn"]) == (2, 2, 2)
+    assert out["precision"] == out["recall"] == 0.5
+    assert score_dedupe(range(1, 11), gt, gt)["ari"] == 1.0
+
+
+def test_score_dedupe_counts_out_of_universe_predictions():
+    from score_round import score_dedupe
+
+    out = score_dedupe([1, 2], [[1, 2]], [[1, 2], [2, 99]])
+    assert out["gt_pairs"] == 1
+    assert out["pred_pairs"] == 3
+
+
+def test_ground_truth_blocking_links_shared_issue_and_bursts():
+    from enrich_ground_truth import block_candidates
+
+    prs = [
+        {"number": 1, "title": "fix: crash on start", "body": "Fixes #500", "created_at": "2026-01-01T00:00:00Z"},
+        {"number": 2, "title": "handle startup error", "body": "closes #500", "created_at": "2026-01-20T00:00:00Z"},
+        {"number": 3, "title": "feat: voice call hold music", "labels": ["channel: voice-call"], "created_at": "2026-01-05T00:00:00Z"},
+        {"number": 4, "title": "voice call music while on hold", "labels": ["channel: voice-call"], "created_at": "2026-01-05T06:00:00Z"},
+        {"number": 5, "title": "voice call hold music v2", "labels": ["channel: voice-call"], "created_at": "2026-01-30T00:00:00Z"},
+    ]
+    reasons = block_candidates(prs, window_hours=24.0)
+    assert reasons[(1, 2)] == ["same_linked_issue"]
+    assert "time_proximity" in reasons[(3, 4)]
+    assert "time_proximity" not in reasons.get((3, 5), [])
+
+    # loose mentions and tracking issues closed by many PRs are not blocking keys
+    loose = [{"number": 10, "title": "a", "body": "see #500"}, {"number": 11, "title": "b", "body": "for #500"}]
+    tracking = [{"number": 100 + i, "title": f"part {i}", "body": "Fixes #900"} for i in range(30)]
+    reasons = block_candidates(prs + loose + tracking, window_hours=24.0, max_file_df=25)
+    assert not any("same_linked_issue" in r for pair, r in reasons.items() if pair != (1, 2))
@@ -0,0 +1,40 @@
+"""Tests for the cross-experiment error index."""
+
+from src.bootstrap.sequential_trainer import load_prior_errors_window
+from src.reporting.error_index import ErrorIndex
+
+
+def _outcome(n, error_type=None, text="", size="M"):
+    return {"pr_number": n, "correct": error_type is None, "error_type": error_type, "reasoning": text, "features": {"size": size}}
+
+
+def test_error_index_tracks_persistent_errors_across_experiments(tmp_path):
+    with ErrorIndex(tmp_path / "m.sqlite") as index:
+        index.record_outcomes("v2", "main", 1, [_outcome(1, "fn", "looked stale"), _outcome(2), _outcome(3, "fp", size="XL")])
+        # rescoring replaces the round: PR 2 is now wrong, PR 3 right
+        index.record_outcomes("v2", "main", 1, [_outcome(1, "fn", "looked stale"), _outcome(2, "fp"), _outcome(3, size="XL")])
+        index.record_outcomes("v2", "main", 2, [_outcome(1, "fn", "looked stale"), _outcome(3, "fp", size="XL")])
+        index.record_outcomes("v3", "main", 1, [_outcome(1, "fn", "no reviewer"), _outcome(2)])
+        index.record_reflections("v3", "main", 1, [{"pr_number": 1, "reflection": "maintainer approved late"}])
+        patterns = [{"id": "P-1-1", "attributions": [{"round": 1, "pr_number": 1, "error_type": "fn"}, {"round": 1, "ambiguous": True}]}]
+        assert index.record_attributions("v3", "main", patterns) == 1
+        assert index.record_attributions("v3", "main", patterns) == 0
+
+        assert index.round_errors("v3", "main", 1) == [{"pr_number": 1, "error_type": "fn", "reflection": "maintainer approved late"}]
+        window = load_prior_errors_window(
+            tmp_path, 2, 1, 5, 0, errors_for=lambda r: index.round_errors("v2", "main", r)
+        )
+        assert [e["pr_number"] for e in window] == [1, 2]
+
+        assert [(h["experiment"], h["round"]) for h in index.pr_history(1)] == [("v2", 1), ("v2", 2), ("v3", 1)]
+        # one shared text row for the three identical reasonings
+        assert index.conn.execute("SELECT count(*) FROM texts").fetchone()[0] == 3
+
+        never_right = index.persistent(min_errors=3, min_arms=2, max_accuracy=0.0)
+        assert [(p["pr_number"], p["errors"], p["arms"]) for p in never_right] == [(1, 3, 2)]
+        assert [p["pr_number"] for p in index.persistent(min_errors=1)] == [1, 2, 3]
+        assert [p["pr_number"] for p in index.persistent(min_errors=1, max_accuracy=0.0)] == [1]
+
+        xl = next(f for f in index.by_feature("size") if f["value"] == "XL")
+        assert (xl["scored"], xl["errors"], xl["fp"], xl["error_rate"]) == (2, 1, 1, 0.5)
+        assert index.by_pattern("P-1-1") == [{"pattern_id": "P-1-1", "errors": 1, "prs": 1, "arms": 1, "pr_numbers": [1]}]
@@ -1 +1,100 @@
 """Integration tests for end-to-end pipeline execution."""
+
+import numpy as np
+
+from src.analysis.signal_extractor import extract_corpus
+from src.reporting.ranker import fit_router
+
+FEATURE_SETS = {
+    "early_model": {"features": ["has_maintainer_label", "is_draft"]},
+    "mature_model": {"features": ["has_maintainer_label", "is_draft", "comment_count", "has_approval"]},
+}
+
+
+def _corpus(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    prs = []
+    for i in range(n):
+        maint = bool(rng.random() < 0.3)
+        approved = bool(rng.random() < 0.4)
+        pr = {
+            "number": i + 1,
+            "user": f"u{i % 50}",
+            "title": f"fix thing {i}",
+            "created_at": f"2026-02-{1 + i % 28:02d}T00:00:00Z",
+            "labels": ["maintainer"] if maint else [],
+            "merged_at": "x" if rng.random() < (0.8 if maint or approved else 0.15) else None,
+        }
+        if i % 2:
+            pr["comments"] = [{}] * int(rng.integers(0, 5))
+            pr["reviews"] = [{"state": "APPROVED"}] if approved else []
+        prs.append(pr)
+    return prs
+
+
+def test_router_picks_model_by_populated_features():
+    prs = _corpus()
+    rows = extract_corpus(prs)
+    router = fit_router(rows, [bool(p["merged_at"]) for p in prs], FEATURE_SETS)
+    assert set(router.models) == {"early", "mature"}
+    assert router.models["early"].fit.meta["n_train"] == len(prs)
+    assert router.models["mature"].fit.meta["n_train"] == len(prs) // 2
+
+    p, used = router.predict(rows)
+    assert used.tolist() == ["mature" if i % 2 else "early" for i in range(len(prs))]
+    ranked = router.rank(prs[-10:], context=prs[:-10])
+    assert [r["p_merge"] for r in ranked] == sorted((r["p_merge"] for r in ranked), reverse=True)
+
+
+def test_score_many_matches_per_pr_reference():
+    prs = _corpus(seed=1)
+    rows = extract_corpus(prs)
+    router = fit_router(rows, [bool(p["merged_at"]) for p in prs], FEATURE_SETS)
+    table = router.score_many(prs[-40:], context=prs[:-40], top_k=2)
+    assert np.all((table.ci_low <= table.p_merge) & (table.p_merge <= table.ci_high))
+
+    X = router.design(rows[-40:])
+    for i in range(len(table)):
+        model = router.models[table.model_used[i]]
+        contrib = X[i] * model.coef
+        xa = np.concatenate([[1.0], X[i, model.columns]])
+        eta = contrib.sum() + model.intercept
+        se = np.sqrt(xa @ model.fit.cov @ xa)
+        assert np.isclose(table.p_merge[i], 1 / (1 + np.exp(-eta)))
+        assert np.isclose(table.ci_high[i], 1 / (1 + np.exp(-(eta + 1.959964 * se))), atol=1e-6)
+        assert table.pos_val[i, 0] == contrib.max() and table.neg_val[i, 0] == contrib.min()
+
+    top = table.records()[0]
+    assert set(top) >= {"p_merge", "confidence_interval", "model_used", "top_positive_drivers", "top_negative_drivers"}
+
+
+def test_hybrid_scorer_escalates_only_uncertain_and_caches(tmp_path):
+    from src.analysis.deep_reviewer import HybridScorer, ReviewCache
+
+    prs = _corpus(seed=2)
+    rows = extract_corpus(prs)
+    router = fit_router(rows, [bool(p["merged_at"]) for p in prs], FEATURE_SETS)
+    calls = []
+
+    def review(batch):
+        calls.append([p["number"] for p in batch])
+        return {p["number"]: {"prediction": "closed", "confidence": 0.9} for p in batch}
+
+    open_prs = prs[-60:]
+    scorer = HybridScorer(router, review, band=(0.3, 0.7), cache=ReviewCache(tmp_path / "reviews.json"), batch_size=8)
+    out = scorer.score(open_prs, context=prs[:-60])
+    escalated = [r for r in out if r["route"] == "llm"]
+    assert escalated and len(escalated) < len(out)
+    assert all(("uncertain" in r["escalation"]) == (0.3 <= r["p_merge"] <= 0.7) for r in out)
+    assert all((r["route"] == "llm") == bool(r["escalation"]) for r in out)
+    assert all(r["p_final"] == 0.1 for r in escalated)
+    assert sum(len(c) for c in calls) == len(escalated)
+
+    again = HybridScorer(router, review, band=(0.3, 0.7), cache=ReviewCache(tmp_path / "reviews.json"))
+    n_calls = len(calls)
+    again.score(open_prs, context=prs[:-60])
+    assert len(calls) == n_calls and again.stats["cache_hits"] == len(escalated)
+
+    bumped = [dict(p, head_sha="new") if p["number"] == escalated[0]["number"] else p for p in open_prs]
+    again.score(bumped, context=prs[:-60])
+    assert calls[-1] == [escalated[0]["number"]]
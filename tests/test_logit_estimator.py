@@ -1 +1,246 @@
 """Tests for logit estimation fit quality and predictive outputs."""
+
+import numpy as np
+import pytest
+
+from src.analysis.logit_estimator import (
+    CSRMatrix,
+    FeatureVectorizer,
+    auc_roc,
+    cluster_bootstrap,
+    cluster_groups,
+    fit_logit,
+    group_folds,
+    regularization_path,
+    sigmoid,
+)
+
+
+def _synthetic(n=4000, seed=0):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n, 3))
+    true = np.array([1.5, -2.0, 0.0])
+    y = (rng.random(n) < sigmoid(X @ true - 1.0)).astype(float)
+    return X, y, true
+
+
+def test_fit_recovers_coefficients():
+    X, y, true = _synthetic()
+    fit = fit_logit(X, y, l2=1e-6)
+    assert fit.converged
+    assert np.allclose(fit.coef, true, atol=0.15)
+    assert abs(fit.intercept + 1.0) < 0.15
+    assert np.all(fit.standard_errors > 0)
+
+
+def test_penalised_gradient_vanishes_with_weights():
+    X, y, _ = _synthetic(n=500, seed=1)
+    w = np.random.default_rng(2).uniform(0.5, 2.0, size=len(y))
+    fit = fit_logit(X, y, l2=3.0, sample_weight=w, class_weight="balanced")
+    from src.analysis.logit_estimator import balanced_weights
+
+    ww = w * balanced_weights(y)
+    p = fit.predict_proba(X)
+    assert abs(np.sum(ww * (y - p))) < 1e-6
+    assert np.allclose(X.T @ (ww * (y - p)) - 3.0 * fit.coef, 0.0, atol=1e-6)
+
+
+def test_warm_start_converges_immediately():
+    X, y, _ = _synthetic(n=800, seed=3)
+    fit = fit_logit(X, y, l2=1.0)
+    refit = fit_logit(X, y, l2=1.0, warm_start=fit)
+    assert refit.n_iter <= 2
+    assert np.allclose(refit.coef, fit.coef)
+
+
+def test_failed_line_search_keeps_previous_params(monkeypatch):
+    X, y, _ = _synthetic(n=300, seed=4)
+    start = fit_logit(X, y, l2=1.0)
+    # a Newton "step" pointing downhill: no halving can make it an ascent
+    monkeypatch.setattr(np.linalg, "solve", lambda H, g: -g)
+    refit = fit_logit(X, y, l2=1.0, warm_start=start.params + 0.1)
+    assert not refit.converged and refit.n_iter == 1
+    assert np.allclose(refit.params, start.params + 0.1)
+
+
+def test_fit_without_covariance_skips_the_inverse(monkeypatch):
+    X, y, _ = _synthetic(n=500, seed=5)
+    full = fit_logit(X, y, l2=1.0)
+
+    def no_inverse(H):
+        raise AssertionError("covariance was computed")
+
+    monkeypatch.setattr(np.linalg, "inv", no_inverse)
+    monkeypatch.setattr(np.linalg, "pinv", no_inverse)
+    for design in (X, CSRMatrix.from_dense(X)):
+        fit = fit_logit(design, y, l2=1.0, covariance=False)
+        assert np.allclose(fit.params, full.params, atol=1e-6)
+        assert fit.cov.shape == (4,) and np.isnan(fit.standard_errors).all()
+
+
+def test_vectorizer_matches_dictvectorizer_semantics():
+    rows = [
+        {"loc_total": 10, "is_draft": True, "size_label": "M", "category": ["agents", "docs"], "ci_green": None},
+        {"loc_total": 3, "is_draft": False, "size_label": "XS"},
+    ]
+    vec = FeatureVectorizer()
+    X = vec.fit_transform(rows)
+    assert vec.feature_names == ["category=agents", "category=docs", "is_draft", "loc_total", "size_label=M", "size_label=XS"]
+    assert X.tolist() == [[1, 1, 1, 10, 1, 0], [0, 0, 0, 3, 0, 1]]
+
+
+def test_auc_handles_ties():
+    y = [0, 0, 1, 1]
+    p = [0.1, 0.5, 0.5, 0.9]
+    assert auc_roc(y, p) == 0.875
+
+
+def test_online_updates_track_batch_fit():
+    from src.learning.logit_reestimator import OnlineLogit
+
+    X, y, _ = _synthetic(n=3000, seed=4)
+    batch = fit_logit(X, y, l2=1.0)
+    online = OnlineLogit(["a", "b", "c"], l2=1.0)
+    for x, t in zip(X, y):
+        online.update_vector(x, bool(t))
+    assert np.allclose(online.params, batch.params, atol=0.1)
+
+
+def test_online_forgetting_follows_drift(tmp_path):
+    from src.learning.logit_reestimator import OnlineLogit
+
+    rng = np.random.default_rng(5)
+    stale = OnlineLogit(["x"])
+    fresh = OnlineLogit(["x"], forgetting=0.99)
+    for coef in (2.0, -2.0):
+        for _ in range(1500):
+            x = rng.normal()
+            merged = rng.random() < 1 / (1 + np.exp(-coef * x))
+            stale.update({"x": x}, merged)
+            fresh.update({"x": x}, merged)
+    assert fresh.coef[0] < -1.0
+    assert stale.coef[0] > fresh.coef[0] + 0.5
+
+    fresh.save(tmp_path / "online.json")
+    again = OnlineLogit.load(tmp_path / "online.json")
+    assert again.predict_proba({"x": 1.0}) == fresh.predict_proba({"x": 1.0})
+
+
+def test_temporal_models_route_by_window():
+    from src.analysis.deduplicator import to_epoch
+    from src.analysis.logit_estimator import fit_temporal_models, parse_window
+
+    lo, hi = parse_window("2025-11 to 2026-01")
+    assert lo == to_epoch("2025-11-01T00:00:00Z") and hi == to_epoch("2026-02-01T00:00:00Z")
+
+    X, y, _ = _synthetic(n=2000, seed=6)
+    vol = np.random.default_rng(6).integers(50, 500, size=len(y)).astype(float)
+    X = np.hstack([X, vol[:, None]])
+    names = ["a", "b", "c", "weekly_pr_volume"]
+    ts = np.where(np.arange(len(y)) % 2, to_epoch("2026-02-10T00:00:00Z"), to_epoch("2025-12-10T00:00:00Z"))
+    strategy = {
+        "models": [
+            {"name": "quality_model", "train_window": "2025-11 to 2026-01"},
+            {"name": "triage_model", "train_window": "2026-02"},
+        ],
+        "weighted_regression": {"control_features": ["weekly_pr_volume"]},
+    }
+    models = fit_temporal_models(X, y, ts, names, strategy)
+    assert set(models.fits) == {"quality_model", "triage_model", "weighted"}
+    assert models.fits["quality_model"].feature_names == ["a", "b", "c"]
+    assert models.fits["weighted"].feature_names == names
+
+    probe = np.array([to_epoch(t) for t in ("2025-10-01T00:00:00Z", "2025-12-01T00:00:00Z", "2026-02-05T00:00:00Z", "2026-06-01T00:00:00Z")])
+    p, used = models.predict(X[:4], probe)
+    assert used.tolist() == ["weighted", "quality_model", "triage_model", "weighted"]
+    assert np.all((p > 0) & (p < 1))
+
+    # without the weighted fit, out-of-window PRs go to the nearest window
+    del models.fits["weighted"]
+    assert models.predict(X[:4], probe)[1].tolist() == ["quality_model", "quality_model", "triage_model", "triage_model"]
+    models.fits.clear()
+    with pytest.raises(ValueError):
+        models.predict(X[:4], probe)
+
+
+def test_group_folds_keep_clusters_together():
+    numbers = list(range(1, 101))
+    groups = cluster_groups(numbers, [[3, 50, 99], [7, 8], [50, 60]])
+    assert groups[59] == groups[2] == groups[49] == groups[98] == 3
+    folds = group_folds(groups, n_folds=4, seed=1)
+    for cluster in ([3, 50, 60, 99], [7, 8]):
+        assert len({folds[n - 1] for n in cluster}) == 1
+    assert np.bincount(folds).min() >= 20
+
+
+def test_regularization_path_parallel_matches_serial():
+    X, y, _ = _synthetic(n=600, seed=7)
+    X = np.hstack([X, np.random.default_rng(7).normal(size=(600, 20))])
+    lambdas = [100.0, 10.0, 1.0, 0.1]
+    serial = regularization_path(X, y, lambdas=lambdas, n_folds=3, max_workers=1)
+    parallel = regularization_path(X, y, lambdas=lambdas, n_folds=3, max_workers=2)
+    assert serial == parallel
+    assert [r["l2"] for r in serial["path"]] == lambdas
+    assert serial["path"][0]["brier_score"] > serial["path"][-1]["brier_score"]
+    assert serial["best_l2"] in lambdas
+
+
+def test_regularization_path_without_scoreable_folds_has_no_best_l2():
+    X, _, _ = _synthetic(n=60, seed=9)
+    out = regularization_path(X, np.ones(60), lambdas=[10.0, 1.0], n_folds=3, max_workers=1)
+    assert out["n_folds"] == 0 and out["path"] == [] and out["best_l2"] is None
+
+
+def test_sparse_fit_matches_dense_without_densifying():
+    rng = np.random.default_rng(8)
+    rows = [
+        {"component_area": [f"extensions:{rng.integers(0, 60)}"], "size_label": str(rng.choice(["XS", "S", "M"])), "x": float(rng.normal())}
+        for _ in range(800)
+    ]
+    y = np.array([rng.random() < (0.7 if r["size_label"] == "XS" else 0.2) for r in rows], dtype=float)
+    vec = FeatureVectorizer()
+    dense = vec.fit_transform(rows)
+    sparse = vec.transform(rows, sparse=True)
+    assert sparse.nnz == int((dense != 0).sum())
+    assert np.array_equal(sparse[np.arange(5, 50, 3)].toarray(), dense[5:50:3])
+
+    d_fit = fit_logit(dense, y, l2=1.0, class_weight="balanced")
+    s_fit = fit_logit(sparse, y, l2=1.0, class_weight="balanced")
+    assert s_fit.converged
+    assert np.allclose(s_fit.params, d_fit.params, atol=1e-6)
+    assert np.allclose(s_fit.cov, d_fit.cov, atol=1e-6)
+
+    narrow = fit_logit(sparse, y, l2=1.0, max_cov_dim=10)
+    assert narrow.cov.shape == (sparse.shape[1] + 1,)
+    assert np.all(narrow.standard_errors > 0)
+
+
+def test_hashed_vectorizer_has_fixed_width():
+    vec = FeatureVectorizer(n_features=64)
+    few = vec.fit_transform([{"category": "docs"}], sparse=True)
+    many = vec.fit_transform([{"category": f"c{i}", "learned_x": 1} for i in range(500)], sparse=True)
+    assert few.shape[1] == many.shape[1] == 64
+    assert isinstance(many, CSRMatrix)
+    assert np.allclose(many.toarray().sum(axis=1), 2.0)
+
+
+def test_cluster_bootstrap_widens_for_correlated_authors(monkeypatch):
+    rng = np.random.default_rng(9)
+    authors = np.repeat(np.arange(40), 25)
+    effect = rng.normal(scale=2.0, size=40)[authors]  # shared author effect the model cannot see
+    x = rng.normal(size=(len(authors), 1)) + 0.5 * effect[:, None]
+    y = (rng.random(len(authors)) < sigmoid(effect)).astype(float)
+
+    fit = fit_logit(x, y, l2=1e-3)
+    serial = cluster_bootstrap(x, y, authors, n_boot=60, l2=1e-3, class_weight=None, fit=fit, X_eval=x[:5], max_workers=1)
+    pooled = cluster_bootstrap(x, y, authors, n_boot=60, l2=1e-3, class_weight=None, fit=fit, X_eval=x[:5], max_workers=2)
+    assert np.allclose(serial.params, pooled.params)
+    assert serial.n_groups == 40 and serial.params.shape == (60, 2)
+    assert serial.standard_errors[1] > 1.5 * fit.standard_errors[1]
+    lo, hi = serial.prediction_interval()
+    assert np.all(lo <= hi) and lo.shape == (5,)
+
+    # replicates and the base fit only need params: no inverse Hessian in-process
+    monkeypatch.setattr(np.linalg, "inv", lambda H: pytest.fail("covariance was computed"))
+    again = cluster_bootstrap(x, y, authors, n_boot=60, l2=1e-3, class_weight=None, X_eval=x[:5], max_workers=1)
+    assert np.allclose(again.params, serial.params, atol=1e-6)
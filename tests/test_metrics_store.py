@@ -0,0 +1,39 @@
+"""Tests for the append-only round metrics store."""
+
+from src.reporting.metrics_store import MetricsStore, score_metrics
+
+
+def _payload(acc, fn, fp):
+    return {
+        "merge": {"accuracy": acc, "f1": acc, "confusion": {"tp": 10, "fp": fp, "tn": 70, "fn": fn}},
+        "dedupe": {"f1": 0.5, "bcubed": {"f1": 0.6}},
+        "calibration": [{"bin": 0.7, "count": 10, "avg_confidence": 0.75, "accuracy": 0.5}],
+        "segments": {"size=M": {"n": 30, "accuracy": acc, "fp": 1, "fn": 1}},
+    }
+
+
+def test_store_tracks_curves_contrasts_and_fn_overcorrection(tmp_path):
+    rounds = [(0.70, 1, 18), (0.72, 2, 13), (0.71, 1, 14), (0.80, 2, 6), (0.82, 3, 5), (0.81, 12, 0)]
+    with MetricsStore(tmp_path / "m.sqlite") as store:
+        alerts = [store.record("v3", "main", r, score_metrics(_payload(*row))) for r, row in enumerate(rounds, start=1)]
+        store.record("v2", "main", 1, score_metrics(_payload(0.6, 9, 20)))
+        # rescoring appends; queries see the newest value
+        store.record("v2", "main", 1, score_metrics(_payload(0.65, 9, 20)))
+
+        assert alerts[:5] == [[], [], [], [], []]
+        assert [a["kind"] for a in alerts[5]] == ["overcorrection"]
+        assert store.alerts("v3")[0]["round"] == 6
+
+        assert [(c["experiment"], c["round"], c["value"]) for c in store.curve("merge.accuracy")][:2] == [
+            ("v2", 1, 0.65),
+            ("v3", 1, 0.70),
+        ]
+        assert store.curve("merge.accuracy", segment="size=M", experiments=["v3"])[-1]["value"] == 0.81
+        assert store.curve("merge.ece")[0]["value"] == 0.25
+        last = store.rolling("merge.fn", "v3", "main")[-1]  # FN 2, 3, 12 over rounds 4-6
+        assert (last["round"], last["n"]) == (6, 3)
+        assert abs(last["mean"] - 17 / 3) < 1e-9 and abs(last["std"] - 4.4969) < 1e-4
+
+        v3 = next(c for c in store.contrast() if c["experiment"] == "v3")
+        assert v3["baseline_rounds"] == 3 and v3["learning_rounds"] == 3
+        assert abs(v3["delta"] - 0.1) < 1e-9 and v3["welch_t"] > 5
@@ -1 +1,29 @@
 """Tests for unsupervised pattern detection and trend extraction."""
+
+from src.analysis.pattern_detector import BurstDetector, detect_bursts
+
+
+def _pr(n, title, created, files=()):
+    return {"number": n, "title": title, "created_at": created, "files": list(files)}
+
+
+def test_burst_flagged_when_third_similar_pr_arrives():
+    det = BurstDetector(horizons_hours=(6.0,), min_size=3)
+    assert det.observe(_pr(17427, "fix(discord): retry gateway reconnect on close", "2026-02-15T10:00:00Z")) == []
+    assert det.observe(_pr(17000, "docs: update install guide", "2026-02-15T10:05:00Z")) == []
+    assert det.observe(_pr(17428, "fix(discord): retry gateway reconnect on close 1006", "2026-02-15T10:20:00Z")) == []
+    [burst] = det.observe(_pr(17429, "fix discord retry gateway reconnect on close", "2026-02-15T11:00:00Z"))
+    assert burst.members == [17427, 17428, 17429]
+    assert burst.trigger == 17429
+
+
+def test_window_expires_old_prs():
+    prs = [
+        _pr(1, "feat: slack thread replies", "2026-02-01T00:00:00Z", ["src/slack/thread.ts"]),
+        _pr(2, "slack threads", "2026-02-01T01:00:00Z", ["src/slack/thread.ts"]),
+        _pr(3, "thread support", "2026-02-05T00:00:00Z", ["src/slack/thread.ts"]),
+    ]
+    assert detect_bursts(prs, horizons_hours=(24.0,), min_size=3) == []
+    [burst] = detect_bursts(prs, horizons_hours=(24.0, 240.0), min_size=3)
+    assert burst["horizon_hours"] == 240.0
+    assert burst["size"] == 3
@@ -1 +1,51 @@
 """Tests for signal extraction behavior over representative PR samples."""
+
+from src.analysis.signal_extractor import INTERACTION_FEATURES, author_history, extract_corpus
+
+
+def _pr(n, user, created, merged=False, **extra):
+    return {
+        "number": n,
+        "user": user,
+        "title": f"PR {n}",
+        "created_at": created,
+        "merged_at": created if merged else None,
+        "labels": ["size: S", "maintainer"],
+        **extra,
+    }
+
+
+def test_author_history_uses_only_prior_prs():
+    prs = [
+        _pr(1, "a", "2026-02-03T00:00:00Z", merged=True),
+        _pr(2, "a", "2026-02-04T00:00:00Z"),
+        _pr(3, "b", "2026-02-04T00:00:00Z"),
+    ]
+    rows = extract_corpus(prs)
+    assert [r["author_prior_prs"] for r in rows] == [0, 1, 0]
+    assert rows[1]["author_prior_merge_rate"] == 1.0
+    assert rows[0]["size_label"] == "S" and rows[0]["has_maintainer_label"]
+    assert rows[0]["weekly_pr_volume"] == 3
+
+
+def test_author_history_ignores_merges_after_open():
+    # PR 2 is opened while PR 1 is still open; PR 1 merges later
+    prs = [
+        _pr(1, "a", "2026-02-01T00:00:00Z", merged=True, merged_at="2026-02-10T00:00:00Z"),
+        _pr(2, "a", "2026-02-03T00:00:00Z"),
+        _pr(3, "a", "2026-02-12T00:00:00Z"),
+    ]
+    hist = author_history(prs)
+    assert (hist[2]["prior_prs"], hist[2]["prior_merged"], hist[2]["merge_rate"]) == (1, 0, 0.0)
+    assert (hist[3]["prior_prs"], hist[3]["prior_merged"]) == (2, 1)
+
+
+def test_interaction_features_only_with_payload():
+    bare, enriched = extract_corpus(
+        [
+            _pr(1, "a", "2026-02-01T00:00:00Z"),
+            _pr(2, "b", "2026-02-01T00:00:00Z", comments=[{}], reviews=[{"state": "APPROVED"}]),
+        ]
+    )
+    assert not any(f in bare for f in INTERACTION_FEATURES)
+    assert enriched["comment_count"] == 1 and enriched["has_approval"]